@@ -0,0 +1,195 @@
+"""Аутентификация по токену с кэшем «токен → пользователь».
+
+TokenAuthentication выполняет JOIN Token и User на каждый запрос.
+CachedTokenAuthentication хранит поля пользователя (кроме хеша пароля:
+он читается из БД только при обращении) в LRU-кэше процесса с коротким
+временем жизни, а при settings.TOKEN_AUTH_CACHE['alias'] — еще и в
+общем Django cache (второй уровень для остальных воркеров).
+
+Записи удаляются при выходе (удаление Token), сохранении пользователя
+(смена пароля, деактивация, правка профиля) и его удалении (токены
+удаляются каскадом): из обоих уровней сразу и еще раз после фиксации
+транзакции. Сигналы видны только текущему процессу, поэтому в
+локальном кэше других процессов запись живет не дольше timeout.
+Изменения через QuerySet.update() сигналов не вызывают и видны по
+истечении timeout.
+"""
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import router, transaction
+from django.db.models.fields.files import FieldFile
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from foodgram import routers
+from users.models import User
+
+# Увеличивается при изменении набора полей пользователя.
+CACHE_VERSION = 2
+
+
+class TokenCache:
+    """LRU-кэш процесса с TTL и необязательным общим вторым уровнем."""
+
+    def __init__(self, max_entries=10000, timeout=5, alias=None,
+                 shared_timeout=300):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.alias = alias
+        self.shared_timeout = shared_timeout
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def make_key(self, key):
+        return f'token:v{CACHE_VERSION}:{key}'
+
+    @property
+    def shared(self):
+        return caches[self.alias] if self.alias else None
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires >= now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+        value = None
+        if self.shared is not None:
+            value = self.shared.get(self.make_key(key))
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._set_local(key, value)
+        return value
+
+    def set(self, key, value):
+        self._set_local(key, value)
+        if self.shared is not None:
+            self.shared.set(self.make_key(key), value, self.shared_timeout)
+
+    def _set_local(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+        if keys and self.shared is not None:
+            self.shared.delete_many([self.make_key(key) for key in keys])
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+_token_cache = None
+
+
+def get_token_cache():
+    """Вернуть кэш, настроенный в settings.TOKEN_AUTH_CACHE."""
+    global _token_cache
+    if _token_cache is None:
+        _token_cache = TokenCache(**settings.TOKEN_AUTH_CACHE)
+    return _token_cache
+
+
+def _user_fields():
+    # Хеш пароля в кэш не попадает: из кэша пользователь строится с
+    # отложенным полем password.
+    return [field.attname for field in User._meta.concrete_fields
+            if field.attname != 'password']
+
+
+def _user_values(user, fields):
+    values = []
+    for field in fields:
+        value = getattr(user, field)
+        # FieldFile ссылается на экземпляр модели: храним только имя.
+        values.append(value.name if isinstance(value, FieldFile) else value)
+    return values
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса к БД при попадании в кэш."""
+
+    def authenticate_credentials(self, key):
+        token_cache = get_token_cache()
+        fields = _user_fields()
+        cached = token_cache.get(key)
+        if cached is None:
+            user, token = self.authenticate_from_db(key)
+            token_cache.set(key, (token.created,
+                                  _user_values(user, fields)))
+            return user, token
+
+        created, values = cached
+        db = router.db_for_read(User)
+        user = User.from_db(db, fields, values)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.'))
+        token = Token.from_db(db, ['key', 'user_id', 'created'],
+                              [key, user.pk, created])
+        token.user = user
+        return user, token
+
+    def authenticate_from_db(self, key):
+        try:
+            return super().authenticate_credentials(key)
+        except exceptions.AuthenticationFailed:
+            # Только что выданного токена может еще не быть на реплике.
+            if not routers.reading_from_replica():
+                raise
+        with routers.use_primary():
+            return super().authenticate_credentials(key)
+
+
+def invalidate_tokens(keys):
+    keys = list(keys)
+    if not keys:
+        return
+    token_cache = get_token_cache()
+    token_cache.delete_many(keys)
+    # Запрос, прочитавший токен до фиксации, мог вернуть запись в кэш.
+    transaction.on_commit(lambda: token_cache.delete_many(keys))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    invalidate_tokens([instance.key])
+
+
+@receiver(post_save, sender=User)
+def token_user_changed(sender, instance, created, update_fields=None,
+                       **kwargs):
+    # last_login обновляется при каждом входе и на аутентификацию
+    # не влияет.
+    if created or update_fields and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_tokens(
+        Token.objects.filter(user_id=instance.pk)
+        .values_list('key', flat=True))
@@ -0,0 +1,431 @@
+"""Бенчмарк API: задержка, число SQL-запросов и размер ответов.
+
+Запросы выполняются в процессе через django.test.Client против базы,
+заполненной командой generate_fixture. Каждый запрос (вместе с
+подготовкой данных) идет в транзакции, которая откатывается, поэтому
+изменяющие запросы повторяются в одинаковых условиях. Результаты
+сравниваются с бюджетом: {СУБД: {масштаб: {сценарий: пределы}}}.
+"""
+import base64
+import io
+import json
+import math
+import os
+import resource
+import statistics
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from api.authentication import CachedTokenAuthentication
+from api.urls import router
+from foodgram.constants import (BENCHMARK_BYTES_TOLERANCE,
+                                BENCHMARK_LATENCY_SLACK_MS,
+                                BENCHMARK_LATENCY_TOLERANCE)
+from jobs.models import Job
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart
+from users.models import Subscription, User
+
+# Маршруты djoser для сценариев с письмами и управления учетной записью,
+# которые фронтенд не использует.
+EXCLUDED_ROUTES = {
+    ('users-activation', 'post'),
+    ('users-resend-activation', 'post'),
+    ('users-reset-password', 'post'),
+    ('users-reset-password-confirm', 'post'),
+    ('users-reset-username', 'post'),
+    ('users-reset-username-confirm', 'post'),
+    ('users-set-username', 'post'),
+    ('users-detail', 'put'),
+    ('users-detail', 'patch'),
+    ('users-detail', 'delete'),
+}
+BULK_IDS = 50
+
+
+def png_bytes(size=(64, 64)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 120, 40)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def measure_call(label, func, repeat, rss=False):
+    """Строка отчета: медиана времени func и пик аллокаций Python.
+
+    Пик tracemalloc сбрасывается перед каждым вызовом, в отчет идет пик
+    последнего; rss добавляет максимальный RSS процесса (память вне кучи
+    Python, например буферы Pillow).
+    """
+    timings = []
+    tracemalloc.start()
+    for _ in range(repeat):
+        tracemalloc.reset_peak()
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    line = (f'{label}: median {statistics.median(timings) * 1e3:.1f} мс, '
+            f'пик аллокаций {peak / 1024 / 1024:.1f} МБ')
+    if rss:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        line += f', max RSS процесса {max_rss / 1024:.0f} МБ'
+    return line
+
+
+class Scenario:
+    """Один запрос к одному маршруту от имени одного из пользователей."""
+
+    def __init__(self, name, route, method, path, user=None, data=None,
+                 content_type='application/json', setup=None, status=200):
+        self.name = name
+        self.route = route
+        self.method = method
+        self.path = path
+        self.user = user
+        self.data = data
+        self.content_type = content_type
+        self.setup = setup
+        self.status = status
+
+    def request(self, client, context):
+        path = self.path.format(**context)
+        data = self.data(context) if callable(self.data) else self.data
+        if data is None:
+            return client.generic(self.method.upper(), path)
+        if self.content_type == 'application/json':
+            data = json.dumps(data)
+        return client.generic(self.method.upper(), path, data,
+                              content_type=self.content_type)
+
+
+def recipe_payload(context):
+    return {
+        'name': 'Бенчмарк',
+        'text': 'Рецепт для замера.',
+        'cooking_time': 30,
+        'image': context['image'],
+        'ingredients': [{'id': pk, 'amount': 10}
+                        for pk in context['ingredient_ids']],
+    }
+
+
+def unfavorite(context):
+    Favorite.objects.filter(user_id=context['reader_id'],
+                            recipe_id=context['recipe_id']).delete()
+
+
+def favorite(context):
+    Favorite.objects.get_or_create(user_id=context['reader_id'],
+                                   recipe_id=context['recipe_id'])
+
+
+def uncart(context):
+    ShoppingCart.objects.filter(user_id=context['reader_id'],
+                                recipe_id=context['recipe_id']).delete()
+
+
+def cart(context):
+    ShoppingCart.objects.get_or_create(user_id=context['reader_id'],
+                                       recipe_id=context['recipe_id'])
+
+
+def unsubscribe(context):
+    Subscription.objects.filter(user_id=context['reader_id'],
+                                author_id=context['author_id']).delete()
+
+
+def subscribe(context):
+    Subscription.objects.get_or_create(user_id=context['reader_id'],
+                                       author_id=context['author_id'])
+
+
+def set_avatar(context):
+    User.objects.filter(pk=context['reader_id']).update(
+        avatar='avatars/bench.png')
+
+
+def create_job(context):
+    context['job_id'] = Job.objects.create(
+        kind='renditions', user_id=context['reader_id']).pk
+
+
+def bulk_ids(context):
+    return {'ids': context['bulk_ids']}
+
+
+def bulk_author_ids(context):
+    return {'ids': context['bulk_author_ids']}
+
+
+SCENARIOS = [
+    Scenario('api-root', 'api-root', 'get', '/api/', user='reader'),
+    Scenario('recipes list anon', 'recipes-list', 'get', '/api/recipes/'),
+    Scenario('recipes list', 'recipes-list', 'get', '/api/recipes/',
+             user='reader'),
+    Scenario('recipes list by author', 'recipes-list', 'get',
+             '/api/recipes/?author={author_id}', user='reader'),
+    Scenario('recipes list favorited', 'recipes-list', 'get',
+             '/api/recipes/?is_favorited=1', user='reader'),
+    Scenario('recipe create', 'recipes-list', 'post', '/api/recipes/',
+             user='author', data=recipe_payload, status=201),
+    Scenario('recipe detail anon', 'recipes-detail', 'get',
+             '/api/recipes/{recipe_id}/'),
+    Scenario('recipe detail', 'recipes-detail', 'get',
+             '/api/recipes/{recipe_id}/', user='reader'),
+    Scenario('recipe update', 'recipes-detail', 'put',
+             '/api/recipes/{own_recipe_id}/', user='author',
+             data=recipe_payload),
+    Scenario('recipe partial update', 'recipes-detail', 'patch',
+             '/api/recipes/{own_recipe_id}/', user='author',
+             data=lambda context: {
+                 'cooking_time': 45,
+                 'ingredients': recipe_payload(context)['ingredients']}),
+    Scenario('recipe delete', 'recipes-detail', 'delete',
+             '/api/recipes/{own_recipe_id}/', user='author', status=204),
+    Scenario('recipe short link', 'recipes-get-short-link', 'get',
+             '/api/recipes/{recipe_id}/get-link/', user='reader'),
+    Scenario('short link redirect', 'recipes:recipe_short_link', 'get',
+             '/s/{recipe_id}/', status=302),
+    Scenario('favorite add', 'recipes-add-favorite', 'post',
+             '/api/recipes/{recipe_id}/favorite/', user='reader',
+             setup=unfavorite, status=201),
+    Scenario('favorite remove', 'recipes-add-favorite', 'delete',
+             '/api/recipes/{recipe_id}/favorite/', user='reader',
+             setup=favorite, status=204),
+    Scenario('favorites bulk add', 'recipes-bulk-favorite', 'post',
+             '/api/recipes/favorite/', user='reader', data=bulk_ids),
+    Scenario('favorites bulk remove', 'recipes-bulk-favorite', 'delete',
+             '/api/recipes/favorite/', user='reader', data=bulk_ids),
+    Scenario('cart add', 'recipes-add-shopping-cart', 'post',
+             '/api/recipes/{recipe_id}/shopping_cart/', user='reader',
+             setup=uncart, status=201),
+    Scenario('cart remove', 'recipes-add-shopping-cart', 'delete',
+             '/api/recipes/{recipe_id}/shopping_cart/', user='reader',
+             setup=cart, status=204),
+    Scenario('cart bulk add', 'recipes-bulk-shopping-cart', 'post',
+             '/api/recipes/shopping_cart/', user='reader', data=bulk_ids),
+    Scenario('cart bulk remove', 'recipes-bulk-shopping-cart', 'delete',
+             '/api/recipes/shopping_cart/', user='reader', data=bulk_ids),
+    Scenario('cart download txt', 'recipes-download-shopping-cart', 'get',
+             '/api/recipes/download_shopping_cart/', user='cart_user'),
+    Scenario('cart download json', 'recipes-download-shopping-cart', 'get',
+             '/api/recipes/download_shopping_cart/?format=json',
+             user='cart_user'),
+    Scenario('feed', 'recipes-subscriptions-feed', 'get',
+             '/api/recipes/feed/', user='reader'),
+    Scenario('ingredients all', 'ingredients-list', 'get',
+             '/api/ingredients/'),
+    Scenario('ingredients prefix', 'ingredients-list', 'get',
+             '/api/ingredients/?name={ingredient_prefix}'),
+    Scenario('ingredients fuzzy', 'ingredients-list', 'get',
+             '/api/ingredients/?name={ingredient_prefix}&fuzzy=1'),
+    Scenario('ingredient detail', 'ingredients-detail', 'get',
+             '/api/ingredients/{ingredient_id}/'),
+    Scenario('users list', 'users-list', 'get', '/api/users/'),
+    Scenario('user register', 'users-list', 'post', '/api/users/',
+             data={'email': 'bench@example.com', 'username': 'bench',
+                   'first_name': 'Бенч', 'last_name': 'Марк',
+                   'password': 'Qz7-bench-password'},
+             status=201),
+    Scenario('user detail', 'users-detail', 'get',
+             '/api/users/{author_id}/', user='reader'),
+    Scenario('me', 'users-me', 'get', '/api/users/me/', user='reader'),
+    Scenario('avatar upload', 'users-avatar', 'put', '/api/users/me/avatar/',
+             user='reader', data=lambda context: context['png'],
+             content_type='image/png'),
+    Scenario('avatar delete', 'users-avatar', 'delete',
+             '/api/users/me/avatar/', user='reader', setup=set_avatar,
+             status=204),
+    Scenario('subscriptions', 'users-subscriptions', 'get',
+             '/api/users/subscriptions/?recipes_limit=3', user='reader'),
+    Scenario('subscribe', 'users-subscribe', 'post',
+             '/api/users/{author_id}/subscribe/', user='reader',
+             setup=unsubscribe, status=201),
+    Scenario('unsubscribe', 'users-subscribe', 'delete',
+             '/api/users/{author_id}/subscribe/', user='reader',
+             setup=subscribe, status=204),
+    Scenario('subscribe bulk', 'users-bulk-subscribe', 'post',
+             '/api/users/subscribe/', user='reader', data=bulk_author_ids),
+    Scenario('unsubscribe bulk', 'users-bulk-subscribe', 'delete',
+             '/api/users/subscribe/', user='reader', data=bulk_author_ids),
+    Scenario('set password', 'users-set-password', 'post',
+             '/api/users/set_password/', user='reader',
+             data=lambda context: {
+                 'current_password': context['password'],
+                 'new_password': 'Qz7-bench-password'},
+             status=204),
+    Scenario('job status', 'jobs-detail', 'get', '/api/jobs/{job_id}/',
+             user='reader', setup=create_job),
+    Scenario('token login', 'login', 'post', '/api/auth/token/login/',
+             data=lambda context: {'email': context['reader_email'],
+                                   'password': context['password']}),
+    Scenario('token logout', 'logout', 'post', '/api/auth/token/logout/',
+             user='reader', status=204),
+]
+
+
+def uncovered_routes():
+    """Маршруты api.urls (с методами), для которых нет сценария."""
+    covered = {(scenario.route, scenario.method) for scenario in SCENARIOS}
+    routes = set()
+    for pattern in router.urls:
+        actions = getattr(pattern.callback, 'actions', None) or {'get': ''}
+        routes.update((pattern.name, method) for method in actions)
+    routes.update((name, 'post') for name in ('login', 'logout'))
+    return sorted(routes - covered - EXCLUDED_ROUTES)
+
+
+def build_context(manifest):
+    """Объекты и заготовки для сценариев по манифесту generate_fixture."""
+    samples = manifest['samples']
+    reader = User.objects.get(email=samples['heavy_reader'])
+    cart_user = User.objects.get(email=samples['cart_user'])
+    author = User.objects.get(pk=samples['prolific_author'])
+    first_recipe, last_recipe = manifest['recipes']
+    first_user, last_user = manifest['users']
+    ingredients = list(Ingredient.objects.order_by('pk')[:5])
+    png = png_bytes()
+    context = {
+        'password': manifest['password'],
+        'reader_id': reader.pk,
+        'reader_email': reader.email,
+        'author_id': samples['popular_author'],
+        'recipe_id': samples['popular_recipe'],
+        'own_recipe_id': (Recipe.objects.filter(author=author)
+                          .order_by('pk').values_list('pk', flat=True)
+                          .first()),
+        'ingredient_ids': [ingredient.pk for ingredient in ingredients],
+        'ingredient_id': ingredients[0].pk,
+        'ingredient_prefix': ingredients[0].name[:3],
+        'bulk_ids': list(range(first_recipe, min(first_recipe + BULK_IDS,
+                                                 last_recipe + 1))),
+        'bulk_author_ids': [pk for pk in range(
+            first_user, min(first_user + BULK_IDS, last_user + 1))
+            if pk != reader.pk],
+        'png': png,
+        'image': 'data:image/png;base64,' + base64.b64encode(png).decode(),
+        'users': {'reader': reader, 'author': author,
+                  'cart_user': cart_user},
+    }
+    return context
+
+
+def make_client(user=None):
+    headers = {'HTTP_HOST': 'localhost'}
+    if user is not None:
+        token, _ = Token.objects.get_or_create(user=user)
+        headers['HTTP_AUTHORIZATION'] = f'Token {token.key}'
+    return Client(**headers)
+
+
+def measure(scenario, context, repeat, warmup=1):
+    """p50/p95 задержки (мс), максимум запросов и размер ответа."""
+    user = context['users'][scenario.user] if scenario.user else None
+    client = make_client(user)
+    timings, queries, size, statuses = [], 0, 0, set()
+    for iteration in range(warmup + repeat):
+        with transaction.atomic():
+            if scenario.setup:
+                scenario.setup(context)
+            if user is not None:
+                # Кэш токенов прогревается вне замера: запись сбрасывают
+                # подготовка данных и откаченные изменения прошлых
+                # итераций, а живет она меньше прогона.
+                CachedTokenAuthentication().authenticate_credentials(
+                    user.auth_token.key)
+            # Журнал запросов ограничен (deque на 9000 записей): у
+            # заполненного CaptureQueriesContext насчитал бы ноль.
+            connection.queries_log.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = scenario.request(client, context)
+                body = (b''.join(response.streaming_content)
+                        if response.streaming else response.content)
+                elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+        if iteration < warmup:
+            continue
+        timings.append(elapsed * 1000)
+        queries = max(queries, len(captured))
+        size = max(size, len(body))
+        statuses.add(response.status_code)
+    return {
+        'p50_ms': round(percentile(timings, 0.5), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'queries': queries,
+        'bytes': size,
+        'status': sorted(statuses),
+    }
+
+
+def run(manifest, repeat, only=None):
+    context = build_context(manifest)
+    results = {}
+    for scenario in SCENARIOS:
+        if only and not any(part in scenario.name for part in only):
+            continue
+        results[scenario.name] = measure(scenario, context, repeat)
+        results[scenario.name]['expected_status'] = scenario.status
+    return results
+
+
+def compare(results, budget):
+    """Нарушения бюджета: [(сценарий, описание)].
+
+    Проверяются только статус, число запросов и размер ответа: они не
+    зависят от машины, на которой запущен замер.
+    """
+    violations = []
+    for name, result in results.items():
+        if result['status'] != [result['expected_status']]:
+            violations.append((name, f'статус {result["status"]} вместо '
+                                     f'{result["expected_status"]}'))
+        limits = budget.get(name)
+        if limits is None:
+            continue
+        if result['queries'] > limits['queries']:
+            violations.append((name, f'запросов {result["queries"]} > '
+                                     f'{limits["queries"]}'))
+        if result['bytes'] > limits['bytes'] * (
+                1 + BENCHMARK_BYTES_TOLERANCE):
+            violations.append((name, f'ответ {result["bytes"]} Б > '
+                                     f'{limits["bytes"]} Б'))
+    return violations
+
+
+def compare_latency(results, budget,
+                    tolerance=BENCHMARK_LATENCY_TOLERANCE):
+    """Рост p95 относительно бюджета: [(сценарий, описание)].
+
+    Время зависит от машины, поэтому сравнивать его имеет смысл только
+    с бюджетом, записанным в том же окружении.
+    """
+    regressions = []
+    for name, result in results.items():
+        limits = budget.get(name)
+        # Абсолютный запас гасит шум на запросах в единицы миллисекунд.
+        if limits is not None and result['p95_ms'] > limits['p95_ms'] * (
+                1 + tolerance) + BENCHMARK_LATENCY_SLACK_MS:
+            regressions.append((name, f'p95 {result["p95_ms"]} мс > '
+                                      f'{limits["p95_ms"]} мс'))
+    return regressions
+
+
+def budget_entry(result):
+    return {key: result[key] for key in ('queries', 'bytes', 'p95_ms')}
+
+
+def default_budget_path():
+    return os.path.join(settings.BASE_DIR, 'perf_budget.json')
@@ -0,0 +1,98 @@
+"""Массовое добавление и удаление связей пользователя с объектами.
+
+Существование объектов и уже имеющиеся связи проверяются одним
+запросом, вставка и удаление выполняются одним запросом каждое.
+Изменения связей пользователя выполняются под блокировкой его строки
+(lock_links), поэтому параллельные запросы не считают одну и ту же
+связь созданной или удаленной дважды.
+"""
+from django.db.models import Exists, OuterRef
+from rest_framework import serializers
+
+from foodgram.constants import BULK_MAX_ITEMS
+
+CREATED = 'created'
+EXISTS = 'exists'
+DELETED = 'deleted'
+NOT_LINKED = 'not_linked'
+NOT_FOUND = 'not_found'
+FORBIDDEN = 'forbidden'
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    """Список идентификаторов для массовой операции."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_MAX_ITEMS,
+    )
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
+
+
+def lock_links(user):
+    """Заблокировать строку пользователя до конца транзакции."""
+    list(type(user).objects.select_for_update()
+         .filter(pk=user.pk).values_list('pk', flat=True))
+
+
+def lookup_targets(link_model, user, field, target_model, ids):
+    """{id: есть ли связь} для существующих объектов из ids."""
+    links = link_model.objects.filter(user=user, **{field: OuterRef('pk')})
+    return dict(
+        target_model.objects
+        .filter(pk__in=ids)
+        .annotate(linked=Exists(links))
+        .values_list('pk', 'linked')
+    )
+
+
+def bulk_link(link_model, user, field, target_model, ids, forbidden=()):
+    """Создать связи user с объектами ids.
+
+    Возвращает результаты по каждому id и список id новых связей.
+    Вызывается внутри транзакции.
+    """
+    lock_links(user)
+    found = lookup_targets(link_model, user, field, target_model, ids)
+    results, created = [], []
+    for pk in ids:
+        if pk not in found:
+            status = NOT_FOUND
+        elif pk in forbidden:
+            status = FORBIDDEN
+        elif found[pk]:
+            status = EXISTS
+        else:
+            status = CREATED
+            created.append(pk)
+        results.append({'id': pk, 'status': status})
+    link_model.objects.bulk_create(
+        link_model(user=user, **{f'{field}_id': pk}) for pk in created)
+    return results, created
+
+
+def bulk_unlink(link_model, user, field, target_model, ids):
+    """Удалить связи user с объектами ids.
+
+    Возвращает результаты по каждому id и список id удаленных связей.
+    Вызывается внутри транзакции.
+    """
+    lock_links(user)
+    found = lookup_targets(link_model, user, field, target_model, ids)
+    results, deleted = [], []
+    for pk in ids:
+        if pk not in found:
+            status = NOT_FOUND
+        elif found[pk]:
+            status = DELETED
+            deleted.append(pk)
+        else:
+            status = NOT_LINKED
+        results.append({'id': pk, 'status': status})
+    if deleted:
+        link_model.objects.filter(
+            user=user, **{f'{field}_id__in': deleted}).delete()
+    return results, deleted
@@ -0,0 +1,41 @@
+import hashlib
+from functools import wraps
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.md5(repr(parts).encode()).hexdigest())
+
+
+def condition(validators, vary=('Authorization',)):
+    """Условный GET для метода ViewSet.
+
+    validators(view, request, *args, **kwargs) возвращает пару
+    (etag, last_modified) без построения ответа. При совпадении с
+    If-None-Match / If-Modified-Since отвечаем 304 и не вызываем метод.
+    """
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            etag, last_modified = validators(self, request, *args, **kwargs)
+            timestamp = (int(last_modified.timestamp())
+                         if last_modified else None)
+            response = None
+            if etag or timestamp:
+                response = get_conditional_response(
+                    request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = method(self, request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                if etag:
+                    response.headers.setdefault('ETag', etag)
+                if timestamp:
+                    response.headers.setdefault(
+                        'Last-Modified', http_date(timestamp))
+                patch_vary_headers(response, vary)
+            return response
+        return wrapper
+    return decorator
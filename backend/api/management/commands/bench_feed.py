@@ -0,0 +1,104 @@
+import random
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from foodgram.constants import CONST_PAGES
+from recipes import feed
+from recipes.models import Recipe
+from users.models import Subscription, User
+
+
+class Command(BaseCommand):
+    help = ('Сравнение чтения ленты подписок: JOIN по подпискам против '
+            'таблицы FeedEntry. Данные создаются во временной транзакции '
+            'и откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--authors', type=int, default=1000)
+        parser.add_argument('--follows', type=int, default=10,
+                            help='Подписок у каждого пользователя.')
+        parser.add_argument('--popular', type=int, default=0,
+                            help='Авторов, на которых подписаны все.')
+        parser.add_argument('--recipes', type=int, default=20,
+                            help='Рецептов у каждого автора.')
+        parser.add_argument('--samples', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            started = time.perf_counter()
+            user_ids = self.create_data(rng, options)
+            self.report('Генерация данных', time.perf_counter() - started)
+
+            cache.delete(feed.POPULAR_AUTHORS_CACHE_KEY)
+            started = time.perf_counter()
+            feed.rebuild()
+            self.report('Построение лент', time.perf_counter() - started)
+
+            sample = rng.sample(user_ids, min(options['samples'],
+                                              len(user_ids)))
+            self.compare(sample)
+            cache.delete(feed.POPULAR_AUTHORS_CACHE_KEY)
+            transaction.set_rollback(True)
+
+    def create_data(self, rng, options):
+        users = User.objects.bulk_create(
+            (User(username=f'bench_{i}', email=f'bench_{i}@example.com',
+                  first_name='Bench', last_name=str(i), password='!')
+             for i in range(options['users'] + options['authors'])),
+            batch_size=1000,
+        )
+        readers, authors = (users[:options['users']],
+                            users[options['users']:])
+        Recipe.objects.bulk_create(
+            (Recipe(author=author, name=f'Bench {i}', text='bench',
+                    cooking_time=10, image='recipes/images/bench.jpg')
+             for author in authors for i in range(options['recipes'])),
+            batch_size=1000,
+        )
+        popular = authors[:options['popular']]
+        regular = authors[options['popular']:]
+        Subscription.objects.bulk_create(
+            (Subscription(user=reader, author=author)
+             for reader in readers
+             for author in popular + rng.sample(regular, options['follows'])),
+            batch_size=1000,
+        )
+        self.stdout.write(
+            f'Подписок: {Subscription.objects.count()}, '
+            f'рецептов: {Recipe.objects.count()}')
+        return [user.id for user in readers]
+
+    def compare(self, user_ids):
+        def measure(query):
+            timings = []
+            for user_id in user_ids:
+                started = time.perf_counter()
+                list(query(user_id)
+                     .order_by('-pub_date', '-id')
+                     .values_list('id', flat=True)[:CONST_PAGES])
+                timings.append(time.perf_counter() - started)
+            return timings
+
+        join = measure(lambda user_id: Recipe.objects.filter(
+            author__subscribers__user_id=user_id))
+        table = measure(lambda user_id: Recipe.objects.filter(
+            feed.feed_filter(User(pk=user_id))))
+        self.report_timings('JOIN по подпискам', join)
+        self.report_timings('FeedEntry', table)
+
+    def report(self, label, seconds):
+        self.stdout.write(f'{label}: {seconds:.2f} с')
+
+    def report_timings(self, label, timings):
+        timings = sorted(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1] if timings else 0
+        self.stdout.write(
+            f'{label}: median {statistics.median(timings) * 1e3:.2f} мс, '
+            f'p95 {p95 * 1e3:.2f} мс')
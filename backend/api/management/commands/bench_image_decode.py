@@ -0,0 +1,56 @@
+import base64
+import io
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from PIL import Image
+from rest_framework import serializers
+
+from api.benchmarks import measure_call
+from foodgram.reformat_image import ReformattingBase64
+
+
+def make_payload(size):
+    """PNG из случайного шума размером примерно size байт в виде data URL."""
+    side = max(1, int((size / 3) ** 0.5))
+    image = Image.frombytes('RGB', (side, side),
+                            bytes(range(256)) * (side * side * 3 // 256 + 1))
+    noise = Image.effect_noise((side, side), 128).convert('RGB')
+    image = Image.blend(image, noise, 0.5)
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', compress_level=0)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/png;base64,{encoded}', buffer.tell()
+
+
+def legacy_decode(payload):
+    """Прежняя схема: строка декодируется дважды, затем проверка Pillow."""
+    _, img_str = payload.split(';base64,')
+    base64.b64decode(img_str)
+    content = ContentFile(base64.b64decode(img_str), name='temp.png')
+    return serializers.ImageField().to_internal_value(content)
+
+
+class Command(BaseCommand):
+    help = ('Время и пиковая память разбора base64-изображения полем '
+            'ReformattingBase64 для разных размеров загрузки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=float, nargs='+',
+                            default=[0.1, 1, 5, 9.5],
+                            help='Размеры изображений в МБ.')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        field = ReformattingBase64()
+        for megabytes in options['sizes']:
+            payload, size = make_payload(int(megabytes * 1024 * 1024))
+            self.stdout.write(f'Изображение {size / 1024 / 1024:.2f} МБ:')
+            self.stdout.write(measure_call(
+                '  двойное декодирование', lambda: legacy_decode(payload),
+                options['repeat'], rss=True))
+            self.stdout.write(measure_call(
+                '  ReformattingBase64',
+                lambda: field.to_internal_value(payload),
+                options['repeat'], rss=True))
+
@@ -0,0 +1,52 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.models import Ingredient
+from recipes.search import IngredientIndex
+
+
+class Command(BaseCommand):
+    help = 'Сравнение поиска ингредиентов: индекс в памяти против ORM'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        if not names:
+            self.stdout.write(self.style.ERROR('Таблица ингредиентов пуста.'))
+            return
+        rng = random.Random(options['seed'])
+        queries = [
+            rng.choice(names)[:rng.randint(1, 4)]
+            for _ in range(options['queries'])
+        ]
+
+        index = IngredientIndex()
+        started = time.perf_counter()
+        index.build(version=0)
+        build_time = time.perf_counter() - started
+
+        def measure(search):
+            started = time.perf_counter()
+            for query in queries:
+                search(query)
+            return (time.perf_counter() - started) / len(queries) * 1e6
+
+        orm = measure(lambda query: list(
+            Ingredient.objects
+            .filter(name__istartswith=query)
+            .values('id', 'name', 'measurement_unit')
+        ))
+        prefix = measure(index.prefix)
+        fuzzy = measure(index.fuzzy)
+
+        self.stdout.write(f'Ингредиентов: {len(names)}, '
+                          f'запросов: {len(queries)}')
+        self.stdout.write(f'Построение индекса: {build_time * 1e3:.1f} мс')
+        self.stdout.write(f'ORM istartswith: {orm:.1f} мкс/запрос')
+        self.stdout.write(f'Индекс, префикс: {prefix:.1f} мкс/запрос')
+        self.stdout.write(f'Индекс, нечеткий: {fuzzy:.1f} мкс/запрос')
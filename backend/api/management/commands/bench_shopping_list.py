@@ -0,0 +1,112 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+
+from recipes import shopping_list
+from recipes.models import (Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart)
+from recipes.utils import get_ingredients_list
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Сравнение выгрузки списка покупок: JOIN с SUM против '
+            'агрегированной таблицы. Данные создаются во временной '
+            'транзакции и откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--recipes', type=int, default=50,
+                            help='Рецептов в корзине каждого пользователя.')
+        parser.add_argument('--pool', type=int, default=500,
+                            help='Всего рецептов, из которых берутся корзины.')
+        parser.add_argument('--ingredients', type=int, default=8,
+                            help='Ингредиентов в рецепте.')
+        parser.add_argument('--samples', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        if len(ingredient_ids) < options['ingredients']:
+            raise CommandError('Сначала загрузите ингредиенты.')
+        if options['pool'] < options['recipes']:
+            raise CommandError('--pool должен быть не меньше --recipes.')
+        rng = random.Random(options['seed'])
+
+        with transaction.atomic():
+            started = time.perf_counter()
+            user_ids = self.create_data(rng, ingredient_ids, options)
+            self.report('Генерация данных', time.perf_counter() - started)
+
+            started = time.perf_counter()
+            count = shopping_list.rebuild()
+            self.report(f'Построение агрегатов ({count} строк)',
+                        time.perf_counter() - started)
+
+            sample = rng.sample(user_ids, min(options['samples'],
+                                              len(user_ids)))
+            self.compare(sample)
+            transaction.set_rollback(True)
+
+    def create_data(self, rng, ingredient_ids, options):
+        users = User.objects.bulk_create(
+            (User(username=f'bench_{i}', email=f'bench_{i}@example.com',
+                  first_name='Bench', last_name=str(i), password='!')
+             for i in range(options['users'])),
+            batch_size=1000,
+        )
+        recipes = Recipe.objects.bulk_create(
+            (Recipe(author=users[0], name=f'Bench {i}', text='bench',
+                    cooking_time=10, image='recipes/images/bench.jpg')
+             for i in range(options['pool'])),
+            batch_size=1000,
+        )
+        IngredientInRecipe.objects.bulk_create(
+            (IngredientInRecipe(recipe=recipe, ingredient_id=ingredient_id,
+                                amount=rng.randint(1, 500))
+             for recipe in recipes
+             for ingredient_id in rng.sample(ingredient_ids,
+                                             options['ingredients'])),
+            batch_size=1000,
+        )
+        for user in users:
+            ShoppingCart.objects.bulk_create(
+                ShoppingCart(user=user, recipe=recipe)
+                for recipe in rng.sample(recipes, options['recipes'])
+            )
+        return [user.id for user in users]
+
+    def compare(self, user_ids):
+        def measure(query):
+            timings = []
+            for user_id in user_ids:
+                started = time.perf_counter()
+                list(query(user_id))
+                timings.append(time.perf_counter() - started)
+            return timings
+
+        join = measure(lambda user_id: (
+            IngredientInRecipe.objects
+            .filter(recipe__shopping_carts__user_id=user_id)
+            .values('ingredient__name', 'ingredient__measurement_unit')
+            .annotate(total_amount=Sum('amount'))
+            .order_by('ingredient__name')
+        ))
+        table = measure(lambda user_id: get_ingredients_list(
+            User(pk=user_id)))
+        self.report_timings('JOIN + SUM', join)
+        self.report_timings('ShoppingListItem', table)
+
+    def report(self, label, seconds):
+        self.stdout.write(f'{label}: {seconds:.2f} с')
+
+    def report_timings(self, label, timings):
+        timings = sorted(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1] if timings else 0
+        self.stdout.write(
+            f'{label}: median {statistics.median(timings) * 1e3:.2f} мс, '
+            f'p95 {p95 * 1e3:.2f} мс')
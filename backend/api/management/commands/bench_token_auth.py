@@ -0,0 +1,65 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+
+from api.authentication import CachedTokenAuthentication, get_token_cache
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Сравнение аутентификации по токену: TokenAuthentication '
+            'против CachedTokenAuthentication (запросов к БД и время на '
+            'запрос). Токены создаются во временной транзакции и '
+            'откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100,
+                            help='Пользователей (разных токенов).')
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        users = list(User.objects.filter(is_active=True)
+                     .order_by('pk')[:options['users']])
+        if not users:
+            raise CommandError('Нет пользователей: загрузите данные.')
+        factory = APIRequestFactory()
+        with transaction.atomic():
+            keys = [Token.objects.get_or_create(user=user)[0].key
+                    for user in users]
+            requests = [
+                factory.get('/api/users/me/',
+                            HTTP_AUTHORIZATION=f'Token {rng.choice(keys)}')
+                for _ in range(options['requests'])
+            ]
+            get_token_cache().clear()
+            for label, backend in (
+                    ('TokenAuthentication', TokenAuthentication()),
+                    ('CachedTokenAuthentication',
+                     CachedTokenAuthentication())):
+                self.measure(label, backend, requests)
+            self.stdout.write(f'Кэш: {get_token_cache().stats()}')
+            get_token_cache().clear()
+            transaction.set_rollback(True)
+
+    def measure(self, label, backend, requests):
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            for request in requests:
+                started = time.perf_counter()
+                backend.authenticate(request)
+                timings.append(time.perf_counter() - started)
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(
+            f'{label}: {len(queries) / len(requests):.3f} запроса на '
+            f'запрос, median {statistics.median(timings) * 1e6:.0f} мкс, '
+            f'p95 {p95 * 1e6:.0f} мкс')
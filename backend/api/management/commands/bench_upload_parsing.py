@@ -0,0 +1,62 @@
+import base64
+import json
+import os
+
+from django.core.management.base import BaseCommand
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test.client import (BOUNDARY, MULTIPART_CONTENT, RequestFactory,
+                               encode_multipart)
+from rest_framework.parsers import JSONParser, MultiPartParser
+from rest_framework.request import Request
+
+from api.benchmarks import measure_call
+from api.parsers import RawAvatarParser
+
+
+class Command(BaseCommand):
+    help = ('Время разбора запроса и пиковая память при загрузке '
+            'изображения: base64 в JSON, multipart/form-data и тело '
+            'запроса (PUT image/*).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=float, nargs='+',
+                            default=[0.1, 1, 5],
+                            help='Размеры файлов в МБ.')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        for megabytes in options['sizes']:
+            # Сигнатура JPEG и случайные байты: измеряется только разбор
+            # запроса, проверка Pillow — в команде bench_image_decode.
+            content = b'\xff\xd8\xff\xe0' + os.urandom(
+                int(megabytes * 1024 * 1024))
+            encoded = base64.b64encode(content).decode()
+            bodies = {
+                'json': (json.dumps({
+                    'avatar': f'data:image/jpeg;base64,{encoded}'}).encode(),
+                    'application/json', JSONParser()),
+                'multipart': (encode_multipart(BOUNDARY, {
+                    'avatar': SimpleUploadedFile('upload.jpg', content)}),
+                    MULTIPART_CONTENT, MultiPartParser()),
+                'raw': (content, 'image/jpeg', RawAvatarParser()),
+            }
+            self.stdout.write(f'Файл {megabytes} МБ:')
+
+            def parse(mode):
+                body, content_type, parser = bodies[mode]
+                request = Request(
+                    factory.generic('PUT', '/', body, content_type),
+                    parsers=[parser])
+                value = request.data['avatar']
+                if mode == 'json':
+                    _, _, img_str = value.partition(';base64,')
+                    value = base64.b64decode(img_str)
+                return value
+
+            for mode, label in (('json', 'JSON + base64'),
+                                ('multipart', 'multipart'),
+                                ('raw', 'тело запроса')):
+                self.stdout.write(measure_call(
+                    f'  {label}', lambda: parse(mode), options['repeat']))
+
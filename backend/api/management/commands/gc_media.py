@@ -0,0 +1,82 @@
+import os
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from foodgram import renditions
+from jobs import queue
+from jobs.models import Job
+from recipes.models import Recipe
+from users.models import User
+
+# Каталоги загрузок и модели/поля, которые на них ссылаются.
+MEDIA_SOURCES = (
+    (Recipe, 'image'),
+    (User, 'avatar'),
+)
+# Выгрузки фоновых задач (result['file']); обычно удаляются вместе с
+# задачей (prune_jobs), здесь — оставшиеся без задачи.
+EXPORTS_DIRECTORY = 'exports/'
+
+
+class Command(BaseCommand):
+    help = ('Удаление изображений, аватаров (вместе с рендициями) и '
+            'выгрузок, на которые не ссылается ни одна запись.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет удалено.')
+        parser.add_argument(
+            '--grace', type=int, default=3600,
+            help='Не трогать файлы моложе указанного числа секунд: '
+                 'запись о них могла еще не попасть в базу.')
+
+    def handle(self, *args, **options):
+        referenced = set()
+        directories = set()
+        for model, field in MEDIA_SOURCES:
+            directories.add(model._meta.get_field(field).upload_to)
+            names = (model.objects.exclude(**{field: ''})
+                     .exclude(**{f'{field}__isnull': True})
+                     .values_list(field, flat=True))
+            for name in names.iterator():
+                referenced.add(name)
+                referenced.update(renditions.rendition_names(name))
+        directories.add(EXPORTS_DIRECTORY)
+        for result in (Job.objects.exclude(result=None)
+                       .values_list('result', flat=True).iterator()):
+            if isinstance(result, dict) and result.get('file'):
+                referenced.add(result['file'])
+
+        deadline = time.time() - options['grace']
+        removed = freed = 0
+        for directory in sorted(directories):
+            for name in self.walk(directory.rstrip('/')):
+                if name in referenced:
+                    continue
+                path = default_storage.path(name)
+                if os.path.getmtime(path) > deadline:
+                    continue
+                size = os.path.getsize(path)
+                if options['dry_run']:
+                    self.stdout.write(name)
+                elif name.startswith(EXPORTS_DIRECTORY):
+                    queue.delete_result_file({'file': name})
+                else:
+                    default_storage.delete(name)
+                removed += 1
+                freed += size
+        action = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} файлов: {removed}, {freed / 1024 / 1024:.1f} МБ.'))
+
+    def walk(self, directory):
+        if not default_storage.exists(directory):
+            return
+        subdirectories, files = default_storage.listdir(directory)
+        for name in files:
+            yield f'{directory}/{name}'
+        for subdirectory in subdirectories:
+            yield from self.walk(f'{directory}/{subdirectory}')
@@ -0,0 +1,64 @@
+import json
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from foodgram import synthetic
+from foodgram.constants import FIXTURE_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = ('Генерация синтетических пользователей, рецептов, избранного, '
+            'корзин и подписок для нагрузочного тестирования. Сводка '
+            '(объемы, пароль, характерные объекты) пишется в манифест, '
+            'на который ссылаются бенчмарки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', type=float, default=1,
+            help='Масштаб: 1 — тысяча пользователей и 5000 рецептов.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--batch-size', type=int, default=FIXTURE_BATCH_SIZE)
+        parser.add_argument(
+            '--replace', action='store_true',
+            help='Удалить ранее сгенерированные данные и их записи в кэше.')
+        parser.add_argument(
+            '--manifest', default='fixture_manifest.json')
+
+    def handle(self, *args, **options):
+        if options['scale'] <= 0 or options['batch_size'] < 1:
+            raise CommandError(
+                '--scale и --batch-size должны быть положительными.')
+        started = time.perf_counter()
+        if synthetic.fixture_users().exists():
+            if not options['replace']:
+                raise CommandError('Данные уже сгенерированы: '
+                                   'запустите с --replace.')
+            synthetic.clear()
+            self.stdout.write(
+                f'Старые данные удалены за '
+                f'{time.perf_counter() - started:.1f} с.')
+        # Рецепты строятся на ингредиентах pre_data: недостающие
+        # догружаются, уже загруженные пропускаются.
+        call_command('load_ingridient_list', synthetic.INGREDIENTS_PATH,
+                     stdout=self.stdout)
+
+        generator = synthetic.Generator(
+            options['scale'], options['seed'], options['batch_size'])
+        try:
+            manifest = generator.run()
+        except ValueError as error:
+            raise CommandError(error)
+        manifest['elapsed'] = round(time.perf_counter() - started, 1)
+        with open(options['manifest'], 'w', encoding='utf-8') as file:
+            json.dump(manifest, file, ensure_ascii=False, indent=2)
+
+        for table, count in manifest['counts'].items():
+            self.stdout.write(f'{table}: {count}')
+        total = sum(manifest['counts'].values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано {total} строк за {manifest["elapsed"]} с '
+            f'({total / manifest["elapsed"]:.0f} строк/с), манифест: '
+            f'{options["manifest"]}.'))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from foodgram import renditions
+from recipes.models import Recipe
+from recipes.tasks import renditions_published
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Создание рендиций для уже загруженных изображений и аватаров'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать рендиции, даже если они уже есть.')
+
+    def handle(self, *args, **options):
+        sources = (
+            ('Рецепты', Recipe.objects.exclude(image=''), 'image'),
+            ('Аватары', User.objects.exclude(avatar='').exclude(
+                avatar__isnull=True), 'avatar'),
+        )
+        for label, queryset, field in sources:
+            created = failed = 0
+            for obj in queryset.only('pk', field).iterator():
+                field_file = getattr(obj, field)
+                if not options['force'] and renditions.has_renditions(
+                        field_file):
+                    continue
+                try:
+                    renditions.generate(field_file)
+                except (OSError, ValueError) as error:
+                    failed += 1
+                    self.stdout.write(self.style.ERROR(
+                        f'{field_file.name}: {error}'))
+                    continue
+                renditions_published(obj)
+                created += 1
+            self.stdout.write(self.style.SUCCESS(
+                f'{label}: создано {created}, ошибок {failed}.'))
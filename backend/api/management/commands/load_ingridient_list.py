@@ -1,22 +1,73 @@
-import json
-from recipes.models import Ingredient
-from django.core.management.base import BaseCommand
+import os
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.readers import FORMATS, detect_format, iter_records
+from foodgram.constants import INGREDIENT_LOAD_BATCH_SIZE, INGREDIENTS_TABLE
+from recipes.models import Ingredient, TableVersion
+
+FIELDS = ('name', 'measurement_unit')
 
 
 class Command(BaseCommand):
-    help = 'Загрузка ингредиентов из ingredients.json'
-
-    def handle(self, *args, **kwargs):
-        with open('pre_data/ingredients.json', encoding='utf-8') as file:
-            data = json.load(file)
-            count = 0
-            for item in data:
-                obj, created = Ingredient.objects.get_or_create(
-                    name=item['name'],
-                    measurement_unit=item['measurement_unit']
-                )
-                if created:
-                    count += 1
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f'{count} ingredients successfully loaded.'))
+    help = ('Загрузка ингредиентов из JSON-массива, NDJSON или CSV '
+            '(name,measurement_unit) пакетной вставкой.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=os.path.join('pre_data', 'ingredients.json'))
+        parser.add_argument(
+            '--format', choices=FORMATS, dest='file_format',
+            help='Формат файла; по умолчанию определяется по расширению.')
+        parser.add_argument(
+            '--batch-size', type=int, default=INGREDIENT_LOAD_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            file_format = options['file_format'] or detect_format(path)
+        except ValueError as error:
+            raise CommandError(error)
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть положительным.')
+
+        started = time.perf_counter()
+        rows = 0
+        with open(path, encoding='utf-8', newline='') as file, \
+                transaction.atomic():
+            before = Ingredient.objects.count()
+            records = iter_records(file, file_format, FIELDS)
+            try:
+                while batch := list(islice(records, batch_size)):
+                    objs = [self.build(rows + number, record)
+                            for number, record in enumerate(batch, 1)]
+                    # Повторы в файле и уже загруженные позиции отсекает
+                    # ограничение unique_ingredient.
+                    Ingredient.objects.bulk_create(
+                        objs, ignore_conflicts=True)
+                    rows += len(objs)
+            except ValueError as error:
+                raise CommandError(f'{path}: {error}')
+            created = Ingredient.objects.count() - before
+            # bulk_create не отправляет post_save, поэтому версия
+            # таблицы для кэшей поднимается один раз за загрузку.
+            if created:
+                TableVersion.objects.bump(INGREDIENTS_TABLE)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{created} ingredients successfully loaded '
+            f'({rows} rows, {rows / elapsed:.0f} rows/sec).'))
+
+    def build(self, number, record):
+        try:
+            return Ingredient(**{
+                field: record[field].strip() for field in FIELDS})
+        except (KeyError, TypeError, AttributeError):
+            raise CommandError(
+                f'Запись {number}: ожидались поля {", ".join(FIELDS)}.')
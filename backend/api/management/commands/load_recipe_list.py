@@ -1,53 +1,175 @@
-import json
 import os
-from django.core.management.base import BaseCommand
-from django.core.files.images import ImageFile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.readers import FORMATS, detect_format, iter_records
+from foodgram import renditions
+from foodgram.constants import RECIPE_LOAD_BATCH_SIZE, RECIPE_LOAD_WORKERS
+from recipes import feed
 from recipes.models import Recipe, Ingredient, IngredientInRecipe
 from users.models import User
 
 
 class Command(BaseCommand):
-    help = 'Загрузка рецептов из файла recipes.json'
+    help = ('Загрузка рецептов из файла recipes.json (JSON-массив или '
+            'NDJSON). Уже существующие рецепты автора с тем же названием '
+            'пропускаются, поэтому команду можно запускать повторно.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=os.path.join('pre_data', 'recipes.json'),
+            help='Пути к изображениям считаются от каталога файла.')
+        parser.add_argument(
+            '--format', choices=FORMATS[:2], dest='file_format',
+            help='Формат файла; по умолчанию определяется по расширению.')
+        parser.add_argument(
+            '--batch-size', type=int, default=RECIPE_LOAD_BATCH_SIZE)
+        parser.add_argument(
+            '--workers', type=int, default=RECIPE_LOAD_WORKERS,
+            help='Потоков для копирования и обработки изображений.')
+        parser.add_argument(
+            '--skip-renditions', action='store_true',
+            help='Не создавать рендиции (позже: generate_renditions).')
 
     def handle(self, *args, **options):
-        file_path = os.path.join('pre_data', 'recipes.json')
-
-        with open(file_path, 'r', encoding='utf-8') as file:
-            recipes = json.load(file)
-
-        for recipe_data in recipes:
-            author = User.objects.filter(
-                username=recipe_data['author']).first()
-            if not author:
-                self.stdout.write(
-                    self.style.ERROR(
-                        f"Автор {recipe_data['author']} не найден."))
-                continue
-
-            recipe = Recipe.objects.create(
-                name=recipe_data['name'],
-                text=recipe_data['text'],
-                cooking_time=recipe_data['cooking_time'],
-                author=author
-            )
-
-            if recipe_data.get('image'):
-                image_path = os.path.join('pre_data',
-                                          recipe_data['image'])
-                with open(image_path, 'rb') as img_file:
-                    recipe.image.save(os.path.basename(image_path),
-                                      ImageFile(img_file), save=True)
-
-            for ingredient_info in recipe_data['ingredients']:
-                ingredient = Ingredient.objects.filter(
-                    name=ingredient_info['name']).first()
-                if ingredient:
-                    IngredientInRecipe.objects.create(
-                        recipe=recipe,
-                        ingredient=ingredient,
-                        amount=ingredient_info['amount']
-                    )
-            self.stdout.write(self.style.SUCCESS(
-                f'Создан рецепт: {recipe.name}')
-            )
+        path = options['path']
+        try:
+            file_format = options['file_format'] or detect_format(path)
+        except ValueError as error:
+            raise CommandError(error)
+        if options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError(
+                '--batch-size и --workers должны быть положительными.')
+        self.verbosity = options['verbosity']
+        self.base_dir = os.path.dirname(path)
+        self.with_renditions = not options['skip_renditions']
+        self.timings = defaultdict(float)
+        self.stats = defaultdict(int)
+
+        started = time.perf_counter()
+        with self.timer('Справочники'):
+            self.authors = dict(User.objects.values_list('username', 'pk'))
+            # Как и раньше, по названию берется первый ингредиент.
+            self.ingredients = {}
+            for pk, name in (Ingredient.objects.order_by('pk')
+                             .values_list('pk', 'name')):
+                self.ingredients.setdefault(name, pk)
+            self.existing = set(
+                Recipe.objects.values_list('author_id', 'name'))
+
+        with ThreadPoolExecutor(options['workers']) as pool, \
+                open(path, encoding='utf-8') as file:
+            self.pool = pool
+            self.images = {}
+            records = iter_records(file, file_format)
+            try:
+                while batch := list(islice(records,
+                                           options['batch_size'])):
+                    self.load_batch(batch)
+            except ValueError as error:
+                raise CommandError(f'{path}: {error}')
+        self.report(time.perf_counter() - started)
+
+    @contextmanager
+    def timer(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] += time.perf_counter() - started
+
+    def load_batch(self, batch):
+        pending = []
+        with self.timer('Разбор'):
+            for data in batch:
+                author_id = self.authors.get(data['author'])
+                if author_id is None:
+                    self.stats['no_author'] += 1
+                    self.stdout.write(self.style.ERROR(
+                        f"Автор {data['author']} не найден."))
+                    continue
+                key = (author_id, data['name'])
+                if key in self.existing:
+                    self.stats['existing'] += 1
+                    continue
+                self.existing.add(key)
+                image = data.get('image')
+                if image and image not in self.images:
+                    self.images[image] = self.pool.submit(
+                        self.store_image, image)
+                pending.append((Recipe(
+                    author_id=author_id,
+                    name=data['name'],
+                    text=data['text'],
+                    cooking_time=data['cooking_time'],
+                ), image, data['ingredients']))
+        if not pending:
+            return
+
+        with self.timer('Изображения (ожидание)'):
+            for recipe, image, _ in pending:
+                if image:
+                    recipe.image = self.images[image].result()
+
+        with transaction.atomic():
+            with self.timer('Рецепты'):
+                recipes = Recipe.objects.bulk_create(
+                    [recipe for recipe, _, _ in pending])
+            with self.timer('Ингредиенты'):
+                IngredientInRecipe.objects.bulk_create(
+                    self.ingredient_rows(pending))
+            with self.timer('Ленты'):
+                feed.recipes_created(recipes)
+        self.stats['created'] += len(recipes)
+        if self.verbosity > 1:
+            for recipe in recipes:
+                self.stdout.write(f'Создан рецепт: {recipe.name}')
+
+    def ingredient_rows(self, pending):
+        rows = []
+        for recipe, _, ingredients in pending:
+            amounts = {}
+            for item in ingredients:
+                ingredient_id = self.ingredients.get(item['name'])
+                if ingredient_id is None:
+                    self.stats['no_ingredient'] += 1
+                    continue
+                amounts.setdefault(ingredient_id, item['amount'])
+            rows.extend(
+                IngredientInRecipe(recipe=recipe, ingredient_id=pk,
+                                   amount=amount)
+                for pk, amount in amounts.items())
+        return rows
+
+    def store_image(self, image):
+        """Скопировать изображение в хранилище; выполняется в потоке."""
+        field = Recipe._meta.get_field('image')
+        with open(os.path.join(self.base_dir, image), 'rb') as file:
+            name = field.storage.save(
+                field.generate_filename(None, os.path.basename(image)),
+                File(file))
+        # bulk_create не отправляет post_save, поэтому задачи на
+        # рендиции не ставятся: они создаются здесь, один раз на файл.
+        if self.with_renditions:
+            renditions.ensure(Recipe(image=name).image)
+        return name
 
+    def report(self, elapsed):
+        stats = self.stats
+        for stage, seconds in self.timings.items():
+            self.stdout.write(f'{stage}: {seconds:.2f} с')
+        self.stdout.write(
+            f'Уже были: {stats["existing"]}, без автора: '
+            f'{stats["no_author"]}, неизвестных ингредиентов: '
+            f'{stats["no_ingredient"]}, изображений: {len(self.images)}.')
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано рецептов: {stats["created"]} за {elapsed:.2f} с '
+            f'({stats["created"] / elapsed:.0f} рецептов/с).'))
@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from foodgram.constants import JOB_RETENTION_DAYS
+from jobs import queue
+
+
+class Command(BaseCommand):
+    help = ('Удаление завершенных и упавших фоновых задач старше '
+            'указанного срока вместе с их файлами (выгрузками).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float, default=JOB_RETENTION_DAYS)
+
+    def handle(self, *args, **options):
+        count = queue.prune(timedelta(days=options['days']))
+        self.stdout.write(self.style.SUCCESS(f'Удалено задач: {count}.'))
@@ -0,0 +1,27 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes import feed
+from recipes.models import FeedEntry
+
+
+class Command(BaseCommand):
+    help = ('Пересборка лент подписок по текущим подпискам и порогу '
+            'популярности. Нужна, когда авторы опускаются ниже порога: '
+            'их рецепты периода популярности в ленты не записывались.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='users',
+            help='Ограничиться пользователем (можно повторять).')
+
+    def handle(self, *args, **options):
+        cache.delete(feed.POPULAR_AUTHORS_CACHE_KEY)
+        with transaction.atomic():
+            feed.rebuild(options['users'])
+        entries = FeedEntry.objects.all()
+        if options['users']:
+            entries = entries.filter(user_id__in=options['users'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты пересобраны: {entries.count()} записей.'))
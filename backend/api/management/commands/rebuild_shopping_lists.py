@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from recipes import shopping_list
+
+
+class Command(BaseCommand):
+    help = 'Пересборка или проверка агрегированных списков покупок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только сравнить таблицу с эталоном, ничего не меняя.')
+        parser.add_argument(
+            '--user', type=int, action='append', dest='users',
+            help='Ограничиться пользователем (можно повторять).')
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            mismatches = shopping_list.verify(options['users'])
+            for user_id, ingredient_id, actual, expected in mismatches:
+                self.stdout.write(
+                    f'user={user_id} ingredient={ingredient_id}: '
+                    f'{actual} вместо {expected}')
+            if mismatches:
+                self.stdout.write(self.style.ERROR(
+                    f'Найдено расхождений: {len(mismatches)}.'))
+            else:
+                self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
+            return
+        count = shopping_list.rebuild(options['users'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересобраны: {count} позиций.'))
@@ -0,0 +1,122 @@
+import json
+import os
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api import benchmarks
+from foodgram.constants import (BENCHMARK_LATENCY_TOLERANCE,
+                                BENCHMARK_REPEAT)
+
+
+class Command(BaseCommand):
+    help = ('Замер всех маршрутов API (p50/p95, число запросов, размер '
+            'ответа) на синтетических данных нескольких масштабов и '
+            'сравнение с бюджетом perf_budget.json. Превышение числа '
+            'запросов и размера ответа — ошибка, рост p95 — '
+            'предупреждение (ошибка с --strict-latency).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', type=float, nargs='+', default=[1])
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=BENCHMARK_REPEAT)
+        parser.add_argument(
+            '--reuse', action='store_true',
+            help='Не пересоздавать данные, если манифест того же '
+                 'масштаба уже есть.')
+        parser.add_argument('--manifest', default='fixture_manifest.json')
+        parser.add_argument(
+            '--budget', default=benchmarks.default_budget_path())
+        parser.add_argument(
+            '--update-budget', action='store_true',
+            help='Записать результаты в бюджет вместо сравнения.')
+        parser.add_argument(
+            '--latency-tolerance', type=float,
+            default=BENCHMARK_LATENCY_TOLERANCE,
+            help='Допустимый рост p95 относительно бюджета (доля).')
+        parser.add_argument(
+            '--strict-latency', action='store_true',
+            help='Считать рост p95 нарушением бюджета. Только если '
+                 'бюджет записан в том же окружении.')
+        parser.add_argument('--only', nargs='+',
+                            help='Сценарии, содержащие эти подстроки.')
+        parser.add_argument('--output', help='Сохранить результаты в JSON.')
+
+    def handle(self, *args, **options):
+        for route, method in benchmarks.uncovered_routes():
+            self.stdout.write(self.style.WARNING(
+                f'Нет сценария для {method.upper()} {route}.'))
+        budget = {}
+        if os.path.exists(options['budget']):
+            with open(options['budget'], encoding='utf-8') as file:
+                budget = json.load(file)
+        vendor_budget = budget.setdefault(connection.vendor, {})
+
+        report, violations, warnings = {}, [], []
+        for scale in options['scales']:
+            manifest = self.prepare(scale, options)
+            key = f'{scale:g}'
+            results = benchmarks.run(manifest, options['repeat'],
+                                     options['only'])
+            report[key] = results
+            self.print_results(key, results)
+            if options['update_budget']:
+                vendor_budget.setdefault(key, {}).update(
+                    (name, benchmarks.budget_entry(result))
+                    for name, result in results.items())
+                continue
+            limits = vendor_budget.get(key, {})
+            violations.extend(
+                (key, name, message)
+                for name, message in benchmarks.compare(results, limits))
+            (violations if options['strict_latency'] else warnings).extend(
+                (key, name, message)
+                for name, message in benchmarks.compare_latency(
+                    results, limits, options['latency_tolerance']))
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump({connection.vendor: report}, file,
+                          ensure_ascii=False, indent=2)
+        if options['update_budget']:
+            with open(options['budget'], 'w', encoding='utf-8') as file:
+                json.dump(budget, file, ensure_ascii=False, indent=2,
+                          sort_keys=True)
+                file.write('\n')
+            self.stdout.write(self.style.SUCCESS(
+                f'Бюджет обновлен: {options["budget"]}.'))
+            return
+        for scale, name, message in warnings:
+            self.stdout.write(self.style.WARNING(
+                f'[масштаб {scale}] {name}: {message}'))
+        for scale, name, message in violations:
+            self.stdout.write(self.style.ERROR(
+                f'[масштаб {scale}] {name}: {message}'))
+        if violations:
+            raise CommandError(f'Нарушений бюджета: {len(violations)}.')
+        self.stdout.write(self.style.SUCCESS('Бюджет соблюден.'))
+
+    def prepare(self, scale, options):
+        path = options['manifest']
+        if options['reuse'] and os.path.exists(path):
+            with open(path, encoding='utf-8') as file:
+                manifest = json.load(file)
+            if (manifest['scale'], manifest['seed']) == (
+                    scale, options['seed']):
+                return manifest
+        call_command('generate_fixture', scale=scale, seed=options['seed'],
+                     replace=True, manifest=path, stdout=self.stdout)
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+
+    def print_results(self, scale, results):
+        self.stdout.write(
+            f'\n{connection.vendor}, масштаб {scale}\n'
+            f'{"сценарий":<28}{"p50, мс":>10}{"p95, мс":>10}'
+            f'{"запросов":>10}{"байт":>10}')
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<28}{result["p50_ms"]:>10.2f}'
+                f'{result["p95_ms"]:>10.2f}{result["queries"]:>10}'
+                f'{result["bytes"]:>10}')
@@ -0,0 +1,96 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                wait)
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from foodgram.constants import (JOB_POLL_INTERVAL, JOB_PRUNE_INTERVAL,
+                                JOB_RETENTION_DAYS)
+from jobs import queue, worker
+
+
+class Command(BaseCommand):
+    help = ('Выполнение фоновых задач из таблицы Job в пуле процессов. '
+            'Несколько экземпляров команды могут работать одновременно.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int,
+                            default=os.cpu_count() or 1)
+        parser.add_argument('--poll', type=float, default=JOB_POLL_INTERVAL,
+                            help='Интервал опроса очереди, секунды.')
+        parser.add_argument('--once', action='store_true',
+                            help='Завершиться, когда очередь опустеет.')
+        parser.add_argument(
+            '--retention-days', type=float, default=JOB_RETENTION_DAYS,
+            help='Раз в час удалять завершенные задачи старше этого срока.')
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        requeued = queue.requeue_stale()
+        if requeued:
+            self.stdout.write(f'Возвращено в очередь: {requeued}.')
+        executor = self.pool(processes)
+        running = {}
+        next_prune = 0.0
+        try:
+            while True:
+                if time.monotonic() >= next_prune:
+                    next_prune = time.monotonic() + JOB_PRUNE_INTERVAL
+                    queue.prune(timedelta(days=options['retention_days']))
+                claimed = queue.claim(processes - len(running))
+                try:
+                    for job_id in claimed:
+                        future = executor.submit(worker.execute, job_id)
+                        running[future] = job_id
+                    if not running:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll'])
+                        continue
+                    done, _ = wait(running, timeout=options['poll'],
+                                   return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self.finish(running[future], future)
+                        del running[future]
+                except BrokenProcessPool:
+                    # Дочерний процесс убит (OOM, сигнал, segfault): все
+                    # задачи пула потеряны, сам пул больше не принимает
+                    # работу.
+                    requeued = queue.requeue([*claimed, *running.values()])
+                    running.clear()
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    executor = self.pool(processes)
+                    self.stdout.write(
+                        f'Пул процессов пересоздан, возвращено в очередь: '
+                        f'{requeued}.')
+        except KeyboardInterrupt:
+            self.stdout.write('Остановка: ждем текущие задачи.')
+            try:
+                for future in list(running):
+                    self.finish(running[future], future)
+                    del running[future]
+            except BrokenProcessPool:
+                queue.requeue(list(running.values()))
+        finally:
+            executor.shutdown()
+
+    def pool(self, processes):
+        # spawn: дочерние процессы не наследуют соединения с базой.
+        return ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=worker.init)
+
+    def finish(self, job_id, future):
+        try:
+            ok, value = future.result()
+        except BrokenProcessPool:
+            raise
+        except Exception as error:
+            ok, value = False, repr(error)
+        queue.finish(job_id, ok, value)
+        self.stdout.write(f'{job_id}: {"готово" if ok else "ошибка"}')
@@ -0,0 +1,13 @@
+from rest_framework.negotiation import DefaultContentNegotiation
+
+
+class IgnoreFormatNegotiation(DefaultContentNegotiation):
+    """Согласование без учета ?format=.
+
+    Для действий, где параметр format выбирает формат выгружаемого
+    файла, а не рендерер DRF: ошибки всегда отдаются первым рендерером.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        renderer = renderers[0]
+        return renderer, renderer.media_type
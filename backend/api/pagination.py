@@ -0,0 +1,168 @@
+import base64
+import binascii
+import hashlib
+import json
+from datetime import date, datetime
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from foodgram.constants import PAGINATION_COUNT_CACHE_TIMEOUT
+
+
+class KeysetPagination(LimitOffsetPagination):
+    """Пагинация по ключу (курсору) с откатом на limit/offset.
+
+    Если в запросе есть параметр ``cursor`` (пустое значение — первая
+    страница), страницы выбираются условием по полям ``ordering`` без
+    OFFSET и без COUNT(*). Общее количество считается только по запросу
+    ``count=cached`` (кэшированный точный подсчет) или
+    ``count=approximate`` (оценка планировщика PostgreSQL). Без параметра
+    ``cursor`` поведение совпадает с LimitOffsetPagination.
+    """
+
+    ordering = ('-pub_date', '-id')
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Некорректный курсор.'
+
+    keyset = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.count = self.get_total_count(
+            queryset, request.query_params.get(self.count_query_param))
+
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params[self.cursor_query_param]
+        if cursor:
+            queryset = queryset.filter(
+                self.get_cursor_filter(self.decode_cursor(cursor, queryset)))
+
+        page = list(queryset[:self.limit + 1])
+        self.next_position = None
+        if len(page) > self.limit:
+            page = page[:self.limit]
+            self.next_position = [
+                getattr(page[-1], field.lstrip('-'))
+                for field in self.ordering
+            ]
+        return page
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response({
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count']['nullable'] = True
+        return response_schema
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.offset_query_param)
+        return replace_query_param(
+            url, self.cursor_query_param,
+            self.encode_cursor(self.next_position))
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        return None
+
+    def get_cursor_filter(self, position):
+        """Условие «строго после position» в порядке self.ordering.
+
+        Первое поле дополнительно ограничено нестрогим неравенством,
+        чтобы планировщик мог использовать составной индекс как диапазон.
+        """
+        lookups = [
+            (field.lstrip('-'), 'lt' if field.startswith('-') else 'gt')
+            for field in self.ordering
+        ]
+        after = Q()
+        for index, (name, lookup) in enumerate(lookups):
+            condition = Q(**{f'{name}__{lookup}': position[index]})
+            for prev_index, (prev_name, _) in enumerate(lookups[:index]):
+                condition &= Q(**{prev_name: position[prev_index]})
+            after |= condition
+        first_name, first_lookup = lookups[0]
+        return Q(**{f'{first_name}__{first_lookup}e': position[0]}) & after
+
+    def encode_cursor(self, position):
+        values = [
+            value.isoformat() if isinstance(value, (date, datetime))
+            else value
+            for value in position
+        ]
+        return base64.urlsafe_b64encode(
+            json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, cursor, queryset):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                queryset.model._meta.get_field(
+                    field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_total_count(self, queryset, mode):
+        if mode == 'approximate':
+            estimate = self.estimate_count(queryset)
+            if estimate is not None:
+                return estimate
+        elif mode != 'cached':
+            return None
+        key = 'pagination:count:' + hashlib.md5(
+            str(queryset.query).encode()).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
+
+    def estimate_count(self, queryset):
+        """Оценка размера нефильтрованной таблицы из pg_class."""
+        if connection.vendor != 'postgresql' or queryset.query.where:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        if row is None or row[0] < 0:
+            return None
+        return row[0]
+
+
+class UserKeysetPagination(KeysetPagination):
+    """Пагинация по ключу для списков пользователей и подписок."""
+
+    ordering = ('username', 'id')
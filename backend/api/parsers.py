@@ -0,0 +1,27 @@
+from rest_framework.parsers import DataAndFiles, FileUploadParser
+
+
+class RawImageParser(FileUploadParser):
+    """Тело запроса — само изображение (PUT с Content-Type: image/*).
+
+    Файл проходит через обработчики загрузки Django (большие файлы
+    пишутся во временный файл) и попадает в request.data[field_name].
+    """
+
+    media_type = 'image/*'
+    field_name = 'file'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        result = super().parse(stream, media_type, parser_context)
+        return DataAndFiles({}, {self.field_name: result.files['file']})
+
+    def get_filename(self, stream, media_type, parser_context):
+        filename = super().get_filename(stream, media_type, parser_context)
+        if filename:
+            return filename
+        subtype = (media_type or '').partition('/')[2].partition(';')[0]
+        return f'upload.{subtype.strip() or "img"}'
+
+
+class RawAvatarParser(RawImageParser):
+    field_name = 'avatar'
@@ -0,0 +1,100 @@
+"""Потоковое чтение файлов загрузки: JSON-массив, NDJSON и CSV.
+
+Записи выдаются по одной, файл целиком в память не читается.
+"""
+import csv
+import json
+import os
+import re
+
+READ_CHUNK_SIZE = 64 * 1024
+WHITESPACE = re.compile(r'\s*')
+VALUE_END = frozenset(' \t\r\n,]')
+FORMATS = ('json', 'ndjson', 'csv')
+FORMATS_BY_EXTENSION = {
+    '.json': 'json',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+    '.csv': 'csv',
+}
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS_BY_EXTENSION:
+        raise ValueError(f'Не удалось определить формат файла {path}.')
+    return FORMATS_BY_EXTENSION[extension]
+
+
+def iter_json_array(file, chunk_size=READ_CHUNK_SIZE):
+    """Элементы JSON-массива верхнего уровня, читаемого кусками."""
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+    expect = '['
+    while True:
+        position = WHITESPACE.match(buffer, position).end()
+        end = None
+        if position < len(buffer):
+            char = buffer[position]
+            if expect == '[':
+                if char != '[':
+                    raise ValueError('Ожидался JSON-массив.')
+                position, expect = position + 1, 'first'
+                continue
+            if expect != 'value' and char == ']':
+                return
+            if expect == 'separator':
+                if char != ',':
+                    raise ValueError(
+                        f'Ожидалась запятая, получено {char!r}.')
+                position, expect = position + 1, 'value'
+                continue
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            # Число на границе куска может продолжаться в следующем, так
+            # что значение принимается, только если за ним виден
+            # разделитель.
+            if end is not None and (
+                    eof or buffer[end:end + 1] in VALUE_END):
+                position, expect = end, 'separator'
+                yield value
+                continue
+        elif eof:
+            raise ValueError('Неожиданный конец JSON-массива.')
+        chunk = file.read(chunk_size)
+        buffer, position, eof = buffer[position:] + chunk, 0, not chunk
+
+
+def iter_ndjson(file):
+    """Записи NDJSON: по одному JSON-значению на строку."""
+    for number, line in enumerate(file, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as error:
+            raise ValueError(f'Строка {number}: {error}') from error
+
+
+def iter_csv(file, fieldnames):
+    """Строки CSV как словари; строка заголовка, если есть, пропускается."""
+    reader = csv.reader(file)
+    for row in reader:
+        if not any(row):
+            continue
+        if reader.line_num == 1 and [
+                cell.strip() for cell in row] == list(fieldnames):
+            continue
+        yield dict(zip(fieldnames, row))
+
+
+def iter_records(file, file_format, fieldnames=()):
+    if file_format == 'csv':
+        return iter_csv(file, fieldnames)
+    if file_format == 'ndjson':
+        return iter_ndjson(file)
+    return iter_json_array(file)
@@ -1,4 +1,10 @@
+from collections import defaultdict
+
+from django.db import models
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
 from rest_framework import serializers
+from recipes.models import Recipe
 from users.models import User, Subscription
 from recipes.serializers import RecipeShortSerializer
 from users.serializers import CustomUserSerializer
@@ -28,27 +34,80 @@ class SubscriptionCreateSerializer(serializers.ModelSerializer):
                                       context=self.context).data
 
 
+def get_recipes_limit(request):
+    limit = request.query_params.get('recipes_limit')
+    if limit and limit.isdigit():
+        return int(limit)
+    return None
+
+
+def annotate_subscription_stats(queryset):
+    """Число рецептов каждого автора."""
+    return queryset.annotate(recipes_count=Count('recipes', distinct=True))
+
+
+class SubscriptionListSerializer(serializers.ListSerializer):
+    """Загружает рецепты всех авторов страницы одним запросом.
+
+    Ограничение recipes_limit применяется к каждому автору через
+    ROW_NUMBER() OVER (PARTITION BY author).
+    """
+
+    def to_representation(self, data):
+        authors = list(
+            data.all() if isinstance(data, models.manager.BaseManager)
+            else data
+        )
+        recipes = (
+            Recipe.objects
+            .filter(author__in=authors)
+            .only('id', 'name', 'image', 'cooking_time', 'author_id')
+            .order_by('-pub_date', '-id')
+        )
+        limit = get_recipes_limit(self.context['request'])
+        if limit is not None:
+            recipes = recipes.annotate(row_number=Window(
+                RowNumber(),
+                partition_by=F('author_id'),
+                order_by=(F('pub_date').desc(), F('id').desc()),
+            )).filter(row_number__lte=limit)
+        recipes_by_author = defaultdict(list)
+        for recipe in recipes:
+            recipes_by_author[recipe.author_id].append(recipe)
+        self.child.recipes_by_author = recipes_by_author
+        return super().to_representation(authors)
+
+
 class SubscriptionSerializer(CustomUserSerializer):
     """Сериализатор для деталей подписок."""
 
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.ReadOnlyField(source='recipes.count')
+    recipes_count = serializers.SerializerMethodField()
+
+    recipes_by_author = None
 
     class Meta:
         model = User
         fields = CustomUserSerializer.Meta.fields + (
             'recipes', 'recipes_count',
         )
+        list_serializer_class = SubscriptionListSerializer
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.query_params.get('recipes_limit')
-        queryset = obj.recipes.all()
-
-        if limit and limit.isdigit():
-            queryset = queryset[:int(limit)]
+        if self.recipes_by_author is not None:
+            queryset = self.recipes_by_author[obj.pk]
+        else:
+            queryset = obj.recipes.all()
+            limit = get_recipes_limit(self.context['request'])
+            if limit is not None:
+                queryset = queryset[:limit]
 
         return RecipeShortSerializer(
             queryset,
             many=True,
             context=self.context).data
+
+    def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
+        return obj.recipes.count()
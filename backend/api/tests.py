@@ -0,0 +1,152 @@
+import base64
+import hashlib
+import shutil
+import tempfile
+import unittest
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from rest_framework import serializers
+from rest_framework.test import APITestCase
+
+from api.benchmarks import png_bytes
+from foodgram.nplusone import NPlusOneTestMixin, QueryShapeDetector
+from foodgram.storage import ContentAddressedStorage
+from foodgram.testing import (clear_caches, create_ingredients, create_user,
+                              make_recipe)
+from recipes.models import IngredientInRecipe, Recipe
+from users.models import Subscription
+
+INGREDIENTS_COUNT = 8
+
+
+class NPlusOneTests(NPlusOneTestMixin, APITestCase):
+    """Основные пути API без запросов одной формы в цикле."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.media = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_user('reader')
+        authors = [create_user(f'author{index}') for index in range(5)]
+        cls.ingredients = create_ingredients(INGREDIENTS_COUNT)
+        recipes = Recipe.objects.bulk_create(
+            make_recipe(author, f'Рецепт {index}')
+            for author in authors for index in range(3))
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(recipe=recipe, ingredient=ingredient,
+                               amount=5)
+            for recipe in recipes for ingredient in cls.ingredients[:4])
+        Subscription.objects.bulk_create(
+            Subscription(user=cls.reader, author=author)
+            for author in authors)
+
+    def setUp(self):
+        super().setUp()
+        clear_caches()
+        self.client.force_authenticate(self.reader)
+
+    def payload(self):
+        image = base64.b64encode(png_bytes()).decode()
+        return {
+            'name': 'Новый рецепт',
+            'text': 'Текст',
+            'cooking_time': 15,
+            'image': f'data:image/png;base64,{image}',
+            'ingredients': [{'id': ingredient.pk, 'amount': 10}
+                            for ingredient in self.ingredients],
+        }
+
+    def test_recipe_list(self):
+        response = self.client.get('/api/recipes/', {'limit': 15})
+        self.assertEqual(response.status_code, 200)
+
+    def test_subscriptions(self):
+        response = self.client.get('/api/users/subscriptions/',
+                                   {'recipes_limit': 2})
+        self.assertEqual(response.status_code, 200)
+
+    def test_recipe_create_and_update(self):
+        response = self.client.post('/api/recipes/', self.payload(),
+                                    format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['ingredients']),
+                         INGREDIENTS_COUNT)
+        response = self.client.patch(
+            f'/api/recipes/{response.data["id"]}/', self.payload(),
+            format='json')
+        self.assertEqual(response.status_code, 200)
+
+
+class AuthorNameSerializer(serializers.ModelSerializer):
+    author = serializers.CharField(source='author.username')
+
+    class Meta:
+        model = Recipe
+        fields = ('id', 'author')
+
+
+class QueryShapeDetectorTests(TestCase):
+    """Детектор срабатывает на намеренный N+1."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Recipe.objects.bulk_create(
+            make_recipe(create_user(f'author{index}'), f'Рецепт {index}')
+            for index in range(5))
+
+    def test_reports_serializer_field(self):
+        with QueryShapeDetector(threshold=3) as detector:
+            AuthorNameSerializer(Recipe.objects.all(), many=True).data
+        self.assertEqual(len(detector.violations), 1)
+        violation, = detector.violations.values()
+        self.assertEqual(violation.count, 5)
+        self.assertEqual(violation.field, 'AuthorNameSerializer.author')
+        self.assertIn('FROM "users_user"', violation.fingerprint)
+
+    def test_no_violation_with_select_related(self):
+        with QueryShapeDetector(threshold=3) as detector:
+            AuthorNameSerializer(Recipe.objects.select_related('author'),
+                                 many=True).data
+        self.assertEqual(detector.violations, {})
+
+    def test_mixin_fails_test(self):
+        class Case(NPlusOneTestMixin, unittest.TestCase):
+            def test_n_plus_one(self):
+                for recipe in Recipe.objects.all():
+                    recipe.author.username
+
+        result = unittest.TestResult()
+        Case('test_n_plus_one').run(result)
+        self.assertEqual(len(result.failures), 1)
+        self.assertIn('Найдены N+1', result.failures[0][1])
+
+
+class ContentAddressedStorageTests(TestCase):
+    """Имя файла от клиента не влияет на имя в хранилище."""
+
+    def setUp(self):
+        self.storage = ContentAddressedStorage(location=tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.storage.location)
+
+    def test_name_like_hash_is_hashed(self):
+        honest = png_bytes()
+        forged = png_bytes((8, 8))
+        hashed = hashlib.sha256(honest).hexdigest() + '.png'
+        name = self.storage.save(f'users/{hashed}', ContentFile(forged))
+        self.assertNotEqual(name, f'users/{hashed}')
+        name = self.storage.save('users/avatar.png', ContentFile(honest))
+        self.assertEqual(name, f'users/{hashed}')
+        with self.storage.open(name) as file:
+            self.assertEqual(file.read(), honest)
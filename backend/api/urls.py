@@ -3,12 +3,14 @@ from rest_framework import routers
 
 from users.views import CustomUserViewSet
 from recipes.views import RecipeViewSet, IngredientViewSet
+from jobs.views import JobViewSet
 
 router = routers.DefaultRouter()
 
 router.register("recipes", RecipeViewSet, basename="recipes")
 router.register("ingredients", IngredientViewSet, basename="ingredients")
 router.register("users", CustomUserViewSet, basename="users")
+router.register("jobs", JobViewSet, basename="jobs")
 
 urlpatterns = [
     path("", include(router.urls)),
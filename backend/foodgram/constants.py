@@ -5,6 +5,7 @@ USER_EMAIL_MAX_LEN = 128
 USER_NICKNAME_MAX_LEN = 100
 USER_REGEX_CONTROLLER = r"^[\w.@+-]+$"
 CONST_PAGES = 8
+PAGINATION_COUNT_CACHE_TIMEOUT = 60
 
 RECIPE_MIN_TIME = 1
 RECIPE_MAX_TIME = 2880
@@ -13,3 +14,37 @@ INGREDIENT_MIN_AMOUNT = 1
 INGREDIENT_MAX_AMOUNT = 3000
 INGREDIENT_NAME_MAX_LEN = 256
 MEASUREMENT_UNIT_MAX_LEN = 32
+TABLE_VERSION_NAME_MAX_LEN = 64
+INGREDIENTS_TABLE = 'ingredients'
+INGREDIENT_FUZZY_LIMIT = 50
+INGREDIENT_FUZZY_THRESHOLD = 0.3
+BULK_MAX_ITEMS = 500
+FEED_FANOUT_MAX_SUBSCRIBERS = 1000
+FEED_BACKFILL_LIMIT = 100
+FEED_POPULAR_CACHE_TIMEOUT = 60
+IMAGE_MAX_SIZE = 10 * 1024 * 1024
+IMAGE_RENDITION_WIDTHS = (160, 480, 1080)
+IMAGE_RENDITION_FORMATS = ('webp', 'jpeg')
+IMAGE_RENDITION_QUALITY = 80
+JOB_KIND_MAX_LEN = 64
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_DELAY = 10
+JOB_STALE_TIMEOUT = 600
+JOB_POLL_INTERVAL = 1.0
+JOB_RETENTION_DAYS = 7
+JOB_PRUNE_INTERVAL = 3600
+INGREDIENT_LOAD_BATCH_SIZE = 1000
+RECIPE_LOAD_BATCH_SIZE = 500
+RECIPE_LOAD_WORKERS = 8
+FIXTURE_USERS_PER_SCALE = 1000
+FIXTURE_RECIPES_PER_SCALE = 5000
+FIXTURE_USERNAME_PREFIX = 'fixture_'
+FIXTURE_PASSWORD = 'fixture-password'
+FIXTURE_BATCH_SIZE = 10000
+BENCHMARK_REPEAT = 20
+BENCHMARK_LATENCY_TOLERANCE = 0.5
+BENCHMARK_BYTES_TOLERANCE = 0.1
+BENCHMARK_LATENCY_SLACK_MS = 5
+METRICS_FLUSH_INTERVAL = 1.0
+NPLUSONE_THRESHOLD = 3
+REPLICA_PIN_COOKIE = 'db_primary_until'
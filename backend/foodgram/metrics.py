@@ -0,0 +1,363 @@
+"""Метрики запросов: фазы для Server-Timing и гистограммы для Prometheus.
+
+Время запроса раскладывается на фазы: SQL (через execute_wrapper всех
+подключений), сериализацию и отрисовку ответа. Сериализация — время
+обработчика представления DRF (TimedViewMixin) за вычетом его SQL:
+запрос к базе в обработчике почти весь уходит на выборку для
+сериализатора, а патчить Serializer.data глобально незачем. Запросы,
+выполненные при отрисовке, входят и в db, и в render.
+
+Гистограммы по маршрутам копятся в памяти процесса, счетчики
+приложений (register_counter) читаются из него при снимке. Если задан
+settings.METRICS_DIR, каждый процесс (воркер gunicorn) не чаще раза в
+METRICS_FLUSH_INTERVAL секунд сохраняет снимок в файл
+<pid>-<время старта>.json, а /metrics суммирует снимки всех процессов.
+Снимки завершившихся процессов при сборе переносятся в archive.json,
+поэтому счетчики не уменьшаются, а файлы не копятся.
+"""
+import atexit
+import bisect
+import contextvars
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+from foodgram.constants import METRICS_FLUSH_INTERVAL
+
+PREFIX = 'foodgram_http'
+HISTOGRAMS = {
+    'request_duration_seconds': (
+        'Время обработки запроса.',
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)),
+    'request_db_seconds': (
+        'Время SQL-запросов за запрос.',
+        (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)),
+    'request_queries': (
+        'Число SQL-запросов за запрос.',
+        (1, 2, 3, 5, 10, 20, 50, 100, 200)),
+    'response_size_bytes': (
+        'Размер ответа.',
+        (100, 1000, 10_000, 100_000, 1_000_000, 10_000_000)),
+}
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Имя метрики → (описание, функция значения в текущем процессе).
+COUNTERS = {}
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Длительности фаз одного запроса в секундах."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {'db': 0.0, 'serialize': 0.0, 'render': 0.0}
+        self.queries = 0
+        self._depth = {}
+
+    @contextmanager
+    def phase(self, name):
+        # Вложенные вызовы не суммируются повторно.
+        depth = self._depth.get(name, 0)
+        self._depth[name] = depth + 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._depth[name] = depth
+            if not depth:
+                self.phases[name] += time.perf_counter() - started
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        with self.phase('db'):
+            return execute(sql, params, many, context)
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def header(self):
+        entries = [
+            f'{name};dur={seconds * 1000:.1f}'
+            for name, seconds in self.phases.items()
+        ]
+        entries[0] += f';desc="{self.queries} queries"'
+        entries.append(f'total;dur={self.total() * 1000:.1f}')
+        return ', '.join(entries)
+
+
+@contextmanager
+def track_request():
+    """Включить учет фаз для кода внутри блока (запроса)."""
+    timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timings))
+            yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def phase(name):
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    with timings.phase(name):
+        yield
+
+
+class TimedViewMixin:
+    """Время обработчика представления DRF без SQL — фаза serialize.
+
+    Отсчет от конца initial() (аутентификация, права) до
+    finalize_response(): выборка, сериализация и логика представления.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        timings = _current.get()
+        if timings is not None:
+            self._handler_started = (time.perf_counter(),
+                                     timings.phases['db'])
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        timings = _current.get()
+        started = getattr(self, '_handler_started', None)
+        if timings is not None and started is not None:
+            elapsed, db = started
+            timings.phases['serialize'] += max(
+                time.perf_counter() - elapsed
+                - (timings.phases['db'] - db), 0.0)
+            self._handler_started = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+def register_counter(name, description, value):
+    """Экспортировать в /metrics счетчик процесса, который ведет value()."""
+    COUNTERS[name] = (description, value)
+
+
+class Registry:
+    """Гистограммы с метками (view, method) и счетчик ответов."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {name: {} for name in HISTOGRAMS}
+        self.responses = {}
+        self.flushed = 0.0
+        self._pid = None
+
+    @property
+    def filename(self):
+        # Время старта отличает процесс от прежнего с тем же pid; после
+        # fork (gunicorn --preload) вычисляется заново.
+        if self._pid != os.getpid():
+            self._pid, self._started = os.getpid(), time.time_ns()
+        return f'{self._pid}-{self._started}.json'
+
+    def observe(self, view, method, status, timings, size):
+        values = {
+            'request_duration_seconds': timings.total(),
+            'request_db_seconds': timings.phases['db'],
+            'request_queries': timings.queries,
+            'response_size_bytes': size,
+        }
+        key = json.dumps([view, method])
+        with self.lock:
+            for name, value in values.items():
+                buckets = HISTOGRAMS[name][1]
+                series = self.histograms[name].setdefault(
+                    key, [0] * (len(buckets) + 2))
+                series[bisect.bisect_left(buckets, value)] += 1
+                series[-1] += value
+            counter = json.dumps([view, method, str(status)])
+            self.responses[counter] = self.responses.get(counter, 0) + 1
+        if settings.METRICS_DIR and (
+                time.monotonic() - self.flushed > METRICS_FLUSH_INTERVAL):
+            self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps({
+                'histograms': self.histograms,
+                'responses': self.responses,
+                'counters': {name: value()
+                             for name, (_, value) in COUNTERS.items()},
+            }))
+
+    def flush(self):
+        """Атомарно записать снимок процесса в METRICS_DIR."""
+        self.flushed = time.monotonic()
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        path = os.path.join(settings.METRICS_DIR, self.filename)
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(self.snapshot(), file)
+        os.replace(temporary, path)
+
+
+registry = Registry()
+
+
+@atexit.register
+def _flush_on_exit():
+    if settings.configured and settings.METRICS_DIR and registry.responses:
+        registry.flush()
+
+
+ARCHIVE = 'archive.json'
+
+
+def _read(path):
+    try:
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _process_files(directory):
+    """{имя файла: (pid, старт)} снимков процессов."""
+    files = {}
+    for filename in os.listdir(directory):
+        pid, _, started = filename.removesuffix('.json').partition('-')
+        if (filename.endswith('.json') and pid.isdigit()
+                and started.isdigit()):
+            files[filename] = (int(pid), int(started))
+    return files
+
+
+def _retire(directory, filenames):
+    """Перенести снимки завершившихся процессов в архив."""
+    archive = os.path.join(directory, ARCHIVE)
+    with open(os.path.join(directory, 'archive.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        snapshots = [_read(os.path.join(directory, filename))
+                     for filename in filenames]
+        snapshots = [snapshot for snapshot in snapshots if snapshot]
+        if not snapshots:
+            return
+        histograms, responses, counters = merge(
+            [_read(archive) or {'histograms': {}, 'responses': {}},
+             *snapshots])
+        temporary = f'{archive}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump({'histograms': histograms, 'responses': responses,
+                       'counters': counters}, file)
+        os.replace(temporary, archive)
+        for filename in filenames:
+            try:
+                os.remove(os.path.join(directory, filename))
+            except FileNotFoundError:
+                pass
+
+
+def collect():
+    """Снимки всех процессов; свой процесс — из памяти."""
+    own = registry.snapshot()
+    directory = settings.METRICS_DIR
+    if not directory or not os.path.isdir(directory):
+        return [own]
+    own_file = registry.filename
+    files = _process_files(directory)
+    latest = {}
+    for pid, started in files.values():
+        latest[pid] = max(latest.get(pid, 0), started)
+    retired = [
+        filename for filename, (pid, started) in files.items()
+        if filename != own_file and (
+            pid == os.getpid() or started < latest[pid] or not _alive(pid))
+    ]
+    if retired:
+        _retire(directory, retired)
+    snapshots = [own]
+    for filename in [ARCHIVE, *files]:
+        if filename == own_file or filename in retired:
+            continue
+        snapshot = _read(os.path.join(directory, filename))
+        if snapshot is not None:
+            snapshots.append(snapshot)
+    return snapshots
+
+
+def merge(snapshots):
+    histograms = {name: {} for name in HISTOGRAMS}
+    responses, counters = {}, {}
+    for snapshot in snapshots:
+        for name, series in snapshot['histograms'].items():
+            for key, values in series.items():
+                total = histograms[name].setdefault(key, [0] * len(values))
+                for index, value in enumerate(values):
+                    total[index] += value
+        for key, count in snapshot['responses'].items():
+            responses[key] = responses.get(key, 0) + count
+        for name, value in snapshot.get('counters', {}).items():
+            counters[name] = counters.get(name, 0) + value
+    return histograms, responses, counters
+
+
+def _escape(value):
+    return (str(value).replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'))
+
+
+def _labels(**labels):
+    return ','.join(f'{name}="{_escape(value)}"'
+                    for name, value in labels.items())
+
+
+def render():
+    """Метрики в текстовом формате Prometheus 0.0.4."""
+    histograms, responses, counters = merge(collect())
+    lines = [
+        f'# HELP {PREFIX}_responses_total Ответы по маршрутам и статусам.',
+        f'# TYPE {PREFIX}_responses_total counter',
+    ]
+    for key, count in sorted(responses.items()):
+        view, method, status = json.loads(key)
+        labels = _labels(view=view, method=method, status=status)
+        lines.append(f'{PREFIX}_responses_total{{{labels}}} {count}')
+    for name, (description, buckets) in HISTOGRAMS.items():
+        metric = f'{PREFIX}_{name}'
+        lines += [f'# HELP {metric} {description}',
+                  f'# TYPE {metric} histogram']
+        for key, values in sorted(histograms[name].items()):
+            view, method = json.loads(key)
+            cumulative = 0
+            for bound, count in zip((*buckets, '+Inf'), values):
+                cumulative += count
+                labels = _labels(view=view, method=method, le=bound)
+                lines.append(f'{metric}_bucket{{{labels}}} {cumulative}')
+            labels = _labels(view=view, method=method)
+            lines.append(f'{metric}_sum{{{labels}}} {values[-1]}')
+            lines.append(f'{metric}_count{{{labels}}} {cumulative}')
+    for name, (description, _) in COUNTERS.items():
+        lines += [f'# HELP {name} {description}',
+                  f'# TYPE {name} counter',
+                  f'{name} {counters.get(name, 0)}']
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
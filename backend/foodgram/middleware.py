@@ -0,0 +1,116 @@
+import hashlib
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+
+from foodgram import metrics, routers
+from foodgram.constants import REPLICA_PIN_COOKIE
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ServerTimingMiddleware:
+    """Фазы запроса в заголовке Server-Timing и в метриках /metrics.
+
+    Должен стоять первым в MIDDLEWARE, чтобы учитывать все запросы.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with metrics.track_request() as timings:
+            response = self.get_response(request)
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = timings.header()
+        match = request.resolver_match
+        labels = (match.view_name if match else 'unmatched',
+                  request.method, response.status_code)
+        if response.streaming:
+            response.streaming_content = self.count_streamed(
+                response.streaming_content, labels, timings)
+        else:
+            metrics.registry.observe(*labels, timings,
+                                     len(response.content))
+        return response
+
+    def process_template_response(self, request, response):
+        render = response.render
+
+        def timed_render():
+            with metrics.phase('render'):
+                return render()
+
+        response.render = timed_render
+        return response
+
+    @staticmethod
+    def count_streamed(content, labels, timings):
+        """Размер и полное время потокового ответа — после отправки."""
+        size = 0
+        for chunk in content:
+            size += len(chunk)
+            yield chunk
+        metrics.registry.observe(*labels, timings, size)
+
+
+class ReplicaRoutingMiddleware:
+    """Безопасные запросы читают с реплики, если клиент не закреплен.
+
+    Клиент, выполнивший запись, получает подписанную cookie с временем
+    окончания закрепления (не дальше REPLICA_PIN_SECONDS от текущего
+    момента, иначе клиент закрепил бы себя за основной базой навсегда),
+    а его токен — ключ в кэше (для клиентов без cookie; между воркерами
+    работает при общем кэше, например Redis).
+    """
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = self.pin_key(request)
+        replica = None
+        if request.method in SAFE_METHODS and not self.pinned(request, key):
+            replica = random.choice(settings.DATABASE_REPLICAS)
+        with routers.routing(replica) as state:
+            response = self.get_response(request)
+        if state.wrote:
+            self.pin(response, key)
+        return response
+
+    @staticmethod
+    def pin_key(request):
+        authorization = request.META.get('HTTP_AUTHORIZATION')
+        if not authorization:
+            return None
+        digest = hashlib.sha256(authorization.encode()).hexdigest()
+        return f'db-pin:{digest}'
+
+    @staticmethod
+    def pinned(request, key):
+        seconds = settings.REPLICA_PIN_SECONDS
+        try:
+            until = float(request.get_signed_cookie(
+                REPLICA_PIN_COOKIE, default=0, salt=REPLICA_PIN_COOKIE,
+                max_age=seconds))
+        except ValueError:
+            until = 0
+        now = time.time()
+        if now < until <= now + seconds:
+            return True
+        return key is not None and cache.get(key) is not None
+
+    @staticmethod
+    def pin(response, key):
+        seconds = settings.REPLICA_PIN_SECONDS
+        until = str(time.time() + seconds)
+        response.set_signed_cookie(
+            REPLICA_PIN_COOKIE, until, salt=REPLICA_PIN_COOKIE,
+            max_age=seconds, httponly=True, samesite='Lax')
+        if key is not None:
+            cache.set(key, 1, seconds)
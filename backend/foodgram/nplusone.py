@@ -0,0 +1,186 @@
+"""Поиск N+1: один и тот же по форме SQL-запрос много раз подряд.
+
+Запросы перехватываются через execute_wrapper всех подключений и
+сводятся к «отпечатку»: литералы, числа и списки IN заменяются
+заглушками. Если отпечаток встретился больше threshold раз, сохраняется
+стек вызова (только кода проекта) и поле сериализатора DRF, при
+отрисовке которого выполнен запрос.
+
+Использование:
+
+    with QueryShapeDetector() as detector:   # разовое профилирование
+        ...
+    print(detector.report())
+
+NPlusOneMiddleware пишет нарушения в лог foodgram.nplusone (включается
+settings.NPLUSONE_DETECT), NPlusOneTestMixin роняет тест.
+"""
+import logging
+import os
+import re
+import sys
+import traceback
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import fields
+
+from foodgram.constants import NPLUSONE_THRESHOLD
+
+logger = logging.getLogger('foodgram.nplusone')
+
+NORMALIZE = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+IGNORED = re.compile(r'^\s*(SAVEPOINT|RELEASE|ROLLBACK)\b', re.IGNORECASE)
+STACK_LIMIT = 12
+FIELD_METHODS = {'to_representation', 'get_attribute', 'to_internal_value',
+                 'run_validation'}
+
+
+def fingerprint(sql):
+    for pattern, replacement in NORMALIZE:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def project_stack():
+    """Кадры кода проекта (без библиотек и этого модуля), снаружи внутрь."""
+    base_dir = str(settings.BASE_DIR)
+    return [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(base_dir)
+        and os.sep + 'site-packages' + os.sep not in frame.filename
+        and frame.filename != __file__
+    ][-STACK_LIMIT:]
+
+
+def serializer_field():
+    """«Сериализатор.поле», которое сейчас отрисовывается, если есть."""
+    frame = sys._getframe()
+    while frame is not None:
+        owner = frame.f_locals.get('self')
+        if (frame.f_code.co_name in FIELD_METHODS
+                and isinstance(owner, fields.Field)
+                and owner.field_name
+                and owner.parent is not None):
+            return f'{type(owner.parent).__name__}.{owner.field_name}'
+        frame = frame.f_back
+    return None
+
+
+class Violation:
+
+    def __init__(self, fingerprint, stack, field):
+        self.fingerprint = fingerprint
+        self.stack = stack
+        self.field = field
+        self.count = 0
+
+    def __str__(self):
+        lines = [f'{self.count} x {self.fingerprint}']
+        if self.field:
+            lines.append(f'  поле сериализатора: {self.field}')
+        lines.extend(
+            f'  {frame.filename}:{frame.lineno} in {frame.name}'
+            for frame in self.stack)
+        return '\n'.join(lines)
+
+
+class QueryShapeDetector:
+    """Счетчик запросов по отпечаткам внутри блока with."""
+
+    def __init__(self, threshold=NPLUSONE_THRESHOLD):
+        self.threshold = threshold
+        self.counts = {}
+        self.violations = {}
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        if not IGNORED.match(sql):
+            self.record(sql)
+        return execute(sql, params, many, context)
+
+    def record(self, sql):
+        shape = fingerprint(sql)
+        count = self.counts.get(shape, 0) + 1
+        self.counts[shape] = count
+        if count <= self.threshold:
+            return
+        if shape not in self.violations:
+            # Стек снимается один раз, на первом лишнем запросе.
+            self.violations[shape] = Violation(
+                shape, project_stack(), serializer_field())
+        self.violations[shape].count = count
+
+    def report(self):
+        return '\n\n'.join(str(violation)
+                           for violation in self.violations.values())
+
+
+class NPlusOneMiddleware:
+    """Пишет в лог запросы одной формы, повторенные в запросе > N раз."""
+
+    def __init__(self, get_response):
+        if not settings.NPLUSONE_DETECT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryShapeDetector() as detector:
+            response = self.get_response(request)
+        if detector.violations:
+            logger.warning('N+1 в %s %s:\n%s', request.method,
+                           request.path, detector.report())
+        return response
+
+
+class NPlusOneTestMixin:
+    """Примесь к TestCase: тест падает, если в нем есть N+1.
+
+    Порог — атрибут nplusone_threshold; assertNoNPlusOne проверяет
+    отдельный блок.
+    """
+
+    nplusone_threshold = NPLUSONE_THRESHOLD
+
+    def setUp(self):
+        super().setUp()
+        detector = QueryShapeDetector(self.nplusone_threshold)
+        detector.__enter__()
+        self.addCleanup(self._check_nplusone, detector)
+
+    def _check_nplusone(self, detector):
+        detector.__exit__(None, None, None)
+        if detector.violations:
+            self.fail(f'Найдены N+1:\n{detector.report()}')
+
+    def assertNoNPlusOne(self, threshold=None):
+        return _AssertNoNPlusOne(self, threshold or self.nplusone_threshold)
+
+
+class _AssertNoNPlusOne(QueryShapeDetector):
+
+    def __init__(self, test_case, threshold):
+        super().__init__(threshold)
+        self.test_case = test_case
+
+    def __exit__(self, exc_type, *exc_info):
+        super().__exit__(exc_type, *exc_info)
+        if exc_type is None and self.violations:
+            self.test_case.fail(f'Найдены N+1:\n{self.report()}')
@@ -1,42 +1,86 @@
 import base64
-import imghdr
+import binascii
+
 from rest_framework import serializers
 from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import UploadedFile
+
+from foodgram.constants import IMAGE_MAX_SIZE
+
+# Сигнатуры форматов по первым байтам файла: (смещение, байты, расширение).
+IMAGE_SIGNATURES = (
+    (0, b'\xff\xd8\xff', 'jpeg'),
+    (0, b'\x89PNG\r\n\x1a\n', 'png'),
+    (0, b'GIF87a', 'gif'),
+    (0, b'GIF89a', 'gif'),
+    (8, b'WEBP', 'webp'),
+    (0, b'BM', 'bmp'),
+    (0, b'II*\x00', 'tiff'),
+    (0, b'MM\x00*', 'tiff'),
+)
+
+# Длина base64-строки, соответствующая IMAGE_MAX_SIZE байтам.
+IMAGE_MAX_ENCODED_SIZE = (IMAGE_MAX_SIZE + 2) // 3 * 4
+
+
+def sniff_image_format(head):
+    """Расширение файла по его первым байтам или None."""
+    for offset, signature, extension in IMAGE_SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            return extension
+    return None
 
 
 class ReformattingBase64(serializers.ImageField):
-    """Переформатирование фото профиля из base64."""
+    """Переформатирование фото профиля из base64.
+
+    Принимает также загруженный файл (multipart или тело запроса).
+    Строка декодируется один раз; слишком длинные строки отклоняются
+    до декодирования. Проверку через Pillow (без декодирования пикселей)
+    выполняет базовый ImageField.
+    """
 
     def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            return self.file_to_internal_value(data)
+        if not (isinstance(data, str) and data.startswith('data:image')):
+            raise serializers.ValidationError(
+                ('Неверный формат изображения. Ожидается base64 строка.')
+            )
+        _, _, img_str = data.partition(';base64,')
+        if len(img_str) > IMAGE_MAX_ENCODED_SIZE:
+            raise serializers.ValidationError(
+                ('Размер изображения превышает {size} МБ.')
+                .format(size=IMAGE_MAX_SIZE // (1024 * 1024))
+            )
         try:
-            if isinstance(data, str) and data.startswith('data:image'):
-                header, img_str = data.split(';base64,')
-                file_ext = imghdr.what(None, h=base64.b64decode(img_str))
-
-                if not file_ext:
-                    raise serializers.ValidationError(
-                        ('Не удалось определить тип изображения.')
-                    )
-
-                image_data = base64.b64decode(img_str)
-                content = ContentFile(
-                    image_data,
-                    name=f'temp.{file_ext}'
-                )
-            else:
-                raise serializers.ValidationError(
-                    ('Неверный формат изображения. Ожидается base64 строка.')
-                )
-
-        except (ValueError, TypeError, OSError, base64.binascii.Error) as e:
+            image_data = base64.b64decode(img_str)
+        except (ValueError, binascii.Error) as e:
             raise serializers.ValidationError(
                 ('Ошибка при обработке изображения: {error}')
                 .format(error=str(e))
             )
 
+        file_ext = sniff_image_format(image_data[:16])
+        if not file_ext:
+            raise serializers.ValidationError(
+                ('Не удалось определить тип изображения.')
+            )
+
+        content = ContentFile(image_data, name=f'temp.{file_ext}')
         return super().to_internal_value(content)
 
+    def file_to_internal_value(self, data):
+        """Файл из multipart или тела запроса: проверяется только размер."""
+        if data.size > IMAGE_MAX_SIZE:
+            raise serializers.ValidationError(
+                ('Размер изображения превышает {size} МБ.')
+                .format(size=IMAGE_MAX_SIZE // (1024 * 1024))
+            )
+        return super().to_internal_value(data)
+
     def validate_empty_values(self, data):
         if data is None:
             return True, None
-        return False, data
+        # Без изображения в PATCH поле пропускается, а не считается ошибкой.
+        return super().validate_empty_values(data)
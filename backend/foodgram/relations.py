@@ -0,0 +1,44 @@
+"""Связи текущего пользователя, общие для всех сериализаторов запроса.
+
+Подписки, избранное и корзина загружаются не больше одного раза за
+запрос, лениво, в виде множеств идентификаторов.
+"""
+from functools import cached_property
+
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscription
+
+
+class UserRelations:
+    """Множества id авторов и рецептов, связанных с пользователем."""
+
+    def __init__(self, user):
+        self.user = user if user and user.is_authenticated else None
+
+    def _ids(self, queryset, field):
+        if self.user is None:
+            return frozenset()
+        return frozenset(
+            queryset.filter(user=self.user).values_list(field, flat=True))
+
+    @cached_property
+    def subscribed_author_ids(self):
+        return self._ids(Subscription.objects, 'author_id')
+
+    @cached_property
+    def favorite_recipe_ids(self):
+        return self._ids(Favorite.objects, 'recipe_id')
+
+    @cached_property
+    def cart_recipe_ids(self):
+        return self._ids(ShoppingCart.objects, 'recipe_id')
+
+
+def get_relations(request):
+    """Объект связей, привязанный к запросу (создается при первом вызове)."""
+    if request is None:
+        return UserRelations(None)
+    http_request = getattr(request, '_request', request)
+    if not hasattr(http_request, 'user_relations'):
+        http_request.user_relations = UserRelations(request.user)
+    return http_request.user_relations
@@ -0,0 +1,114 @@
+"""Уменьшенные копии изображений (рендиции) для srcset.
+
+Для каждого изображения рядом с оригиналом сохраняются копии шириной
+IMAGE_RENDITION_WIDTHS в форматах IMAGE_RENDITION_FORMATS:
+``recipes/images/soup.jpg`` -> ``recipes/images/soup.480w.webp``.
+Имена вычисляются из имени оригинала; ссылки отдаются, только когда
+рендиции уже созданы (проверяется одна, создаваемая последней).
+"""
+import io
+import os
+import re
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+from foodgram.constants import (IMAGE_RENDITION_FORMATS,
+                                IMAGE_RENDITION_QUALITY,
+                                IMAGE_RENDITION_WIDTHS)
+
+
+RENDITION_NAME_RE = re.compile(r'\.\d+w\.[a-z]+$')
+
+
+def rendition_name(name, width, image_format):
+    root, _ = os.path.splitext(name)
+    return f'{root}.{width}w.{image_format}'
+
+
+def rendition_names(name):
+    return [rendition_name(name, width, image_format)
+            for width in IMAGE_RENDITION_WIDTHS
+            for image_format in IMAGE_RENDITION_FORMATS]
+
+
+def is_rendition(name):
+    return bool(RENDITION_NAME_RE.search(name))
+
+
+def rendition_urls(field_file):
+    """{формат: {ширина: url}} или None, если рендиций (еще) нет.
+
+    Рендиции создаются фоновой задачей после загрузки; пока их нет,
+    клиент показывает оригинал из поля изображения.
+    """
+    if not field_file or not has_renditions(field_file):
+        return None
+    storage = field_file.storage
+    return {
+        image_format: {
+            str(width): storage.url(
+                rendition_name(field_file.name, width, image_format))
+            for width in IMAGE_RENDITION_WIDTHS
+        }
+        for image_format in IMAGE_RENDITION_FORMATS
+    }
+
+
+def has_renditions(field_file):
+    return field_file.storage.exists(rendition_name(
+        field_file.name, IMAGE_RENDITION_WIDTHS[-1],
+        IMAGE_RENDITION_FORMATS[-1]))
+
+
+def generate(field_file):
+    """Создать (или пересоздать) все рендиции изображения."""
+    storage = field_file.storage
+    with storage.open(field_file.name, 'rb') as file:
+        with Image.open(file) as original:
+            original = ImageOps.exif_transpose(original)
+            image = original.convert('RGB')
+    for width in IMAGE_RENDITION_WIDTHS:
+        resized = image.copy()
+        # thumbnail не увеличивает: маленький оригинал сохраняется как есть.
+        resized.thumbnail((width, image.height), Image.LANCZOS)
+        for image_format in IMAGE_RENDITION_FORMATS:
+            buffer = io.BytesIO()
+            resized.save(buffer, format=image_format.upper(),
+                         quality=IMAGE_RENDITION_QUALITY)
+            storage.save_derived(
+                rendition_name(field_file.name, width, image_format),
+                ContentFile(buffer.getvalue()))
+
+
+def ensure(field_file):
+    """Создать рендиции, если их еще нет; True, если созданы."""
+    if field_file and not has_renditions(field_file):
+        generate(field_file)
+        return True
+    return False
+
+
+class RenditionsField(serializers.ReadOnlyField):
+    """Ссылки на рендиции изображения из поля source.
+
+    Без request в контексте ссылки относительные (для кэша).
+    """
+
+    def to_representation(self, value):
+        urls = rendition_urls(value)
+        request = self.context.get('request')
+        if urls is None or request is None:
+            return urls
+        return absolute_urls(urls, request)
+
+
+def absolute_urls(urls, request):
+    if urls is None:
+        return None
+    return {
+        image_format: {width: request.build_absolute_uri(url)
+                       for width, url in by_width.items()}
+        for image_format, by_width in urls.items()
+    }
@@ -0,0 +1,86 @@
+"""Чтение с реплик, запись в основную базу.
+
+Реплики (алиасы из settings.DATABASE_REPLICAS) используются только
+внутри HTTP-запросов безопасными методами: ReplicaRoutingMiddleware
+выбирает реплику на весь запрос. Остальные запросы, фоновые задачи и
+команды работают с основной базой.
+
+После записи запрос до конца читает из основной базы, а клиент
+закрепляется за ней на settings.REPLICA_PIN_SECONDS секунд (cookie и
+ключ в кэше по токену), чтобы видеть свои изменения несмотря на
+отставание реплик.
+"""
+import contextvars
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_state = contextvars.ContextVar('db_routing', default=None)
+
+
+class RoutingState:
+    """Выбор базы для чтения в рамках одного HTTP-запроса."""
+
+    def __init__(self, replica=None):
+        self.replica = replica
+        self.wrote = False
+
+
+@contextmanager
+def routing(replica=None):
+    """Читать из replica (None — из основной базы) внутри блока."""
+    state = RoutingState(replica)
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """Временно читать из основной базы (например, при отставании)."""
+    state = _state.get()
+    if state is None:
+        yield
+        return
+    replica, state.replica = state.replica, None
+    try:
+        yield
+    finally:
+        if not state.wrote:
+            state.replica = replica
+
+
+def reading_from_replica():
+    state = _state.get()
+    return state is not None and state.replica is not None
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.replica is None:
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+            state.replica = None
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Схема реплик приходит репликацией из основной базы.
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
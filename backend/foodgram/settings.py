@@ -20,6 +20,7 @@ INSTALLED_APPS = [
     'users',
     'recipes',
     'api',
+    'jobs',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -33,6 +34,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram.middleware.ServerTimingMiddleware',
+    'foodgram.nplusone.NPlusOneMiddleware',
+    'foodgram.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -74,6 +78,74 @@ DATABASES = {
     }
 }
 
+# SQLite для локальных проверок и бенчмарков без PostgreSQL.
+if os.getenv('DB_ENGINE') == 'sqlite':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+    }
+
+# Реплики только для чтения: DB_REPLICAS — хосты PostgreSQL (при
+# DB_ENGINE=sqlite — пути к файлам) через запятую. Остальные параметры
+# берутся из основной базы; в тестах реплики указывают на нее же.
+DATABASE_REPLICAS = []
+for number, location in enumerate(
+        filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1):
+    alias = f'replica{number}'
+    field = ('NAME' if DATABASES['default']['ENGINE'].endswith('sqlite3')
+             else 'HOST')
+    DATABASES[alias] = {**DATABASES['default'], field: location.strip(),
+                        'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['foodgram.routers.ReplicaRouter']
+
+# Сколько секунд после записи клиент читает из основной базы.
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+
+# Кэш представлений рецептов. Для нескольких воркеров gunicorn
+# рекомендуется 'recipes.cache.DjangoRecipeCache' поверх общего
+# (например, Redis) бэкенда из CACHES.
+RECIPE_CACHE = {
+    'BACKEND': 'recipes.cache.LocMemRecipeCache',
+    'OPTIONS': {
+        'max_entries': 1024,
+        'timeout': 60,
+    },
+}
+
+# Кэш «токен → пользователь» для api.authentication.CachedTokenAuthentication.
+# timeout ограничивает жизнь записи в памяти процесса (инвалидация по
+# сигналам видна только своему процессу); alias — общий кэш из CACHES
+# (например, Redis) как второй уровень для всех воркеров.
+TOKEN_AUTH_CACHE = {
+    'max_entries': 10000,
+    'timeout': 5,
+    'alias': os.getenv('TOKEN_AUTH_CACHE_ALIAS') or None,
+    'shared_timeout': 300,
+}
+
+# Выполнять фоновые задачи сразу после коммита в процессе запроса,
+# без run_workers (для разработки).
+JOBS_EAGER = os.getenv('JOBS_EAGER', 'False') == 'True'
+
+# Заголовок Server-Timing с фазами запроса (db, render, app). Раскрывает
+# внутренние задержки, поэтому включается только для отладки.
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'False') == 'True'
+
+# Каталог снимков метрик воркеров для /metrics при нескольких процессах
+# gunicorn. Без него /metrics показывает только свой процесс.
+METRICS_DIR = os.getenv('METRICS_DIR') or None
+
+# Писать в лог foodgram.nplusone запросы одной формы, повторенные
+# в одном HTTP-запросе больше NPLUSONE_THRESHOLD раз (для отладки).
+NPLUSONE_DETECT = os.getenv('NPLUSONE_DETECT', 'False') == 'True'
+
+# TrueType-шрифт с кириллицей для выгрузки списка покупок в PDF.
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
 
 AUTH_USER_MODEL = "users.User"
 
@@ -110,6 +182,15 @@ STATIC_ROOT = BASE_DIR / 'static'
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / 'media'
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'foodgram.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 DJOSER = {
@@ -133,7 +214,7 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
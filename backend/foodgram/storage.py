@@ -0,0 +1,67 @@
+"""Хранилище медиафайлов с именами по хэшу содержимого.
+
+Файл ``recipes/images/temp.png`` сохраняется как
+``recipes/images/<sha256>.png``; если такой файл уже есть, запись
+пропускается. Одинаковые изображения хранятся один раз, а файлы
+никогда не перезаписываются другим содержимым, поэтому их можно
+отдавать с Cache-Control: immutable. Удалять файлы может только
+команда gc_media, проверяющая ссылки из базы; повторная загрузка
+существующего файла обновляет его mtime, чтобы он снова попал под
+--grace.
+
+Имя файла от клиента не используется никогда: иначе загрузка чужого
+содержимого под именем ``<sha256(X)>.png`` подменила бы файл X для всех,
+кто загрузит его позже. Рендиции (их имена выводятся из имени
+оригинала) пишутся отдельным методом save_derived, недоступным
+парсерам и полям.
+"""
+import hashlib
+import os
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def hashed_name(self, name, content):
+        sha256 = hashlib.sha256()
+        for chunk in content.chunks():
+            sha256.update(chunk)
+        content.seek(0)
+        directory, basename = os.path.split(name)
+        extension = os.path.splitext(basename)[1].lower()
+        return os.path.join(directory, sha256.hexdigest() + extension)
+
+    def get_available_name(self, name, max_length=None):
+        # Имя все равно заменяется хэшем содержимого в _save.
+        return name
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            # gc_media считает файл сиротой по времени изменения: без
+            # обновления старый файл могут удалить до коммита новой записи.
+            os.utime(self.path(name))
+            return name
+        self._write(name, content)
+        return name
+
+    def save_derived(self, name, content):
+        """Записать (заменить) файл, производный от хэшированного оригинала.
+
+        Только для внутренних записей вроде рендиций: имя сохраняется
+        как есть, содержимое не проверяется.
+        """
+        self._write(name, content)
+        return name
+
+    def _write(self, name, content):
+        # Запись во временное имя и атомарное переименование: при гонке
+        # двух загрузок одного файла содержимое совпадает.
+        directory, basename = os.path.split(name)
+        extension = os.path.splitext(basename)[1]
+        temporary = super()._save(
+            os.path.join(directory, f'upload_{uuid.uuid4().hex}{extension}'),
+            content)
+        os.replace(self.path(temporary), self.path(name))
@@ -0,0 +1,374 @@
+"""Синтетические данные для нагрузочного тестирования.
+
+Объемы задаются масштабом: на единицу масштаба приходится
+FIXTURE_USERS_PER_SCALE пользователей и FIXTURE_RECIPES_PER_SCALE
+рецептов. Популярность авторов, рецептов и ингредиентов подчиняется
+закону Ципфа, число подписок и избранного у пользователя — распределению
+Парето. Имена, названия, тексты и ингредиенты берутся из pre_data.
+
+Строки пишутся пакетами: в PostgreSQL через COPY, в остальных СУБД —
+executemany. Идентификаторы пользователей и рецептов назначаются явно,
+поэтому при одинаковом seed результат совпадает с точностью до сдвига
+идентификаторов. Сгенерированные пользователи узнаются по префиксу
+FIXTURE_USERNAME_PREFIX.
+"""
+import csv
+import io
+import itertools
+import json
+import os
+import random
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files import File
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from django.db.models import Count, Max
+from rest_framework.authtoken.models import Token
+
+from api.authentication import get_token_cache
+from foodgram import renditions
+from foodgram.constants import (FEED_FANOUT_MAX_SUBSCRIBERS,
+                                FIXTURE_BATCH_SIZE, FIXTURE_PASSWORD,
+                                FIXTURE_RECIPES_PER_SCALE,
+                                FIXTURE_USERNAME_PREFIX,
+                                FIXTURE_USERS_PER_SCALE, RECIPE_MAX_TIME)
+from recipes import feed, shopping_list
+from recipes.cache import get_recipe_cache
+from recipes.models import (Favorite, FeedEntry, Ingredient,
+                            IngredientInRecipe, Recipe, ShoppingCart,
+                            ShoppingListItem)
+from users.models import Subscription, User
+
+# Доля пользователей, публикующих рецепты, и доля с непустой корзиной.
+AUTHOR_SHARE = 0.2
+CART_SHARE = 0.3
+ZIPF_EXPONENT = 1.1
+PUB_DATE_START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+PUB_DATE_RANGE = timedelta(days=365)
+AMOUNTS = (1, 2, 3, 5, 10, 20, 50, 100, 150, 200, 250, 300, 500)
+INGREDIENTS_PATH = os.path.join(settings.BASE_DIR, 'pre_data',
+                                'ingredients.json')
+
+
+def copy_rows(model, fields, rows, batch_size=FIXTURE_BATCH_SIZE):
+    """Записать кортежи значений fields пакетами; вернуть число строк."""
+    opts = model._meta
+    model_fields = [opts.get_field(name) for name in fields]
+    columns = ', '.join(connection.ops.quote_name(field.column)
+                        for field in model_fields)
+    table = connection.ops.quote_name(opts.db_table)
+    adapters = [
+        connection.ops.adapt_datetimefield_value
+        if isinstance(field, models.DateTimeField) else None
+        for field in model_fields
+    ]
+    placeholders = ', '.join(['%s'] * len(fields))
+    count = 0
+    rows = iter(rows)
+    with connection.cursor() as cursor:
+        while batch := list(itertools.islice(rows, batch_size)):
+            if any(adapters):
+                batch = [
+                    tuple(adapt(value) if adapt else value
+                          for adapt, value in zip(adapters, row))
+                    for row in batch
+                ]
+            if connection.vendor == 'postgresql':
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerows(
+                    tuple(r'\N' if value is None else value
+                          for value in row)
+                    for row in batch)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f"COPY {table} ({columns}) FROM STDIN "
+                    f"WITH (FORMAT csv, NULL '\\N')", buffer)
+            else:
+                cursor.executemany(
+                    f'INSERT INTO {table} ({columns}) '
+                    f'VALUES ({placeholders})', batch)
+            count += len(batch)
+    return count
+
+
+def reset_sequences(*model_classes):
+    """Сдвинуть последовательности после вставки явных id (PostgreSQL)."""
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(),
+                                                     model_classes):
+            cursor.execute(sql)
+
+
+def fixture_users():
+    return User.objects.filter(username__startswith=FIXTURE_USERNAME_PREFIX)
+
+
+def clear():
+    """Удалить сгенерированных пользователей, их данные и записи кэша."""
+    users = fixture_users().values('pk')
+    recipes = Recipe.objects.filter(author__in=users).values('pk')
+    recipe_ids = list(recipes.values_list('pk', flat=True))
+    token_keys = list(Token.objects.filter(user__in=users)
+                      .values_list('key', flat=True))
+    querysets = (
+        FeedEntry.objects.filter(user__in=users),
+        FeedEntry.objects.filter(recipe__in=recipes),
+        ShoppingListItem.objects.filter(user__in=users),
+        Favorite.objects.filter(recipe__in=recipes),
+        Favorite.objects.filter(user__in=users),
+        ShoppingCart.objects.filter(recipe__in=recipes),
+        ShoppingCart.objects.filter(user__in=users),
+        IngredientInRecipe.objects.filter(recipe__in=recipes),
+        Subscription.objects.filter(author__in=users),
+        Subscription.objects.filter(user__in=users),
+        Recipe.objects.filter(author__in=users),
+    )
+    with transaction.atomic():
+        # Без сигналов и сбора каскадов: миллионы строк удаляются
+        # несколькими DELETE, поэтому кэш чистится здесь же — только
+        # по удаленным объектам, а не целиком.
+        for queryset in querysets:
+            queryset._raw_delete(queryset.db)
+        fixture_users().delete()
+    recipe_ids = iter(recipe_ids)
+    while batch := list(itertools.islice(recipe_ids, FIXTURE_BATCH_SIZE)):
+        get_recipe_cache().delete_many(batch)
+    get_token_cache().delete_many(token_keys)
+    cache.delete(feed.POPULAR_AUTHORS_CACHE_KEY)
+
+
+def zipf_cum_weights(size, rng):
+    """Накопленные веса Ципфа для случайной перестановки size элементов."""
+    weights = [1 / rank ** ZIPF_EXPONENT for rank in range(1, size + 1)]
+    rng.shuffle(weights)
+    return list(itertools.accumulate(weights))
+
+
+def pareto_count(rng, scale, limit):
+    return min(1 + int((rng.paretovariate(1.5) - 1) * scale), limit)
+
+
+def distinct_choices(rng, population, cum_weights, count, exclude=None):
+    """count разных элементов (меньше, если выбор мал) по весам."""
+    chosen = set()
+    for _ in range(3):
+        chosen.update(rng.choices(population, cum_weights=cum_weights,
+                                  k=count - len(chosen)))
+        chosen.discard(exclude)
+        if len(chosen) >= count:
+            break
+    return chosen
+
+
+class Generator:
+
+    def __init__(self, scale, seed, batch_size=FIXTURE_BATCH_SIZE):
+        self.rng = random.Random(seed)
+        self.scale = scale
+        self.seed = seed
+        self.batch_size = batch_size
+        self.user_count = max(2, round(FIXTURE_USERS_PER_SCALE * scale))
+        self.recipe_count = max(1, round(FIXTURE_RECIPES_PER_SCALE * scale))
+        self.counts = {}
+
+    def load_sources(self):
+        pre_data = os.path.join(settings.BASE_DIR, 'pre_data')
+        with open(os.path.join(pre_data, 'authors.json'),
+                  encoding='utf-8') as file:
+            authors = json.load(file)
+        with open(os.path.join(pre_data, 'recipes.json'),
+                  encoding='utf-8') as file:
+            recipes = json.load(file)
+        self.first_names = sorted({author['first_name']
+                                   for author in authors})
+        self.last_names = sorted({author['last_name'] for author in authors})
+        self.dishes = [recipe['name'] for recipe in recipes]
+        self.texts = [recipe['text'] for recipe in recipes]
+        self.ingredients = self.load_ingredients()
+        field = Recipe._meta.get_field('image')
+        photos = os.path.join(pre_data, 'photos')
+        self.images = []
+        for filename in sorted(os.listdir(photos)):
+            with open(os.path.join(photos, filename), 'rb') as file:
+                name = field.storage.save(
+                    field.generate_filename(None, filename), File(file))
+            renditions.ensure(Recipe(image=name).image)
+            self.images.append(name)
+
+    def load_ingredients(self):
+        """[(pk, name)] ингредиентов pre_data в порядке файла.
+
+        Выбор не зависит от прочих строк справочника и их pk, поэтому
+        при одном seed рецепты получают одни и те же ингредиенты.
+        """
+        with open(INGREDIENTS_PATH, encoding='utf-8') as file:
+            source = [(item['name'].strip(), item['measurement_unit'].strip())
+                      for item in json.load(file)]
+        pks = {
+            (name, unit): pk
+            for pk, name, unit in Ingredient.objects
+            .filter(name__in={name for name, _ in source})
+            .values_list('pk', 'name', 'measurement_unit')
+        }
+        missing = len(set(source) - set(pks))
+        if missing:
+            raise ValueError(f'В справочнике нет {missing} ингредиентов '
+                             f'pre_data: выполните load_ingridient_list.')
+        return [(pks[key], key[0]) for key in dict.fromkeys(source)]
+
+    def run(self):
+        self.load_sources()
+        first_user = (User.objects.aggregate(Max('pk'))['pk__max'] or 0) + 1
+        first_recipe = (
+            Recipe.objects.aggregate(Max('pk'))['pk__max'] or 0) + 1
+        self.user_ids = range(first_user, first_user + self.user_count)
+        author_count = max(1, int(self.user_count * AUTHOR_SHARE))
+        self.author_ids = self.user_ids[:author_count]
+        self.recipe_ids = range(first_recipe,
+                                first_recipe + self.recipe_count)
+        with transaction.atomic():
+            self.counts['users'] = copy_rows(
+                User, ('id', 'password', 'is_superuser', 'username',
+                       'first_name', 'last_name', 'email', 'is_staff',
+                       'is_active', 'date_joined'),
+                self.user_rows(), self.batch_size)
+            recipe_authors = self.recipe_authors()
+            self.counts['recipes'] = copy_rows(
+                Recipe, ('id', 'author', 'name', 'text', 'cooking_time',
+                         'image', 'pub_date', 'updated_at'),
+                self.recipe_rows(recipe_authors), self.batch_size)
+            self.counts['ingredients_in_recipes'] = copy_rows(
+                IngredientInRecipe, ('recipe', 'ingredient', 'amount'),
+                self.ingredient_rows(), self.batch_size)
+            subscriptions = list(
+                self.relation_rows(self.author_ids, 3, 500, self_ok=False))
+            self.counts['subscriptions'] = copy_rows(
+                Subscription, ('user', 'author'), subscriptions,
+                self.batch_size)
+            self.counts['favorites'] = copy_rows(
+                Favorite, ('user', 'recipe'),
+                self.relation_rows(self.recipe_ids, 2, 1000),
+                self.batch_size)
+            self.counts['shopping_carts'] = copy_rows(
+                ShoppingCart, ('user', 'recipe'),
+                self.relation_rows(self.recipe_ids, 2, 30,
+                                   share=CART_SHARE),
+                self.batch_size)
+            self.counts['shopping_list_items'] = copy_rows(
+                ShoppingListItem, ('user', 'ingredient', 'total_amount'),
+                shopping_list.expected_totals(
+                    fixture_users().values('pk')
+                ).iterator(chunk_size=self.batch_size),
+                self.batch_size)
+            self.counts['feed_entries'] = copy_rows(
+                FeedEntry, ('user', 'recipe'),
+                self.feed_rows(subscriptions, recipe_authors),
+                self.batch_size)
+            reset_sequences(User, Recipe, IngredientInRecipe, Subscription,
+                            Favorite, ShoppingCart, ShoppingListItem,
+                            FeedEntry)
+        cache.delete(feed.POPULAR_AUTHORS_CACHE_KEY)
+        return self.manifest()
+
+    def user_rows(self):
+        password = make_password(FIXTURE_PASSWORD)
+        for number, pk in enumerate(self.user_ids):
+            username = f'{FIXTURE_USERNAME_PREFIX}{number}'
+            yield (pk, password, False, username,
+                   self.rng.choice(self.first_names),
+                   self.rng.choice(self.last_names),
+                   f'{username}@example.com', False, True,
+                   PUB_DATE_START + timedelta(minutes=number))
+
+    def recipe_authors(self):
+        """Автор каждого рецепта: у немногих авторов большинство рецептов."""
+        return self.rng.choices(
+            self.author_ids,
+            cum_weights=zipf_cum_weights(len(self.author_ids), self.rng),
+            k=self.recipe_count)
+
+    def recipe_rows(self, recipe_authors):
+        rng = self.rng
+        seconds = int(PUB_DATE_RANGE.total_seconds())
+        for pk, author_id in zip(self.recipe_ids, recipe_authors):
+            pub_date = PUB_DATE_START + timedelta(
+                seconds=rng.randrange(seconds))
+            _, ingredient = rng.choice(self.ingredients)
+            cooking_time = min(max(1, round(rng.lognormvariate(3.4, 0.6))),
+                               RECIPE_MAX_TIME)
+            yield (pk, author_id,
+                   f'{rng.choice(self.dishes)}: {ingredient} №{pk}',
+                   rng.choice(self.texts), cooking_time,
+                   rng.choice(self.images), pub_date, pub_date)
+
+    def ingredient_rows(self):
+        rng = self.rng
+        ingredient_ids = [pk for pk, _ in self.ingredients]
+        cum_weights = zipf_cum_weights(len(ingredient_ids), rng)
+        for recipe_id in self.recipe_ids:
+            chosen = distinct_choices(rng, ingredient_ids, cum_weights,
+                                      rng.randint(3, 12))
+            for ingredient_id in sorted(chosen):
+                yield recipe_id, ingredient_id, rng.choice(AMOUNTS)
+
+    def relation_rows(self, targets, scale, limit, share=1.0,
+                      self_ok=True):
+        """Связи пользователей с авторами или рецептами по Ципфу."""
+        rng = self.rng
+        cum_weights = zipf_cum_weights(len(targets), rng)
+        limit = min(limit, len(targets) - (0 if self_ok else 1))
+        for user_id in self.user_ids:
+            if share < 1 and rng.random() >= share:
+                continue
+            chosen = distinct_choices(
+                rng, targets, cum_weights, pareto_count(rng, scale, limit),
+                exclude=None if self_ok else user_id)
+            for target_id in sorted(chosen):
+                yield user_id, target_id
+
+    def feed_rows(self, subscriptions, recipe_authors):
+        """Ленты по тому же правилу, что и feed.rebuild."""
+        subscriber_counts = Counter(author for _, author in subscriptions)
+        recipes = defaultdict(list)
+        for recipe_id, author_id in zip(self.recipe_ids, recipe_authors):
+            recipes[author_id].append(recipe_id)
+        for user_id, author_id in subscriptions:
+            if subscriber_counts[author_id] <= FEED_FANOUT_MAX_SUBSCRIBERS:
+                for recipe_id in recipes[author_id]:
+                    yield user_id, recipe_id
+
+    def manifest(self):
+        """Сводка для бенчмарков: объемы и характерные объекты."""
+        users = fixture_users()
+        heavy = (users.annotate(follows=Count('subscriptions'))
+                 .order_by('-follows', 'pk').first())
+        popular = (users.annotate(followers=Count('subscribers'))
+                   .order_by('-followers', 'pk').first())
+        prolific = (users.annotate(recipe_count=Count('recipes'))
+                    .order_by('-recipe_count', 'pk').first())
+        cart_user = (users.annotate(cart=Count('shopping_carts'))
+                     .order_by('-cart', 'pk').first())
+        recipe = (Recipe.objects.filter(author__in=users)
+                  .annotate(favorite_count=Count('favorites'))
+                  .order_by('-favorite_count', 'pk').first())
+        return {
+            'scale': self.scale,
+            'seed': self.seed,
+            'password': FIXTURE_PASSWORD,
+            'counts': self.counts,
+            'users': [self.user_ids.start, self.user_ids.stop - 1],
+            'recipes': [self.recipe_ids.start, self.recipe_ids.stop - 1],
+            'samples': {
+                'heavy_reader': heavy.email,
+                'cart_user': cart_user.email,
+                'popular_author': popular.pk,
+                'prolific_author': prolific.pk,
+                'popular_recipe': recipe.pk,
+            },
+        }
@@ -0,0 +1,43 @@
+"""Общие заготовки данных для тестов приложений.
+
+Импортируется только из модулей tests.py.
+"""
+from django.core.cache import cache
+
+from api.authentication import get_token_cache
+from recipes.cache import get_recipe_cache
+from recipes.models import Ingredient, Recipe
+from users.models import User
+
+TEST_IMAGE = 'recipes/images/test.png'
+
+
+def create_user(name):
+    return User.objects.create_user(
+        username=name, email=f'{name}@example.com', password='password',
+        first_name=name, last_name=name)
+
+
+def make_recipe(author, name='Рецепт'):
+    """Несохраненный рецепт: для objects.create и bulk_create."""
+    return Recipe(author=author, name=name, text='Текст', cooking_time=10,
+                  image=TEST_IMAGE)
+
+
+def create_recipe(author, name='Рецепт'):
+    recipe = make_recipe(author, name)
+    recipe.save()
+    return recipe
+
+
+def create_ingredients(count):
+    return Ingredient.objects.bulk_create(
+        Ingredient(name=f'Ингредиент {index}', measurement_unit='г')
+        for index in range(count))
+
+
+def clear_caches():
+    """Кэш Django, кэш тел рецептов и кэш токенов — между тестами."""
+    cache.clear()
+    get_recipe_cache().clear()
+    get_token_cache().clear()
@@ -0,0 +1,123 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import router
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from api.authentication import CachedTokenAuthentication
+from foodgram import metrics, routers
+from foodgram.constants import REPLICA_PIN_COOKIE
+from foodgram.middleware import ReplicaRoutingMiddleware
+from recipes.models import Recipe
+
+REPLICA = 'replica1'
+
+
+def view(request):
+    """База, из которой запрос прочитал бы рецепт после своей записи."""
+    if request.method == 'POST':
+        router.db_for_write(Recipe)
+    return HttpResponse(router.db_for_read(Recipe))
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA], REPLICA_PIN_SECONDS=5)
+class ReplicaRoutingTests(SimpleTestCase):
+    """Чтение с реплики, закрепление за основной базой после записи."""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.middleware = ReplicaRoutingMiddleware(view)
+
+    def read(self, cookie=None, **headers):
+        request = self.factory.get('/', **headers)
+        if cookie is not None:
+            request.COOKIES[REPLICA_PIN_COOKIE] = cookie
+        return self.middleware(request).content.decode()
+
+    def write(self, **headers):
+        response = self.middleware(self.factory.post('/', **headers))
+        self.assertEqual(response.content.decode(), 'default')
+        return response.cookies[REPLICA_PIN_COOKIE].value
+
+    def test_safe_request_reads_replica(self):
+        self.assertEqual(self.read(), REPLICA)
+        # Вне запроса — основная база.
+        self.assertEqual(router.db_for_read(Recipe), 'default')
+
+    def test_read_after_write_by_cookie(self):
+        cookie = self.write()
+        self.assertEqual(self.read(cookie), 'default')
+
+    def test_read_after_write_by_token(self):
+        self.write(HTTP_AUTHORIZATION='Token abc')
+        self.assertEqual(self.read(HTTP_AUTHORIZATION='Token abc'),
+                         'default')
+        self.assertEqual(self.read(HTTP_AUTHORIZATION='Token xyz'),
+                         REPLICA)
+
+    def test_forged_cookie_is_ignored(self):
+        self.assertEqual(self.read(str(time.time() + 10 ** 6)), REPLICA)
+
+    def test_pin_is_capped(self):
+        response = HttpResponse()
+        response.set_signed_cookie(
+            REPLICA_PIN_COOKIE, str(time.time() + 10 ** 6),
+            salt=REPLICA_PIN_COOKIE)
+        cookie = response.cookies[REPLICA_PIN_COOKIE].value
+        self.assertEqual(self.read(cookie), REPLICA)
+
+    def test_token_lookup_falls_back_to_primary(self):
+        databases = []
+
+        def authenticate_credentials(self, key):
+            databases.append(router.db_for_read(Recipe))
+            if len(databases) == 1:
+                raise exceptions.AuthenticationFailed
+            return 'user', 'token'
+
+        with routers.routing(REPLICA), mock.patch.object(
+                TokenAuthentication, 'authenticate_credentials',
+                authenticate_credentials):
+            result = CachedTokenAuthentication().authenticate_from_db('key')
+            self.assertEqual(router.db_for_read(Recipe), REPLICA)
+        self.assertEqual(result, ('user', 'token'))
+        self.assertEqual(databases, [REPLICA, 'default'])
+
+
+class MetricsCollectTests(SimpleTestCase):
+    """Снимки завершившихся процессов уходят в архив без потерь."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.snapshot = {
+            'histograms': {}, 'responses': {'["x", "GET", "200"]': 5}}
+
+    def write(self, filename):
+        with open(os.path.join(self.directory, filename), 'w') as file:
+            json.dump(self.snapshot, file)
+
+    def responses(self):
+        with override_settings(METRICS_DIR=self.directory):
+            _, responses, _ = metrics.merge(metrics.collect())
+        return responses.get('["x", "GET", "200"]')
+
+    def test_dead_and_replaced_processes(self):
+        # Файл с pid текущего процесса, но другим стартом — от прежнего
+        # владельца pid; pid больше pid_max не бывает у живого процесса.
+        self.write(f'{os.getpid()}-1.json')
+        self.write(f'{2 ** 22 + 1}-1.json')
+        self.assertEqual(self.responses(), 10)
+        self.assertEqual(
+            sorted(os.listdir(self.directory)),
+            ['archive.json', 'archive.lock'])
+        self.assertEqual(self.responses(), 10)
@@ -0,0 +1,12 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'attempts', 'user',
+                    'created_at')
+    list_filter = ('kind', 'status')
+    search_fields = ('id', 'user__username')
+    readonly_fields = ('created_at', 'updated_at')
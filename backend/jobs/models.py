@@ -0,0 +1,81 @@
+import uuid
+
+from django.db import models
+from django.utils import timezone
+
+from foodgram.constants import JOB_KIND_MAX_LEN, JOB_MAX_ATTEMPTS
+from users.models import User
+
+
+class Job(models.Model):
+    """Фоновая задача, выполняемая командой run_workers."""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    id: models.UUIDField = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False)
+    kind: models.CharField = models.CharField(
+        max_length=JOB_KIND_MAX_LEN,
+        verbose_name='Тип задачи')
+    payload: models.JSONField = models.JSONField(
+        default=dict,
+        verbose_name='Параметры')
+    status: models.CharField = models.CharField(
+        max_length=16,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        verbose_name='Статус')
+    attempts: models.PositiveSmallIntegerField = (
+        models.PositiveSmallIntegerField(
+            default=0,
+            verbose_name='Попыток'))
+    max_attempts: models.PositiveSmallIntegerField = (
+        models.PositiveSmallIntegerField(
+            default=JOB_MAX_ATTEMPTS,
+            verbose_name='Максимум попыток'))
+    result: models.JSONField = models.JSONField(
+        null=True,
+        blank=True,
+        verbose_name='Результат')
+    error: models.TextField = models.TextField(
+        blank=True,
+        verbose_name='Ошибка')
+    user: models.ForeignKey = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        verbose_name='Пользователь')
+    run_after: models.DateTimeField = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Не раньше')
+    created_at: models.DateTimeField = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Создана')
+    updated_at: models.DateTimeField = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Изменена')
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        default_related_name = 'jobs'
+        ordering = ('-created_at',)
+        indexes = [
+            models.Index(fields=('status', 'run_after'),
+                         name='job_status_run_after_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.id} ({self.status})'
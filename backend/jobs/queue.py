@@ -0,0 +1,136 @@
+"""Очередь фоновых задач в базе данных, без внешнего брокера.
+
+Обработчики регистрируются декоратором ``register`` в модулях
+``<app>/tasks.py`` и вызываются с параметрами задачи как именованными
+аргументами. Результат должен сериализоваться в JSON; ключ ``file`` в
+нем — файл в default_storage, принадлежащий задаче: он удаляется вместе
+с задачей при очистке (prune).
+"""
+import os
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from foodgram.constants import (JOB_MAX_ATTEMPTS, JOB_RETRY_DELAY,
+                                JOB_STALE_TIMEOUT)
+from jobs.models import Job
+
+_handlers = {}
+
+
+def register(kind):
+    """Зарегистрировать функцию как обработчик задач типа kind."""
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, payload=None, user=None, max_attempts=JOB_MAX_ATTEMPTS):
+    """Поставить задачу в очередь (в текущей транзакции)."""
+    if kind not in _handlers:
+        raise ValueError(f'Неизвестный тип задачи: {kind}.')
+    job = Job.objects.create(kind=kind, payload=payload or {}, user=user,
+                             max_attempts=max_attempts)
+    if settings.JOBS_EAGER:
+        transaction.on_commit(lambda: run_inline(job.pk))
+    return job
+
+
+@transaction.atomic
+def claim(limit):
+    """Забрать до limit готовых к запуску задач и отметить их запущенными."""
+    job_ids = list(
+        Job.objects
+        .select_for_update(skip_locked=True)
+        .filter(status=Job.PENDING, run_after__lte=timezone.now())
+        .order_by('run_after')
+        .values_list('pk', flat=True)[:limit]
+    )
+    Job.objects.filter(pk__in=job_ids).update(
+        status=Job.RUNNING, attempts=F('attempts') + 1,
+        updated_at=timezone.now())
+    return job_ids
+
+
+def execute(job_id):
+    """Выполнить задачу; возвращает (успех, результат или трейсбек)."""
+    job = Job.objects.get(pk=job_id)
+    try:
+        return True, _handlers[job.kind](**job.payload)
+    except Exception:
+        return False, traceback.format_exc()
+
+
+def finish(job_id, ok, value):
+    """Записать итог выполнения; при ошибке запланировать повтор."""
+    job = Job.objects.get(pk=job_id)
+    if ok:
+        job.status, job.result, job.error = Job.DONE, value, ''
+    elif job.attempts < job.max_attempts:
+        job.status, job.error = Job.PENDING, value
+        job.run_after = timezone.now() + timedelta(
+            seconds=JOB_RETRY_DELAY * 2 ** (job.attempts - 1))
+    else:
+        job.status, job.error = Job.FAILED, value
+    job.save()
+
+
+def run_inline(job_id):
+    """Выполнить задачу в текущем процессе (режим JOBS_EAGER)."""
+    Job.objects.filter(pk=job_id).update(
+        status=Job.RUNNING, attempts=F('attempts') + 1)
+    finish(job_id, *execute(job_id))
+
+
+def requeue_stale():
+    """Вернуть в очередь задачи, зависшие после падения воркера."""
+    return Job.objects.filter(
+        status=Job.RUNNING,
+        updated_at__lt=timezone.now() - timedelta(seconds=JOB_STALE_TIMEOUT),
+    ).update(status=Job.PENDING, run_after=timezone.now())
+
+
+def requeue(job_ids):
+    """Вернуть в очередь задачи, чей процесс-воркер аварийно завершился.
+
+    Попытка уже засчитана при claim, поэтому задача, которая сама роняет
+    процесс, не будет перезапускаться бесконечно.
+    """
+    running = Job.objects.filter(pk__in=job_ids, status=Job.RUNNING)
+    error = 'Процесс-воркер аварийно завершился.'
+    failed = running.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, error=error, updated_at=timezone.now())
+    return failed + running.update(
+        status=Job.PENDING, error=error, run_after=timezone.now(),
+        updated_at=timezone.now())
+
+
+def delete_result_file(result):
+    name = (result or {}).get('file')
+    if not name:
+        return
+    default_storage.delete(name)
+    try:
+        # Каталог exports/<uuid>/ создается под один файл.
+        os.rmdir(os.path.dirname(default_storage.path(name)))
+    except (NotImplementedError, OSError):
+        pass
+
+
+def prune(older_than):
+    """Удалить завершенные задачи старше older_than и их файлы."""
+    finished = Job.objects.filter(
+        status__in=(Job.DONE, Job.FAILED),
+        updated_at__lt=timezone.now() - older_than,
+    )
+    for result in finished.exclude(result=None).values_list(
+            'result', flat=True).iterator():
+        delete_result_file(result)
+    count, _ = finished.delete()
+    return count
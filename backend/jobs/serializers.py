@@ -0,0 +1,28 @@
+from django.core.files.storage import default_storage
+from rest_framework import serializers
+
+from jobs.models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Сериализатор состояния фоновой задачи."""
+
+    error = serializers.SerializerMethodField()
+    file = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = ('id', 'kind', 'status', 'attempts', 'result', 'file',
+                  'error', 'created_at', 'updated_at')
+
+    def get_error(self, obj):
+        # Трейсбек остается в админке, клиенту — только последняя строка.
+        lines = obj.error.strip().splitlines()
+        return lines[-1] if lines else None
+
+    def get_file(self, obj):
+        name = (obj.result or {}).get('file')
+        if obj.status != Job.DONE or not name:
+            return None
+        return self.context['request'].build_absolute_uri(
+            default_storage.url(name))
@@ -0,0 +1,57 @@
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from api.management.commands import run_workers
+from jobs.models import Job
+
+
+class FakeExecutor:
+    """Пул, первый экземпляр которого «теряет» дочерний процесс."""
+
+    instances = 0
+
+    def __init__(self, **kwargs):
+        FakeExecutor.instances += 1
+        self.broken = FakeExecutor.instances == 1
+
+    def submit(self, func, job_id):
+        future = Future()
+        if self.broken:
+            future.set_exception(BrokenProcessPool())
+        else:
+            future.set_result((True, {'job': str(job_id)}))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+@mock.patch.object(run_workers, 'ProcessPoolExecutor', FakeExecutor)
+class BrokenPoolTests(TestCase):
+    """Падение процесса пула не останавливает run_workers."""
+
+    def setUp(self):
+        FakeExecutor.instances = 0
+
+    def run_workers(self):
+        call_command('run_workers', '--once', '--processes', '2',
+                     stdout=StringIO())
+
+    def test_jobs_are_requeued_on_new_pool(self):
+        jobs = [Job.objects.create(kind='renditions') for _ in range(2)]
+        self.run_workers()
+        self.assertEqual(FakeExecutor.instances, 2)
+        for job in jobs:
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (Job.DONE, 2))
+
+    def test_last_attempt_fails(self):
+        job = Job.objects.create(kind='renditions', max_attempts=1)
+        self.run_workers()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
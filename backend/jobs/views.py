@@ -0,0 +1,17 @@
+from rest_framework import mixins, viewsets
+from rest_framework.permissions import IsAuthenticated
+
+from foodgram.metrics import TimedViewMixin
+from jobs.models import Job
+from jobs.serializers import JobSerializer
+
+
+class JobViewSet(TimedViewMixin, mixins.RetrieveModelMixin,
+                 viewsets.GenericViewSet):
+    """Статус фоновых задач текущего пользователя."""
+
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return Job.objects.filter(user=self.request.user)
@@ -0,0 +1,15 @@
+"""Точки входа дочерних процессов пула run_workers.
+
+Процессы запускаются через spawn и импортируют этот модуль до
+django.setup(), поэтому модели здесь импортируются только внутри функций.
+"""
+import django
+
+
+def init():
+    django.setup()
+
+
+def execute(job_id):
+    from jobs import queue
+    return queue.execute(job_id)
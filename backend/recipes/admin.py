@@ -1,9 +1,13 @@
+from collections import Counter
+
 from django.contrib import admin
 from .models import (
     Ingredient, Recipe, IngredientInRecipe, Favorite, ShoppingCart
 )
 from django.db.models import Count
 
+from recipes import shopping_list
+
 
 class RecipeIngredientTab(admin.TabularInline):
     model = IngredientInRecipe
@@ -26,6 +30,13 @@ class RecipeAdmin(admin.ModelAdmin):
     def favorites_count(self, obj):
         return obj.total_favorites
 
+    def save_related(self, request, form, formsets, change):
+        old_amounts = (shopping_list.recipe_amounts([form.instance.pk])
+                       if change else Counter())
+        super().save_related(request, form, formsets, change)
+        shopping_list.recipe_ingredients_changed(form.instance.pk,
+                                                 old_amounts)
+
 
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
@@ -38,6 +49,23 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe')
     search_fields = ('user__username', 'recipe__name')
 
+    def save_model(self, request, obj, form, change):
+        if change:
+            shopping_list.carts_deleted(
+                ShoppingCart.objects.filter(pk=obj.pk)
+                .values_list('user_id', 'recipe_id'))
+        super().save_model(request, obj, form, change)
+        shopping_list.add_recipes(obj.user_id, [obj.recipe_id])
+
+    def delete_model(self, request, obj):
+        shopping_list.carts_deleted([(obj.user_id, obj.recipe_id)])
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        shopping_list.carts_deleted(
+            queryset.values_list('user_id', 'recipe_id'))
+        super().delete_queryset(request, queryset)
+
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
@@ -5,3 +5,17 @@ class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
     verbose_name = 'Рецепты'
+
+    def ready(self):
+        from foodgram.metrics import register_counter
+        from recipes import signals  # noqa: F401
+        from recipes.cache import get_recipe_cache
+
+        register_counter(
+            'foodgram_recipe_cache_hits_total',
+            'Попадания в кэш представлений рецептов.',
+            lambda: get_recipe_cache().hits)
+        register_counter(
+            'foodgram_recipe_cache_misses_total',
+            'Промахи кэша представлений рецептов.',
+            lambda: get_recipe_cache().misses)
@@ -0,0 +1,175 @@
+"""Кэш пользовательски-независимой части представления рецептов.
+
+Тело хранится вместе с updated_at рецепта и считается промахом, если
+оно не совпадает с текущим. Фоновые задачи (например, появление
+рендиций) обновляют updated_at, поэтому новое тело видят все процессы,
+даже если удаление из локального кэша случилось только в процессе
+воркера.
+"""
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+# Увеличивается при изменении формы кэшируемого представления.
+CACHE_VERSION = 4
+
+
+class BaseRecipeCache:
+    """Базовый бэкенд кэша представлений со счетчиками попаданий."""
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, recipe_id):
+        return f'recipe:v{CACHE_VERSION}:{recipe_id}'
+
+    def get_many(self, recipe_ids):
+        raise NotImplementedError
+
+    def set_many(self, data):
+        raise NotImplementedError
+
+    def delete_many(self, recipe_ids):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def get_or_set(self, recipe_id, default, prefetched=None, stamp=None):
+        """Вернуть тело рецепта из кэша или построить его через default().
+
+        stamp — updated_at рецепта: запись с другим значением устарела.
+        """
+        if prefetched is not None:
+            entry = prefetched.get(recipe_id)
+        else:
+            entry = self.get_many([recipe_id]).get(recipe_id)
+        if entry is not None and entry[0] == stamp:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        data = default()
+        self.set_many({recipe_id: (stamp, data)})
+        return data
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+class LocMemRecipeCache(BaseRecipeCache):
+    """LRU-кэш в памяти процесса.
+
+    Инвалидация по сигналам видна только текущему процессу, поэтому
+    записи дополнительно ограничены по времени жизни.
+    """
+
+    def __init__(self, max_entries=1024, timeout=60):
+        super().__init__(timeout)
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get_many(self, recipe_ids):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for recipe_id in recipe_ids:
+                key = self.make_key(recipe_id)
+                entry = self._data.get(key)
+                if entry is None:
+                    continue
+                expires, data = entry
+                if expires is not None and expires < now:
+                    del self._data[key]
+                    continue
+                self._data.move_to_end(key)
+                found[recipe_id] = data
+        return found
+
+    def set_many(self, data):
+        expires = (time.monotonic() + self.timeout
+                   if self.timeout is not None else None)
+        with self._lock:
+            for recipe_id, value in data.items():
+                key = self.make_key(recipe_id)
+                self._data[key] = (expires, value)
+                self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete_many(self, recipe_ids):
+        with self._lock:
+            for recipe_id in recipe_ids:
+                self._data.pop(self.make_key(recipe_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class DjangoRecipeCache(BaseRecipeCache):
+    """Кэш поверх Django cache API (например, django.core.cache RedisCache).
+
+    Ключи по префиксу Django cache удалять не умеет, поэтому clear()
+    увеличивает поколение: записи прежних поколений считаются промахами.
+    Поколение читается вместе с записями, лишнего обращения нет.
+    """
+
+    def __init__(self, alias='default', timeout=3600):
+        super().__init__(timeout)
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def generation_key(self):
+        return f'recipe:v{CACHE_VERSION}:generation'
+
+    def get_many(self, recipe_ids):
+        keys = {self.make_key(recipe_id): recipe_id
+                for recipe_id in recipe_ids}
+        found = self.cache.get_many([self.generation_key, *keys])
+        generation = found.pop(self.generation_key, 0)
+        return {keys[key]: value
+                for key, (entry_generation, value) in found.items()
+                if entry_generation == generation}
+
+    def set_many(self, data):
+        generation = self.cache.get(self.generation_key, 0)
+        self.cache.set_many(
+            {self.make_key(recipe_id): (generation, value)
+             for recipe_id, value in data.items()},
+            timeout=self.timeout)
+
+    def delete_many(self, recipe_ids):
+        self.cache.delete_many(
+            [self.make_key(recipe_id) for recipe_id in recipe_ids])
+
+    def clear(self):
+        self.cache.add(self.generation_key, 0, timeout=None)
+        self.cache.incr(self.generation_key)
+
+
+_recipe_cache = None
+
+
+def get_recipe_cache():
+    """Вернуть бэкенд кэша, настроенный в settings.RECIPE_CACHE."""
+    global _recipe_cache
+    if _recipe_cache is None:
+        config = settings.RECIPE_CACHE
+        backend = import_string(config['BACKEND'])
+        _recipe_cache = backend(**config.get('OPTIONS', {}))
+    return _recipe_cache
+
+
+def invalidate_recipes(recipe_ids):
+    get_recipe_cache().delete_many(list(recipe_ids))
@@ -0,0 +1,94 @@
+"""Предварительно сжатый полный каталог ингредиентов."""
+import gzip
+import hashlib
+import json
+import zlib
+from threading import Lock
+
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Порядок предпочтения кодировок при равных q в Accept-Encoding.
+PREFERRED_ENCODINGS = ('br', 'gzip', 'deflate', 'identity')
+
+
+def parse_accept_encoding(header):
+    weights = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding] = weight
+    return weights
+
+
+class IngredientCatalogue:
+    """JSON всех ингредиентов, сериализованный и сжатый раз на версию."""
+
+    def __init__(self):
+        self.version = None
+        self.digest = None
+        self.encodings = {}
+        self._lock = Lock()
+
+    def ensure(self, version, index):
+        if version != self.version:
+            with self._lock:
+                if version != self.version:
+                    self.build(version, index.all())
+
+    def build(self, version, entries):
+        body = json.dumps(
+            entries, ensure_ascii=False, separators=(',', ':')).encode()
+        encodings = {
+            'identity': body,
+            'gzip': gzip.compress(body, compresslevel=9, mtime=0),
+            'deflate': zlib.compress(body, 9),
+        }
+        if brotli is not None:
+            encodings['br'] = brotli.compress(body)
+        self.digest = hashlib.sha1(body).hexdigest()[:16]
+        self.encodings = encodings
+        self.version = version
+
+    def negotiate(self, accept_encoding):
+        weights = parse_accept_encoding(accept_encoding)
+        default = weights.get('*', 0.0)
+        candidates = [
+            (weights.get(coding, default), -rank, coding)
+            for rank, coding in enumerate(PREFERRED_ENCODINGS)
+            if coding in self.encodings and coding != 'identity'
+        ]
+        candidates.append((weights.get('identity', 1.0), -len(
+            PREFERRED_ENCODINGS), 'identity'))
+        weight, _, coding = max(candidates)
+        return coding if weight > 0 else 'identity'
+
+    def etag(self, coding):
+        suffix = '' if coding == 'identity' else f'-{coding}'
+        return f'"ingredients-{self.version}-{self.digest}{suffix}"'
+
+    def response(self, coding):
+        response = HttpResponse(
+            self.encodings[coding], content_type='application/json')
+        if coding != 'identity':
+            response.headers['Content-Encoding'] = coding
+        response.headers['ETag'] = self.etag(coding)
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+
+ingredient_catalogue = IngredientCatalogue()
@@ -0,0 +1,170 @@
+"""Лента рецептов от авторов, на которых подписан пользователь.
+
+Рецепты раскладываются по лентам подписчиков при публикации (fan-out on
+write) в таблицу FeedEntry. Для авторов, у которых подписчиков больше
+FEED_FANOUT_MAX_SUBSCRIBERS, это слишком дорого: их рецепты в таблицу не
+пишутся и подмешиваются при чтении (fan-out on read).
+
+Ленты обновляются сигналами (recipes.signals) при создании рецепта и
+создании или удалении подписки в той же транзакции — из API, админки и
+любого кода через ORM. Массовые операции (bulk_create, пачки из API)
+обновляют ленты сами одним запросом внутри batched(). Рецепты, изданные
+автором в период популярности, попадают в таблицу только после
+rebuild (команда rebuild_feeds) — ее нужно запускать, когда авторы
+опускаются ниже порога.
+"""
+import contextvars
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+
+from foodgram.constants import (FEED_BACKFILL_LIMIT,
+                                FEED_FANOUT_MAX_SUBSCRIBERS,
+                                FEED_POPULAR_CACHE_TIMEOUT)
+from recipes.models import FeedEntry, Recipe
+from users.models import Subscription
+
+POPULAR_AUTHORS_CACHE_KEY = 'feed:popular_authors'
+
+_batched = contextvars.ContextVar('feed_batched', default=False)
+
+
+@contextmanager
+def batched():
+    """Сигналы не трогают ленты: код внутри блока обновляет их сам."""
+    token = _batched.set(True)
+    try:
+        yield
+    finally:
+        _batched.reset(token)
+
+
+def is_batched():
+    return _batched.get()
+
+
+def _popular_author_ids():
+    return set(
+        Subscription.objects
+        .values('author')
+        .annotate(subscriber_count=Count('id'))
+        .filter(subscriber_count__gt=FEED_FANOUT_MAX_SUBSCRIBERS)
+        .values_list('author', flat=True)
+    )
+
+
+def popular_author_ids():
+    """Авторы, рецепты которых читаются без таблицы лент (кэшируется)."""
+    return cache.get_or_set(POPULAR_AUTHORS_CACHE_KEY, _popular_author_ids,
+                            FEED_POPULAR_CACHE_TIMEOUT)
+
+
+def recipe_created(recipe):
+    """Добавить новый рецепт в ленты подписчиков автора."""
+    subscriber_ids = list(
+        Subscription.objects
+        .filter(author_id=recipe.author_id)
+        .values_list('user_id', flat=True)[:FEED_FANOUT_MAX_SUBSCRIBERS + 1]
+    )
+    if len(subscriber_ids) > FEED_FANOUT_MAX_SUBSCRIBERS:
+        # feed_filter подмешивает рецепты автора, только если он есть в
+        # кэшированном списке популярных: устаревший список сбрасывается.
+        if recipe.author_id not in popular_author_ids():
+            cache.delete(POPULAR_AUTHORS_CACHE_KEY)
+        return
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, recipe_id=recipe.pk)
+         for user_id in subscriber_ids),
+        ignore_conflicts=True,
+        batch_size=1000,
+    )
+
+
+def recipes_created(recipes):
+    """Разложить пачку новых рецептов по лентам одним запросом подписок."""
+    by_author = defaultdict(list)
+    for recipe in recipes:
+        by_author[recipe.author_id].append(recipe.pk)
+    rows = (
+        Subscription.objects
+        .filter(author_id__in=set(by_author) - popular_author_ids())
+        .values_list('user_id', 'author_id')
+    )
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, recipe_id=recipe_id)
+         for user_id, author_id in rows.iterator()
+         for recipe_id in by_author[author_id]),
+        ignore_conflicts=True,
+        batch_size=1000,
+    )
+
+
+def subscribed(user_id, author_ids):
+    """Заполнить ленту последними рецептами новых авторов.
+
+    Популярные авторы тоже: записей не больше FEED_BACKFILL_LIMIT на
+    автора, и они остаются в ленте, когда автор опустится ниже порога.
+    """
+    recipe_ids = (
+        Recipe.objects
+        .filter(author_id__in=author_ids)
+        .annotate(row_number=Window(
+            RowNumber(),
+            partition_by=F('author_id'),
+            order_by=(F('pub_date').desc(), F('id').desc()),
+        ))
+        .filter(row_number__lte=FEED_BACKFILL_LIMIT)
+        .values_list('id', flat=True)
+    )
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, recipe_id=recipe_id)
+         for recipe_id in recipe_ids),
+        ignore_conflicts=True,
+        batch_size=1000,
+    )
+
+
+def unsubscribed(user_id, author_ids):
+    """Убрать из ленты рецепты авторов, от которых пользователь отписался."""
+    FeedEntry.objects.filter(
+        user_id=user_id, recipe__author_id__in=author_ids).delete()
+
+
+def feed_filter(user):
+    """Условие на Recipe: рецепты из ленты пользователя."""
+    popular = popular_author_ids()
+    if not popular:
+        return Q(feed_entries__user=user)
+    # Рецепты автора, ставшего популярным, могут остаться в таблице,
+    # поэтому таблица и подписки объединяются без JOIN, без дублей.
+    followed = (
+        Subscription.objects
+        .filter(user=user, author_id__in=popular)
+        .values('author_id')
+    )
+    return (Q(pk__in=FeedEntry.objects.filter(user=user).values('recipe_id'))
+            | Q(author_id__in=followed))
+
+
+def rebuild(user_ids=None):
+    """Пересобрать ленты user_ids (или всех) по текущим подпискам."""
+    entries = FeedEntry.objects.all()
+    subscriptions = Subscription.objects.all()
+    if user_ids is not None:
+        entries = entries.filter(user_id__in=user_ids)
+        subscriptions = subscriptions.filter(user_id__in=user_ids)
+    entries.delete()
+    rows = (
+        subscriptions
+        .exclude(author_id__in=popular_author_ids())
+        .filter(author__recipes__isnull=False)
+        .values_list('user_id', 'author__recipes')
+    )
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, recipe_id=recipe_id)
+         for user_id, recipe_id in rows.iterator()),
+        batch_size=1000,
+    )
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.21 on 2026-10-17 04:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+FEED_FANOUT_MAX_SUBSCRIBERS = 1000
+
+
+def fill_feeds(apps, schema_editor):
+    Subscription = apps.get_model('users', 'Subscription')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FeedEntry = apps.get_model('recipes', 'FeedEntry')
+    popular = (
+        Subscription.objects
+        .values('author')
+        .annotate(subscriber_count=models.Count('id'))
+        .filter(subscriber_count__gt=FEED_FANOUT_MAX_SUBSCRIBERS)
+        .values('author')
+    )
+    rows = (
+        Recipe.objects
+        .filter(author__subscribers__isnull=False)
+        .exclude(author__in=popular)
+        .values_list('author__subscribers__user', 'id')
+    )
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, recipe_id=recipe_id)
+         for user_id, recipe_id in rows.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0004_shoppinglistitem'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи лент',
+                'default_related_name': 'feed_entries',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_feed_entry'),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
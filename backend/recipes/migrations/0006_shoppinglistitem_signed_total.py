@@ -0,0 +1,18 @@
+# Generated by Django 4.2.21 on 2026-10-17 05:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_feedentry'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='shoppinglistitem',
+            name='total_amount',
+            field=models.IntegerField(verbose_name='Общее количество'),
+        ),
+    ]
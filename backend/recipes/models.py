@@ -1,12 +1,14 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 
 from foodgram.constants import (RECIPE_MIN_TIME,
                                 RECIPE_NAME_MAX_LEN,
                                 INGREDIENT_MIN_AMOUNT,
                                 INGREDIENT_NAME_MAX_LEN,
-                                MEASUREMENT_UNIT_MAX_LEN)
+                                MEASUREMENT_UNIT_MAX_LEN,
+                                TABLE_VERSION_NAME_MAX_LEN)
 
 User = get_user_model()
 
@@ -36,6 +38,48 @@ class Ingredient(models.Model):
         return f'{self.name}, {self.measurement_unit}'
 
 
+class TableVersionManager(models.Manager):
+
+    def get_version(self, name):
+        """Версия таблицы и время ее изменения одним запросом по индексу."""
+        return (
+            self.filter(name=name)
+            .values_list('version', 'updated_at')
+            .first()
+        ) or (0, None)
+
+    def bump(self, name):
+        if not self.filter(name=name).update(
+            version=models.F('version') + 1,
+            updated_at=timezone.now()
+        ):
+            self.get_or_create(name=name, defaults={'version': 1})
+
+
+class TableVersion(models.Model):
+    """Счетчик изменений таблицы для валидаторов кэша."""
+
+    name: models.CharField = models.CharField(
+        max_length=TABLE_VERSION_NAME_MAX_LEN,
+        unique=True,
+        verbose_name='Таблица')
+    version: models.PositiveBigIntegerField = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Версия')
+    updated_at: models.DateTimeField = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения')
+
+    objects = TableVersionManager()
+
+    class Meta:
+        verbose_name = 'Версия таблицы'
+        verbose_name_plural = 'Версии таблиц'
+
+    def __str__(self):
+        return f'{self.name}: {self.version}'
+
+
 class Recipe(models.Model):
     """Модель, содержащая информацию о конкретном рецепте."""
 
@@ -69,12 +113,19 @@ class Recipe(models.Model):
     pub_date: models.DateTimeField = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Дата публикации')
+    updated_at: models.DateTimeField = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения')
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         default_related_name = 'recipes'
         ordering = ['-pub_date',]
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='recipe_pub_date_id_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -155,3 +206,68 @@ class IngredientInRecipe(models.Model):
 
     def __str__(self):
         return f'{self.ingredient.name} в {self.recipe.name}'
+
+
+class ShoppingListItem(models.Model):
+    """Суммарное количество ингредиента в списке покупок пользователя.
+
+    Денормализация ShoppingCart x IngredientInRecipe, поддерживается
+    модулем recipes.shopping_list.
+    """
+
+    user: models.ForeignKey = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь')
+    ingredient: models.ForeignKey = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент')
+    # Без ограничения снизу: отрицательный итог означает рассинхронизацию
+    # и виден в rebuild_shopping_lists --verify.
+    total_amount: models.IntegerField = (
+        models.IntegerField(verbose_name='Общее количество')
+    )
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списков покупок'
+        default_related_name = 'shopping_list_items'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient',],
+                name='unique_shopping_list_item'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} x {self.total_amount}'
+
+
+class FeedEntry(models.Model):
+    """Рецепт в ленте подписок пользователя.
+
+    Заполняется при публикации рецепта (fan-out on write), поддерживается
+    модулем recipes.feed. Рецепты популярных авторов в таблицу не
+    попадают и подмешиваются при чтении.
+    """
+
+    user: models.ForeignKey = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь')
+    recipe: models.ForeignKey = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+        default_related_name = 'feed_entries'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe',],
+                name='unique_feed_entry'
+            )
+        ]
@@ -0,0 +1,244 @@
+"""Потоковая генерация простых текстовых PDF.
+
+Документ выдается по частям: страницы записываются по мере поступления
+строк, а шрифт, дерево страниц и таблица xref — в конце. Для кириллицы
+встраивается TrueType-шрифт (CIDFontType2, кодировка Identity-H).
+"""
+import struct
+import zlib
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+MARGIN = 50
+
+
+class TrueTypeFont:
+    """Минимальный разбор TrueType: cmap (формат 4) и ширины глифов."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.data = file.read()
+        num_tables = struct.unpack_from('>H', self.data, 4)[0]
+        self.tables = {}
+        for i in range(num_tables):
+            tag, _, offset, length = struct.unpack_from(
+                '>4sIII', self.data, 12 + 16 * i)
+            self.tables[tag.decode('latin-1')] = (offset, length)
+
+        head = self.tables['head'][0]
+        self.units_per_em = struct.unpack_from('>H', self.data, head + 18)[0]
+        self.bbox = [self.scale(value) for value in
+                     struct.unpack_from('>4h', self.data, head + 36)]
+        hhea = self.tables['hhea'][0]
+        ascent, descent = struct.unpack_from('>hh', self.data, hhea + 4)
+        self.ascent, self.descent = self.scale(ascent), self.scale(descent)
+        self.num_metrics = struct.unpack_from('>H', self.data, hhea + 34)[0]
+        self._read_cmap()
+        self._glyphs = {}
+
+    def scale(self, value):
+        return round(value * 1000 / self.units_per_em)
+
+    def _read_cmap(self):
+        cmap = self.tables['cmap'][0]
+        count = struct.unpack_from('>H', self.data, cmap + 2)[0]
+        subtables = {}
+        for i in range(count):
+            platform, encoding, offset = struct.unpack_from(
+                '>HHI', self.data, cmap + 4 + 8 * i)
+            subtables[(platform, encoding)] = cmap + offset
+        start = subtables.get((3, 1), subtables.get((0, 3)))
+        if start is None or struct.unpack_from(
+                '>H', self.data, start)[0] != 4:
+            raise ValueError('Шрифт без таблицы cmap формата 4.')
+        segments = struct.unpack_from('>H', self.data, start + 6)[0] // 2
+        self._end_codes = start + 14
+        self._start_codes = self._end_codes + 2 * segments + 2
+        self._deltas = self._start_codes + 2 * segments
+        self._range_offsets = self._deltas + 2 * segments
+        self._segments = segments
+
+    def glyph(self, char):
+        """Номер глифа и ширина (в 1/1000 em) для символа."""
+        if char not in self._glyphs:
+            gid = self._lookup(ord(char))
+            self._glyphs[char] = (gid, self._advance(gid))
+        return self._glyphs[char]
+
+    def _lookup(self, code):
+        if code > 0xFFFF:
+            return 0
+        for i in range(self._segments):
+            end = struct.unpack_from('>H', self.data, self._end_codes + 2 * i)
+            if end[0] < code:
+                continue
+            start = struct.unpack_from(
+                '>H', self.data, self._start_codes + 2 * i)[0]
+            if start > code:
+                return 0
+            delta = struct.unpack_from('>h', self.data, self._deltas + 2 * i)
+            position = self._range_offsets + 2 * i
+            range_offset = struct.unpack_from('>H', self.data, position)[0]
+            if range_offset == 0:
+                return (code + delta[0]) & 0xFFFF
+            address = position + range_offset + 2 * (code - start)
+            gid = struct.unpack_from('>H', self.data, address)[0]
+            return (gid + delta[0]) & 0xFFFF if gid else 0
+        return 0
+
+    def _advance(self, gid):
+        hmtx = self.tables['hmtx'][0]
+        index = min(gid, self.num_metrics - 1)
+        return self.scale(
+            struct.unpack_from('>H', self.data, hmtx + 4 * index)[0])
+
+
+class StreamingPDF:
+    """Текстовый PDF, который выдается кусками по мере чтения строк."""
+
+    # Номера объектов, известных заранее; страницы нумеруются после них.
+    CATALOG, PAGES, FONT, CID_FONT, DESCRIPTOR, FONT_FILE, TO_UNICODE = (
+        range(1, 8))
+
+    def __init__(self, font_path, font_size=11, leading=16):
+        self.font = TrueTypeFont(font_path)
+        self.font_size = font_size
+        self.leading = leading
+        self.lines_per_page = (PAGE_HEIGHT - 2 * MARGIN) // leading
+
+    def render(self, lines):
+        self.offsets = {}
+        self.used = {}
+        self.position = 0
+        self.next_id = self.TO_UNICODE + 1
+        pages = []
+
+        yield self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        page = []
+        for line in lines:
+            page.append(line)
+            if len(page) == self.lines_per_page:
+                pages.append(self.next_id + 1)
+                yield from self._page(page)
+                page = []
+        if page or not pages:
+            pages.append(self.next_id + 1)
+            yield from self._page(page)
+
+        yield from self._font_objects()
+        kids = ' '.join(f'{page_id} 0 R' for page_id in pages)
+        yield self._object(
+            self.PAGES,
+            f'<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>')
+        yield self._object(
+            self.CATALOG, f'<< /Type /Catalog /Pages {self.PAGES} 0 R >>')
+        yield self._xref()
+
+    def _write(self, chunk):
+        self.position += len(chunk)
+        return chunk
+
+    def _object(self, number, body, stream=None):
+        self.offsets[number] = self.position
+        if isinstance(body, str):
+            body = body.encode()
+        chunk = f'{number} 0 obj\n'.encode() + body
+        if stream is not None:
+            chunk += b'\nstream\n' + stream + b'\nendstream'
+        return self._write(chunk + b'\nendobj\n')
+
+    def _encode(self, text):
+        codes = []
+        for char in text:
+            gid, width = self.font.glyph(char)
+            self.used[gid] = (char, width)
+            codes.append(f'{gid:04X}')
+        return ''.join(codes)
+
+    def _page(self, lines):
+        content_id, page_id = self.next_id, self.next_id + 1
+        self.next_id += 2
+        top = PAGE_HEIGHT - MARGIN - self.font_size
+        commands = [
+            'BT',
+            f'/F1 {self.font_size} Tf',
+            f'{self.leading} TL',
+            f'{MARGIN} {top} Td',
+        ]
+        commands.extend(f'<{self._encode(line)}> Tj T*' for line in lines)
+        commands.append('ET')
+        content = zlib.compress('\n'.join(commands).encode())
+        yield self._object(
+            content_id,
+            f'<< /Length {len(content)} /Filter /FlateDecode >>', content)
+        yield self._object(
+            page_id,
+            f'<< /Type /Page /Parent {self.PAGES} 0 R '
+            f'/MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+            f'/Resources << /Font << /F1 {self.FONT} 0 R >> >> '
+            f'/Contents {content_id} 0 R >>')
+
+    def _font_objects(self):
+        font = self.font
+        yield self._object(
+            self.FONT,
+            f'<< /Type /Font /Subtype /Type0 /BaseFont /EmbeddedFont '
+            f'/Encoding /Identity-H '
+            f'/DescendantFonts [{self.CID_FONT} 0 R] '
+            f'/ToUnicode {self.TO_UNICODE} 0 R >>')
+        widths = ' '.join(
+            f'{gid} [{width}]'
+            for gid, (_, width) in sorted(self.used.items()))
+        yield self._object(
+            self.CID_FONT,
+            f'<< /Type /Font /Subtype /CIDFontType2 /BaseFont /EmbeddedFont '
+            f'/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) '
+            f'/Supplement 0 >> /FontDescriptor {self.DESCRIPTOR} 0 R '
+            f'/CIDToGIDMap /Identity /W [{widths}] >>')
+        bbox = ' '.join(str(value) for value in font.bbox)
+        yield self._object(
+            self.DESCRIPTOR,
+            f'<< /Type /FontDescriptor /FontName /EmbeddedFont /Flags 32 '
+            f'/FontBBox [{bbox}] /ItalicAngle 0 /Ascent {font.ascent} '
+            f'/Descent {font.descent} /CapHeight {font.ascent} /StemV 80 '
+            f'/FontFile2 {self.FONT_FILE} 0 R >>')
+        data = zlib.compress(font.data)
+        yield self._object(
+            self.FONT_FILE,
+            f'<< /Length {len(data)} /Length1 {len(font.data)} '
+            f'/Filter /FlateDecode >>', data)
+        mappings = [
+            f'<{gid:04X}> <{char.encode("utf-16-be").hex().upper()}>'
+            for gid, (char, _) in sorted(self.used.items())
+        ]
+        blocks = ''.join(
+            f'{len(block)} beginbfchar\n' + '\n'.join(block)
+            + '\nendbfchar\n'
+            for block in (mappings[i:i + 100]
+                          for i in range(0, len(mappings), 100))
+        )
+        cmap = (
+            '/CIDInit /ProcSet findresource begin\n12 dict begin\n'
+            'begincmap\n/CIDSystemInfo << /Registry (Adobe) '
+            '/Ordering (UCS) /Supplement 0 >> def\n'
+            '/CMapName /Adobe-Identity-UCS def\n/CMapType 2 def\n'
+            '1 begincodespacerange\n<0000> <FFFF>\nendcodespacerange\n'
+            f'{blocks}endcmap\n'
+            'CMapName currentdict /CMap defineresource pop\nend\nend'
+        ).encode()
+        yield self._object(
+            self.TO_UNICODE, f'<< /Length {len(cmap)} >>', cmap)
+
+    def _xref(self):
+        size = self.next_id
+        rows = ['xref', f'0 {size}', '0000000000 65535 f ']
+        rows.extend(f'{self.offsets[number]:010d} 00000 n '
+                    for number in range(1, size))
+        rows.extend([
+            'trailer',
+            f'<< /Size {size} /Root {self.CATALOG} 0 R >>',
+            'startxref',
+            str(self.position),
+            '%%EOF',
+        ])
+        return self._write(('\n'.join(rows) + '\n').encode())
@@ -0,0 +1,108 @@
+"""Индекс ингредиентов в памяти процесса для автодополнения."""
+from bisect import bisect_left
+from collections import Counter
+from threading import Lock
+
+from foodgram.constants import (INGREDIENT_FUZZY_LIMIT,
+                                INGREDIENT_FUZZY_THRESHOLD)
+from recipes.models import Ingredient
+
+
+def trigrams(text):
+    """Триграммы в духе pg_trgm: слова дополняются пробелами."""
+    result = set()
+    for word in text.split():
+        padded = f'  {word} '
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+class IngredientIndex:
+    """Отсортированный по casefold-имени массив ингредиентов.
+
+    Строится лениво и перестраивается при смене версии таблицы
+    ингредиентов (TableVersion), поэтому согласован между процессами.
+    """
+
+    def __init__(self):
+        self.version = None
+        self._entries = []
+        self._keys = []
+        self._trigrams = None
+        self._lock = Lock()
+
+    def ensure(self, version):
+        if version != self.version:
+            with self._lock:
+                if version != self.version:
+                    self.build(version)
+
+    def build(self, version):
+        rows = Ingredient.objects.values('id', 'name', 'measurement_unit')
+        entries = sorted(
+            rows, key=lambda row: (row['name'].casefold(), row['id']))
+        self._entries = entries
+        self._keys = [entry['name'].casefold() for entry in entries]
+        self._trigrams = None
+        self.version = version
+
+    def _prefix_range(self, key):
+        lo = bisect_left(self._keys, key)
+        hi = bisect_left(self._keys, key + '\U0010ffff', lo)
+        return lo, hi
+
+    def prefix(self, query):
+        """Совпадения по началу имени в порядке Ingredient.Meta.ordering."""
+        lo, hi = self._prefix_range(query.casefold())
+        return self._entries[lo:hi][::-1]
+
+    def fuzzy(self, query, limit=INGREDIENT_FUZZY_LIMIT):
+        """Ранжированный поиск: префикс, подстрока, затем триграммы."""
+        key = query.casefold()
+        lo, hi = self._prefix_range(key)
+        ranked = list(range(lo, hi))
+        seen = set(ranked)
+        substring = sorted(
+            (self._keys[i].find(key), i)
+            for i in range(len(self._keys))
+            if i not in seen and key in self._keys[i]
+        )
+        ranked += [i for _, i in substring]
+        seen.update(ranked)
+        if len(ranked) < limit:
+            ranked += [i for i in self._similar(key) if i not in seen]
+        return [self._entries[i] for i in ranked[:limit]]
+
+    def _similar(self, key):
+        if self._trigrams is None:
+            self._build_trigrams()
+        query_trigrams = trigrams(key)
+        if not query_trigrams:
+            return []
+        shared = Counter()
+        for trigram in query_trigrams:
+            shared.update(self._trigrams.get(trigram, ()))
+        scored = []
+        for i, common in shared.items():
+            similarity = common / (
+                len(query_trigrams) + self._sizes[i] - common)
+            if similarity >= INGREDIENT_FUZZY_THRESHOLD:
+                scored.append((-similarity, i))
+        return [i for _, i in sorted(scored)]
+
+    def _build_trigrams(self):
+        index = {}
+        sizes = []
+        for i, key in enumerate(self._keys):
+            entry_trigrams = trigrams(key)
+            sizes.append(len(entry_trigrams))
+            for trigram in entry_trigrams:
+                index.setdefault(trigram, []).append(i)
+        self._sizes = sizes
+        self._trigrams = index
+
+    def all(self):
+        return self._entries[::-1]
+
+
+ingredient_index = IngredientIndex()
@@ -1,6 +1,15 @@
+import json
+
+from django.db import models, transaction
+from django.http import QueryDict
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from foodgram.reformat_image import ReformattingBase64
+from foodgram.relations import get_relations
+from foodgram.renditions import RenditionsField, absolute_urls
+
+from recipes import shopping_list
+from recipes.cache import get_recipe_cache
 
 from recipes.models import (
     Ingredient,
@@ -17,10 +26,40 @@ from foodgram.constants import (RECIPE_MIN_TIME,
                                 INGREDIENT_MAX_AMOUNT,)
 
 
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Берет объект из preloaded, если список загружен заранее."""
+
+    preloaded = None
+
+    def to_internal_value(self, data):
+        if self.preloaded is not None and not isinstance(data, bool):
+            try:
+                return self.preloaded[int(data)]
+            except (KeyError, TypeError, ValueError):
+                pass
+        return super().to_internal_value(data)
+
+
+class RecipeIngredientListSerializer(serializers.ListSerializer):
+    """Загружает все ингредиенты списка одним запросом."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            ids = set()
+            for item in data:
+                try:
+                    ids.add(int(item['id']))
+                except (KeyError, TypeError, ValueError):
+                    continue
+            self.child.fields['id'].preloaded = (
+                Ingredient.objects.in_bulk(ids))
+        return super().to_internal_value(data)
+
+
 class RecipeIngredientSerializer(serializers.ModelSerializer):
     """Сериализатор для представления ингредиента в рецепте."""
 
-    id = serializers.PrimaryKeyRelatedField(
+    id = PreloadedPrimaryKeyRelatedField(
         queryset=Ingredient.objects.all())
     name = serializers.ReadOnlyField(source='ingredient.name')
     amount = serializers.IntegerField(
@@ -32,44 +71,34 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
     class Meta:
         model = IngredientInRecipe
         fields = ('id', 'name', 'amount', 'measurement_unit',)
+        list_serializer_class = RecipeIngredientListSerializer
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
-    """Сериализатор для чтения рецепта."""
+class RecipeBodySerializer(serializers.ModelSerializer):
+    """Сериализатор не зависящей от пользователя части рецепта.
+
+    Используется без request в контексте, поэтому ссылки на изображения
+    относительные, а результат можно кэшировать для всех пользователей.
+    """
 
     image = ReformattingBase64()
+    image_renditions = RenditionsField(source='image')
     author = CustomUserSerializer(read_only=True)
     ingredients = serializers.SerializerMethodField()
-    is_favorited = serializers.SerializerMethodField()
-    is_in_shopping_cart = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
         fields = (
             'id',
             'image',
+            'image_renditions',
             'author',
             'name',
             'cooking_time',
             'ingredients',
             'text',
-            'is_favorited',
-            'is_in_shopping_cart',
         )
 
-    def _check_user_relation(self, related_manager):
-        user = self.context.get('request').user
-        return (
-            user.is_authenticated
-            and related_manager.filter(user=user).exists()
-        )
-
-    def get_is_favorited(self, obj):
-        return self._check_user_relation(obj.favorites)
-
-    def get_is_in_shopping_cart(self, obj):
-        return self._check_user_relation(obj.shopping_carts)
- 
     def get_ingredients(self, obj):
         ingredients = []
         for ingredient_in_recipe in obj.ingredientinrecipe_set.all():
@@ -83,6 +112,78 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         return ingredients
 
 
+class RecipeReadListSerializer(serializers.ListSerializer):
+    """Загружает тела всей страницы рецептов из кэша одним запросом."""
+
+    def to_representation(self, data):
+        recipes = list(
+            data.all() if isinstance(data, models.manager.BaseManager)
+            else data
+        )
+        self.child.prefetched_bodies = get_recipe_cache().get_many(
+            [recipe.pk for recipe in recipes])
+        return super().to_representation(recipes)
+
+
+class RecipeReadSerializer(RecipeBodySerializer):
+    """Сериализатор для чтения рецепта."""
+
+    is_favorited = serializers.SerializerMethodField()
+    is_in_shopping_cart = serializers.SerializerMethodField()
+
+    prefetched_bodies = None
+
+    class Meta:
+        model = Recipe
+        fields = RecipeBodySerializer.Meta.fields + (
+            'is_favorited',
+            'is_in_shopping_cart',
+        )
+        list_serializer_class = RecipeReadListSerializer
+
+    def to_representation(self, instance):
+        body = get_recipe_cache().get_or_set(
+            instance.pk,
+            lambda: dict(RecipeBodySerializer(instance).data),
+            prefetched=self.prefetched_bodies,
+            stamp=instance.updated_at,
+        )
+        author = dict(body['author'])
+        author['avatar'] = self._absolute_url(author['avatar'])
+        author['avatar_renditions'] = self._absolute_urls(
+            author['avatar_renditions'])
+        author['is_subscribed'] = self.fields['author'].get_is_subscribed(
+            instance.author)
+        return {
+            **body,
+            'image': self._absolute_url(body['image']),
+            'image_renditions': self._absolute_urls(body['image_renditions']),
+            'author': author,
+            'is_favorited': self.get_is_favorited(instance),
+            'is_in_shopping_cart': self.get_is_in_shopping_cart(instance),
+        }
+
+    def _absolute_url(self, url):
+        request = self.context.get('request')
+        if url and request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    def _absolute_urls(self, urls):
+        request = self.context.get('request')
+        if request is None:
+            return urls
+        return absolute_urls(urls, request)
+
+    def get_is_favorited(self, obj):
+        relations = get_relations(self.context.get('request'))
+        return obj.pk in relations.favorite_recipe_ids
+
+    def get_is_in_shopping_cart(self, obj):
+        relations = get_relations(self.context.get('request'))
+        return obj.pk in relations.cart_recipe_ids
+
+
 class RecipeWriteSerializer(serializers.ModelSerializer):
     """Сериализатор для создания и обновления рецептов."""
 
@@ -104,8 +205,26 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             'text',
         )
 
+    def to_internal_value(self, data):
+        if isinstance(data, QueryDict):
+            data = self.parse_form_data(data)
+        return super().to_internal_value(data)
+
+    def parse_form_data(self, data):
+        """multipart/form-data: ингредиенты передаются JSON-строкой."""
+        data = data.dict()
+        ingredients = data.get('ingredients')
+        if isinstance(ingredients, str):
+            try:
+                data['ingredients'] = json.loads(ingredients)
+            except ValueError:
+                raise ValidationError({'ingredients': [
+                    'Ожидается список ингредиентов в формате JSON.'
+                ]})
+        return data
+
     def validate(self, data):
-        ingreds_data = self.initial_data.get('ingredients')
+        ingreds_data = data.get('ingredients')
 
         if not ingreds_data:
             raise ValidationError(
@@ -113,7 +232,7 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
                     'В рецепте должен содержаться хотя бы один ингридиент.'
                 ]}
             )
-        ingredients_ids = [item['id'] for item in ingreds_data]
+        ingredients_ids = [item['id'].pk for item in ingreds_data]
         if len(ingredients_ids) != len(set(ingredients_ids)):
             raise ValidationError(
                 {'ingredients':
@@ -131,20 +250,28 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             for item in ingredients
         )
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         recipe = Recipe.objects.create(**validated_data)
         self.create_ingredients(recipe, ingredients)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients = validated_data.pop('ingredients')
+        old_amounts = shopping_list.recipe_amounts([instance.pk])
         instance = super().update(instance, validated_data)
         instance.ingredientinrecipe_set.all().delete()
         self.create_ingredients(instance, ingredients)
+        shopping_list.recipe_ingredients_changed(instance.pk, old_amounts)
         return instance
 
     def to_representation(self, instance):
+        models.prefetch_related_objects([instance], models.Prefetch(
+            'ingredientinrecipe_set',
+            queryset=IngredientInRecipe.objects.select_related('ingredient'),
+        ))
         return RecipeReadSerializer(
             instance,
             context=self.context).data
@@ -193,9 +320,11 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
 class RecipeShortSerializer(serializers.ModelSerializer):
     """Сериализатор для сокращенного представления рецепта."""
 
+    image_renditions = RenditionsField(source='image')
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time',)
+        fields = ('id', 'name', 'image', 'image_renditions', 'cooking_time',)
 
 
 class IngredientSerializer(serializers.ModelSerializer):
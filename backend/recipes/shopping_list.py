@@ -0,0 +1,152 @@
+"""Поддержка денормализованной таблицы списков покупок (ShoppingListItem).
+
+Все изменения вычисляются как приращения количества по ингредиентам и
+применяются одним UPDATE, поэтому параллельные запросы не теряют друг
+друга. Функции нужно вызывать внутри той же транзакции, что и изменение
+ShoppingCart или состава рецепта: их вызывают представления API,
+админка и сигнал удаления рецепта. Итоги не ограничиваются нулем, так
+что расхождение видно в rebuild_shopping_lists --verify и исправляется
+этой же командой.
+"""
+from collections import Counter
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Case, F, Sum, Value, When
+
+from recipes.models import IngredientInRecipe, ShoppingCart, ShoppingListItem
+
+
+def recipe_amounts(recipe_ids):
+    """Суммарные количества ингредиентов в рецептах: {ingredient_id: n}."""
+    return Counter(dict(
+        IngredientInRecipe.objects
+        .filter(recipe_id__in=recipe_ids)
+        .values('ingredient_id')
+        .annotate(total=Sum('amount'))
+        .order_by()
+        .values_list('ingredient_id', 'total')
+    ))
+
+
+def apply_deltas(user_ids, deltas):
+    """Прибавить deltas {ingredient_id: n} к спискам покупок user_ids."""
+    user_ids = list(user_ids)
+    deltas = {key: value for key, value in deltas.items() if value}
+    if not user_ids or not deltas:
+        return
+    added = [key for key, value in deltas.items() if value > 0]
+    if added:
+        ShoppingListItem.objects.bulk_create(
+            (ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id,
+                              total_amount=0)
+             for user_id in user_ids for ingredient_id in added),
+            ignore_conflicts=True,
+            batch_size=1000,
+        )
+    items = ShoppingListItem.objects.filter(
+        user_id__in=user_ids, ingredient_id__in=deltas)
+    items.update(total_amount=F('total_amount') + Case(
+        *(When(ingredient_id=key, then=Value(value))
+          for key, value in deltas.items()),
+        default=Value(0),
+    ))
+    if len(added) < len(deltas):
+        items.filter(total_amount=0).delete()
+
+
+@transaction.atomic
+def add_recipes(user_id, recipe_ids):
+    apply_deltas([user_id], recipe_amounts(recipe_ids))
+
+
+@transaction.atomic
+def remove_recipes(user_id, recipe_ids):
+    apply_deltas([user_id], {
+        key: -value for key, value in recipe_amounts(recipe_ids).items()})
+
+
+def carted_user_ids(recipe_id):
+    return list(
+        ShoppingCart.objects
+        .filter(recipe_id=recipe_id)
+        .values_list('user_id', flat=True)
+    )
+
+
+def recipe_ingredients_changed(recipe_id, old_amounts):
+    """Учесть новый состав рецепта у всех, у кого он в корзине."""
+    deltas = recipe_amounts([recipe_id])
+    deltas.subtract(old_amounts)
+    apply_deltas(carted_user_ids(recipe_id), deltas)
+
+
+def carts_deleted(carts):
+    """Учесть удаление строк ShoppingCart [(user_id, recipe_id)]."""
+    by_user = {}
+    for user_id, recipe_id in carts:
+        by_user.setdefault(user_id, []).append(recipe_id)
+    for user_id, recipe_ids in by_user.items():
+        remove_recipes(user_id, recipe_ids)
+
+
+def recipe_deleted(recipe_id):
+    apply_deltas(carted_user_ids(recipe_id), {
+        key: -value for key, value in recipe_amounts([recipe_id]).items()})
+
+
+def expected_totals(user_ids=None):
+    """Итоги, вычисленные заново по ShoppingCart и IngredientInRecipe."""
+    if user_ids is None:
+        lookups = {'recipe__shopping_carts__user__isnull': False}
+    else:
+        lookups = {'recipe__shopping_carts__user__in': user_ids}
+    return (
+        IngredientInRecipe.objects
+        .filter(**lookups)
+        .values('recipe__shopping_carts__user', 'ingredient')
+        .annotate(total=Sum('amount'))
+        .order_by()
+        .values_list('recipe__shopping_carts__user', 'ingredient', 'total')
+    )
+
+
+@transaction.atomic
+def rebuild(user_ids=None, batch_size=1000):
+    """Пересобрать таблицу для user_ids (или для всех пользователей)."""
+    items = ShoppingListItem.objects.all()
+    if user_ids is not None:
+        items = items.filter(user_id__in=user_ids)
+    items.delete()
+    rows = expected_totals(user_ids).iterator(chunk_size=batch_size)
+    count = 0
+    while batch := list(islice(rows, batch_size)):
+        ShoppingListItem.objects.bulk_create(
+            ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id,
+                             total_amount=total)
+            for user_id, ingredient_id, total in batch
+        )
+        count += len(batch)
+    return count
+
+
+def verify(user_ids=None):
+    """Расхождения таблицы с эталоном: [(user, ingredient, факт, эталон)]."""
+    expected = {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in expected_totals(user_ids)
+    }
+    items = ShoppingListItem.objects.all()
+    if user_ids is not None:
+        items = items.filter(user_id__in=user_ids)
+    mismatches = []
+    for user_id, ingredient_id, total in items.values_list(
+            'user_id', 'ingredient_id', 'total_amount').iterator():
+        reference = expected.pop((user_id, ingredient_id), None)
+        if reference != total:
+            mismatches.append((user_id, ingredient_id, total, reference))
+    mismatches.extend(
+        (user_id, ingredient_id, None, total)
+        for (user_id, ingredient_id), total in expected.items()
+    )
+    return mismatches
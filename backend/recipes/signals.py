@@ -0,0 +1,119 @@
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from foodgram.constants import INGREDIENTS_TABLE
+from jobs import queue
+from recipes import feed, shopping_list
+from recipes.cache import invalidate_recipes
+from recipes.models import (Ingredient, IngredientInRecipe, Recipe,
+                            TableVersion)
+from users.models import Subscription, User
+
+# Поля автора, попадающие в кэшированное представление рецепта.
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name', 'avatar'}
+
+
+def _invalidate_on_commit(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        transaction.on_commit(lambda: invalidate_recipes(recipe_ids))
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    _invalidate_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(sender, instance, created, **kwargs):
+    if created and not feed.is_batched():
+        feed.recipe_created(instance)
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_created(sender, instance, created, **kwargs):
+    if created and not feed.is_batched():
+        feed.subscribed(instance.user_id, [instance.author_id])
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(sender, instance, **kwargs):
+    if not feed.is_batched():
+        feed.unsubscribed(instance.user_id, [instance.author_id])
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, instance, **kwargs):
+    # До каскадного удаления корзин и ингредиентов: при удалении из API,
+    # админки и вместе с автором.
+    shopping_list.recipe_deleted(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=IngredientInRecipe)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    _invalidate_on_commit([instance.recipe_id])
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_changed(sender, instance, created, **kwargs):
+    if not created:
+        _invalidate_on_commit(
+            IngredientInRecipe.objects
+            .filter(ingredient=instance)
+            .values_list('recipe_id', flat=True)
+        )
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields and not AUTHOR_FIELDS & set(update_fields)):
+        return
+    _invalidate_on_commit(instance.recipes.values_list('pk', flat=True))
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def ingredients_table_changed(sender, **kwargs):
+    TableVersion.objects.bump(INGREDIENTS_TABLE)
+
+
+# Поле изображения каждой модели; имя файла на момент загрузки из базы
+# хранится в экземпляре, чтобы ставить задачу только при его смене.
+IMAGE_FIELDS = {Recipe: 'image', User: 'avatar'}
+
+
+def _file_name(value):
+    return getattr(value, 'name', value) or ''
+
+
+@receiver(post_init, sender=Recipe)
+@receiver(post_init, sender=User)
+def remember_image_name(sender, instance, **kwargs):
+    field = IMAGE_FIELDS[sender]
+    instance._stored_image_name = _file_name(instance.__dict__.get(field))
+
+
+def _enqueue_renditions(instance, field, update_fields):
+    if update_fields is not None and field not in update_fields:
+        return
+    name = _file_name(getattr(instance, field))
+    if name == instance._stored_image_name:
+        return
+    instance._stored_image_name = name
+    if name:
+        queue.enqueue('renditions', {
+            'model': instance._meta.label,
+            'pk': instance.pk,
+            'field': field,
+        })
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(sender, instance, update_fields=None, **kwargs):
+    _enqueue_renditions(instance, 'image', update_fields)
+
+
+@receiver(post_save, sender=User)
+def avatar_saved(sender, instance, update_fields=None, **kwargs):
+    _enqueue_renditions(instance, 'avatar', update_fields)
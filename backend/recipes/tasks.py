@@ -0,0 +1,49 @@
+"""Фоновые задачи: рендиции изображений и выгрузка списка покупок."""
+import tempfile
+import uuid
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from foodgram import renditions
+from jobs.queue import register
+from recipes.cache import invalidate_recipes
+from recipes.models import Recipe
+from recipes.utils import EXPORT_FORMATS, iter_ingredients
+from users.models import User
+
+
+def renditions_published(obj):
+    """Обновить updated_at (ETag и ключ кэша тел) рецептов с рендициями obj.
+
+    Удаление из кэша действует только в процессе воркера; остальные
+    процессы отбросят свои тела по новому updated_at.
+    """
+    if isinstance(obj, Recipe):
+        recipes = Recipe.objects.filter(pk=obj.pk)
+    else:
+        recipes = Recipe.objects.filter(author_id=obj.pk)
+    recipe_ids = list(recipes.values_list('pk', flat=True))
+    recipes.update(updated_at=timezone.now())
+    invalidate_recipes(recipe_ids)
+
+
+@register('renditions')
+def generate_renditions(model, pk, field):
+    obj = apps.get_model(model).objects.filter(pk=pk).only(field).first()
+    if obj is not None and renditions.ensure(getattr(obj, field)):
+        renditions_published(obj)
+
+
+@register('shopping_list_export')
+def export_shopping_list(user_id, export_format):
+    stream, _ = EXPORT_FORMATS[export_format]
+    name = f'exports/{uuid.uuid4().hex}/shopping_list.{export_format}'
+    with tempfile.TemporaryFile() as file:
+        for chunk in stream(iter_ingredients(User(pk=user_id))):
+            file.write(chunk)
+        file.seek(0)
+        name = default_storage.save(name, File(file))
+    return {'file': name}
@@ -0,0 +1,189 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from foodgram.testing import (clear_caches, create_ingredients,
+                              create_recipe, create_user, make_recipe)
+from recipes import feed
+from recipes.cache import DjangoRecipeCache, get_recipe_cache
+from recipes.models import (Favorite, IngredientInRecipe, Recipe,
+                            ShoppingCart)
+from users.models import Subscription
+
+RECIPES_COUNT = 12
+INGREDIENTS_PER_RECIPE = 3
+PAGE_SIZES = (2, 6, 12)
+
+
+class RecipeQueryCountTests(APITestCase):
+    """Число запросов к /api/recipes/ не растет с размером страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        authors = [create_user(f'author{index}') for index in range(3)]
+        cls.reader = create_user('reader')
+        ingredients = create_ingredients(INGREDIENTS_PER_RECIPE * 2)
+        recipes = Recipe.objects.bulk_create(
+            make_recipe(authors[index % len(authors)], f'Рецепт {index}')
+            for index in range(RECIPES_COUNT))
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(recipe=recipe,
+                               ingredient=ingredients[(index + shift)
+                                                      % len(ingredients)],
+                               amount=shift + 1)
+            for index, recipe in enumerate(recipes)
+            for shift in range(INGREDIENTS_PER_RECIPE))
+        Favorite.objects.bulk_create(
+            Favorite(user=cls.reader, recipe=recipe)
+            for recipe in recipes[::2])
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=cls.reader, recipe=recipe)
+            for recipe in recipes[::3])
+        Subscription.objects.create(user=cls.reader, author=authors[0])
+        cls.recipe = recipes[0]
+
+    def setUp(self):
+        clear_caches()
+
+    def assertListQueries(self, queries):
+        for limit in PAGE_SIZES:
+            with self.subTest(limit=limit):
+                get_recipe_cache().clear()
+                with self.assertNumQueries(queries):
+                    response = self.client.get(
+                        '/api/recipes/', {'limit': limit})
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_list_anonymous(self):
+        self.assertListQueries(3)
+
+    def test_list_authenticated(self):
+        self.client.force_authenticate(self.reader)
+        self.assertListQueries(6)
+
+    def test_detail_anonymous(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/recipes/{self.recipe.pk}/')
+        self.assertEqual(len(response.data['ingredients']),
+                         INGREDIENTS_PER_RECIPE)
+
+    def test_detail_authenticated(self):
+        self.client.force_authenticate(self.reader)
+        with self.assertNumQueries(6):
+            response = self.client.get(f'/api/recipes/{self.recipe.pk}/')
+        self.assertTrue(response.data['is_favorited'])
+        self.assertTrue(response.data['is_in_shopping_cart'])
+        self.assertTrue(response.data['author']['is_subscribed'])
+
+
+class RecipeDetailConditionalTests(APITestCase):
+    """Условный GET рецепта."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.recipe = create_recipe(cls.author)
+
+    def setUp(self):
+        clear_caches()
+
+    def test_invalid_pk(self):
+        response = self.client.get('/api/recipes/abc/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_author_change_invalidates(self):
+        url = f'/api/recipes/{self.recipe.pk}/'
+        response = self.client.get(url)
+        self.assertNotIn('Last-Modified', response)
+        etag = response['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.author.first_name = 'Другое'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['author']['first_name'], 'Другое')
+
+    def test_cached_body_follows_updated_at(self):
+        # Как фоновая задача в другом процессе: без сброса кэша тел
+        # этого процесса.
+        url = f'/api/recipes/{self.recipe.pk}/'
+        etag = self.client.get(url)['ETag']
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            name='Новое', updated_at=timezone.now())
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['name'], 'Новое')
+
+
+@mock.patch('recipes.feed.FEED_FANOUT_MAX_SUBSCRIBERS', 2)
+class FeedFanoutTests(TestCase):
+    """Ленты обновляются при любых изменениях через ORM."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.readers = [create_user(f'reader{index}') for index in range(3)]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_recipe_of_new_popular_author(self):
+        # Список популярных закэширован, пока подписчиков было мало.
+        self.assertEqual(feed.popular_author_ids(), set())
+        Subscription.objects.bulk_create(
+            Subscription(user=reader, author=self.author)
+            for reader in self.readers)
+        recipe = create_recipe(self.author)
+        self.assertFalse(recipe.feed_entries.exists())
+        for reader in self.readers:
+            self.assertTrue(
+                Recipe.objects.filter(feed.feed_filter(reader)).exists())
+
+    def feed_recipes(self, reader):
+        return set(Recipe.objects.filter(feed.feed_filter(reader)))
+
+    def test_orm_subscription_and_recipe(self):
+        reader, other = self.readers[:2]
+        old = create_recipe(self.author)
+        Subscription.objects.create(user=reader, author=self.author)
+        new = create_recipe(self.author)
+        Subscription.objects.create(user=other, author=self.author)
+        self.assertEqual(self.feed_recipes(reader), {old, new})
+        self.assertEqual(self.feed_recipes(other), {old, new})
+        Subscription.objects.filter(user=reader).delete()
+        self.assertEqual(self.feed_recipes(reader), set())
+
+    def test_backfill_outlives_popularity(self):
+        Subscription.objects.bulk_create(
+            Subscription(user=reader, author=self.author)
+            for reader in self.readers[1:])
+        recipe = create_recipe(self.author)
+        follower = create_user('follower')
+        # Автор популярен (3 подписчика при пороге 2): рецепт в ленту
+        # попадает только дозаполнением.
+        Subscription.objects.create(user=follower, author=self.author)
+        Subscription.objects.filter(user__in=self.readers).delete()
+        cache.clear()
+        self.assertEqual(feed.popular_author_ids(), set())
+        self.assertEqual(self.feed_recipes(follower), {recipe})
+
+
+class DjangoRecipeCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.recipe_cache = DjangoRecipeCache()
+
+    def test_clear(self):
+        self.recipe_cache.set_many({1: 'first', 2: 'second'})
+        self.assertEqual(self.recipe_cache.get_many([1, 2, 3]),
+                         {1: 'first', 2: 'second'})
+        self.recipe_cache.clear()
+        self.assertEqual(self.recipe_cache.get_many([1, 2]), {})
+        self.recipe_cache.set_many({1: 'again'})
+        self.assertEqual(self.recipe_cache.get_many([1, 2]), {1: 'again'})
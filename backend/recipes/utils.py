@@ -1,39 +1,93 @@
-from io import BytesIO
-from django.db.models import Sum
-from django.http import FileResponse
-from recipes.models import IngredientInRecipe
+import csv
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.http import content_disposition_header
+from recipes.models import ShoppingListItem
+from recipes.pdf import StreamingPDF
+
+EXPORT_CHUNK_SIZE = 2000
 
 
 def get_ingredients_list(user):
     return (
-        IngredientInRecipe.objects
-        .filter(recipe__shopping_carts__user=user)
-        .values('ingredient__name', 'ingredient__measurement_unit')
-        .annotate(total_amount=Sum('amount'))
+        ShoppingListItem.objects
+        .filter(user=user, total_amount__gt=0)
+        .values('ingredient__name', 'ingredient__measurement_unit',
+                'total_amount')
         .order_by('ingredient__name')
     )
 
 
-def create_shop_list_text(ingredients):
-    return '\n'.join(
-        f'{item["ingredient__name"]} —> '
-        f'{item["total_amount"]} '
-        f'{item["ingredient__measurement_unit"]}'
-        for item in ingredients
-    )
+def iter_ingredients(user):
+    """Позиции списка покупок через серверный курсор, без загрузки всех."""
+    return get_ingredients_list(user).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def format_shop_list_line(item):
+    return (f'{item["ingredient__name"]} —> '
+            f'{item["total_amount"]} '
+            f'{item["ingredient__measurement_unit"]}')
+
+
+def stream_txt(ingredients):
+    separator = ''
+    for item in ingredients:
+        yield f'{separator}{format_shop_list_line(item)}'.encode()
+        separator = '\n'
+
+
+class _LineBuffer:
+    """Файлоподобный объект для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(ingredients):
+    writer = csv.writer(_LineBuffer())
+    yield writer.writerow(('name', 'amount', 'measurement_unit')).encode()
+    for item in ingredients:
+        yield writer.writerow((
+            item['ingredient__name'],
+            item['total_amount'],
+            item['ingredient__measurement_unit'],
+        )).encode()
+
+
+def stream_json(ingredients):
+    separator = '['
+    for item in ingredients:
+        yield (separator + json.dumps({
+            'name': item['ingredient__name'],
+            'amount': item['total_amount'],
+            'measurement_unit': item['ingredient__measurement_unit'],
+        }, ensure_ascii=False)).encode()
+        separator = ','
+    yield b'[]' if separator == '[' else b']'
+
+
+def stream_pdf(ingredients):
+    pdf = StreamingPDF(settings.SHOPPING_LIST_PDF_FONT)
+    lines = (format_shop_list_line(item) for item in ingredients)
+    return pdf.render(lines)
 
 
-def create_shop_list_file(user):
-    ingredients = get_ingredients_list(user)
-    content = create_shop_list_text(ingredients)
+EXPORT_FORMATS = {
+    'txt': (stream_txt, 'text/plain; charset=utf-8'),
+    'csv': (stream_csv, 'text/csv; charset=utf-8'),
+    'json': (stream_json, 'application/json'),
+    'pdf': (stream_pdf, 'application/pdf'),
+}
 
-    buffer = BytesIO()
-    buffer.write(content.encode('utf-8'))
-    buffer.seek(0)
 
-    return FileResponse(
-        buffer,
-        as_attachment=True,
-        filename='shopping_list.txt',
-        content_type='text/plain'
+def create_shop_list_file(user, export_format='txt'):
+    stream, content_type = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(
+        stream(iter_ingredients(user)),
+        content_type=content_type
     )
+    response.headers['Content-Disposition'] = content_disposition_header(
+        True, f'shopping_list.{export_format}')
+    return response
@@ -1,11 +1,24 @@
+import os
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Prefetch, Subquery
 from django.shortcuts import redirect, get_object_or_404
 from django.urls import reverse
+from api.bulk import (BulkIdsSerializer, bulk_link, bulk_unlink,
+                      lock_links)
+from api.conditional import condition, make_etag
+from api.negotiation import IgnoreFormatNegotiation
+from api.pagination import KeysetPagination
 from api.permissions import IsAuthorOrReadOnly
 
+from jobs import queue
+from jobs.serializers import JobSerializer
 from recipes.filters import RecipeFilter
 from recipes.serializers import (RecipeReadSerializer,
                                  RecipeWriteSerializer,
@@ -14,12 +27,20 @@ from recipes.serializers import (RecipeReadSerializer,
                                  ShoppingCartSerializer)
 from recipes.models import (Recipe,
                             Ingredient,
+                            IngredientInRecipe,
                             Favorite,
-                            ShoppingCart)
-from recipes.utils import create_shop_list_file
+                            ShoppingCart,
+                            TableVersion)
+from users.models import Subscription
+from foodgram.constants import INGREDIENTS_TABLE
+from foodgram.metrics import TimedViewMixin
+from recipes.catalogue import ingredient_catalogue
+from recipes import feed, shopping_list
+from recipes.search import ingredient_index
+from recipes.utils import EXPORT_FORMATS, create_shop_list_file
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(TimedViewMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
@@ -31,17 +52,96 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
             return self.queryset.filter(name__istartswith=name)
         return self.queryset
 
+    def _list_validators(self, request):
+        self.table_version, updated_at = TableVersion.objects.get_version(
+            INGREDIENTS_TABLE)
+        ingredient_index.ensure(self.table_version)
+        if not request.query_params.get('name'):
+            ingredient_catalogue.ensure(self.table_version, ingredient_index)
+            self.encoding = ingredient_catalogue.negotiate(
+                request.META.get('HTTP_ACCEPT_ENCODING', ''))
+            return ingredient_catalogue.etag(self.encoding), updated_at
+        return (make_etag(self.table_version,
+                          request.query_params.get('name'),
+                          request.query_params.get('fuzzy')),
+                updated_at)
+
+    @condition(_list_validators, vary=('Accept-Encoding',))
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return ingredient_catalogue.response(self.encoding)
+        if request.query_params.get('fuzzy') in ('1', 'true'):
+            return Response(ingredient_index.fuzzy(name))
+        return Response(ingredient_index.prefix(name))
+
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(TimedViewMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = [IsAuthorOrReadOnly]
     filterset_class = RecipeFilter
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        return (
+            Recipe.objects
+            .select_related('author')
+            .prefetch_related(Prefetch(
+                'ingredientinrecipe_set',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient')
+            ))
+        )
 
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return RecipeWriteSerializer
         return RecipeReadSerializer
 
+    def _retrieve_validators(self, request, pk=None):
+        try:
+            pk = Recipe._meta.pk.to_python(pk)
+        except ValidationError:
+            # Ответ 404 построит сам retrieve.
+            return None, None
+        user = request.user
+        fields = [
+            'updated_at',
+            'ingredients_version',
+            'author__username',
+            'author__first_name',
+            'author__last_name',
+            'author__email',
+            'author__avatar',
+        ]
+        queryset = Recipe.objects.filter(pk=pk).annotate(
+            ingredients_version=Subquery(
+                TableVersion.objects
+                .filter(name=INGREDIENTS_TABLE)
+                .values('version')
+            )
+        )
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                favorited=Exists(Favorite.objects.filter(
+                    user=user, recipe=OuterRef('pk'))),
+                in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                    user=user, recipe=OuterRef('pk'))),
+                author_subscribed=Exists(Subscription.objects.filter(
+                    user=user, author=OuterRef('author'))),
+            )
+            fields += ['favorited', 'in_shopping_cart', 'author_subscribed']
+        row = queryset.values_list(*fields).first()
+        if row is None:
+            return None, None
+        # Только ETag: Last-Modified по updated_at не менялся бы при
+        # правке автора и его подписок.
+        return make_etag(user.pk, *row), None
+
+    @condition(_retrieve_validators)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
@@ -52,26 +152,94 @@ class RecipeViewSet(viewsets.ModelViewSet):
                   'recipe': recipe.id},
             context={'request': request}
         )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        with transaction.atomic():
+            lock_links(request.user)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+            if serializer_class is ShoppingCartSerializer:
+                shopping_list.add_recipes(request.user.id, [recipe.id])
         return Response(serializer.data,
                         status=status.HTTP_201_CREATED)
 
     def _remove_from(self, request, pk, model):
         recipe = get_object_or_404(Recipe, pk=pk)
-        deleted_count, _ = model.objects.filter(user=request.user,
-                                                recipe=recipe).delete()
+        with transaction.atomic():
+            lock_links(request.user)
+            deleted_count, _ = model.objects.filter(user=request.user,
+                                                    recipe=recipe).delete()
+            if deleted_count > 0 and model is ShoppingCart:
+                shopping_list.remove_recipes(request.user.id, [recipe.id])
         if deleted_count <= 0:
             return Response({'errors': 'Рецепт не найден.'},
                             status=status.HTTP_400_BAD_REQUEST)
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-    @action(methods=['get'],
+    def _bulk(self, request, model):
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        with transaction.atomic():
+            if request.method == 'POST':
+                results, changed = bulk_link(
+                    model, request.user, 'recipe', Recipe, ids)
+                if changed and model is ShoppingCart:
+                    shopping_list.add_recipes(request.user.id, changed)
+            else:
+                results, changed = bulk_unlink(
+                    model, request.user, 'recipe', Recipe, ids)
+                if changed and model is ShoppingCart:
+                    shopping_list.remove_recipes(request.user.id, changed)
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    @action(methods=['post', 'delete'],
+            permission_classes=[IsAuthenticated],
+            url_path='favorite',
+            detail=False,)
+    def bulk_favorite(self, request):
+        return self._bulk(request, Favorite)
+
+    @action(methods=['post', 'delete'],
             permission_classes=[IsAuthenticated],
+            url_path='shopping_cart',
             detail=False,)
+    def bulk_shopping_cart(self, request):
+        return self._bulk(request, ShoppingCart)
+
+    @action(methods=['get'],
+            permission_classes=[IsAuthenticated],
+            detail=False,
+            content_negotiation_class=IgnoreFormatNegotiation,)
     def download_shopping_cart(self, request):
-        return create_shop_list_file(request.user)
+        export_format = request.query_params.get('format', 'txt')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {'errors': 'Доступные форматы: '
+                           f'{", ".join(EXPORT_FORMATS)}.'},
+                status=status.HTTP_400_BAD_REQUEST)
+        if (export_format == 'pdf'
+                and not os.path.isfile(settings.SHOPPING_LIST_PDF_FONT)):
+            return Response({'errors': 'Экспорт в PDF недоступен.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if request.query_params.get('async') in ('1', 'true'):
+            job = queue.enqueue(
+                'shopping_list_export',
+                {'user_id': request.user.id, 'export_format': export_format},
+                user=request.user)
+            return Response(
+                JobSerializer(job, context={'request': request}).data,
+                status=status.HTTP_202_ACCEPTED)
+        return create_shop_list_file(request.user, export_format)
+
+    @action(methods=['get'],
+            permission_classes=[IsAuthenticated],
+            url_path='feed',
+            detail=False,)
+    def subscriptions_feed(self, request):
+        queryset = self.get_queryset().filter(feed.feed_filter(request.user))
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     @action(methods=['get'],
             url_path='get-link',
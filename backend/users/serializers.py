@@ -2,23 +2,27 @@ from rest_framework import serializers
 from djoser.serializers import UserSerializer
 from users.models import User
 from foodgram.reformat_image import ReformattingBase64
+from foodgram.relations import get_relations
+from foodgram.renditions import RenditionsField
 
 
 class CustomUserSerializer(UserSerializer):
     """Сериализатор для отображения данных пользователя."""
 
     avatar = ReformattingBase64()
+    avatar_renditions = RenditionsField(source='avatar')
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = UserSerializer.Meta.fields + ('avatar', 'is_subscribed')
+        fields = UserSerializer.Meta.fields + (
+            'avatar', 'avatar_renditions', 'is_subscribed')
 
     def get_is_subscribed(self, obj):
         request = self.context.get('request')
-        return (request
-                and request.user.is_authenticated
-                and obj.subscriptions.filter(user=request.user).exists())
+        if not (request and request.user.is_authenticated):
+            return False
+        return obj.pk in get_relations(request).subscribed_author_ids
 
 
 class AvatarSerializer(serializers.ModelSerializer):
@@ -0,0 +1,50 @@
+from rest_framework.test import APITestCase
+
+from foodgram.testing import clear_caches, create_user, make_recipe
+from recipes.models import Recipe
+from users.models import Subscription
+
+AUTHORS_COUNT = 6
+RECIPES_PER_AUTHOR = 4
+
+
+class SubscriptionsQueryCountTests(APITestCase):
+    """Страница подписок — фиксированное число запросов.
+
+    Рецепты всех авторов страницы выбираются одним запросом с
+    ROW_NUMBER() OVER (PARTITION BY author), а не по запросу на автора.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_user('reader')
+        authors = [create_user(f'author{index}')
+                   for index in range(AUTHORS_COUNT)]
+        Recipe.objects.bulk_create(
+            make_recipe(author, f'Рецепт {index}')
+            for author in authors for index in range(RECIPES_PER_AUTHOR))
+        Subscription.objects.bulk_create(
+            Subscription(user=cls.reader, author=author)
+            for author in authors)
+
+    def setUp(self):
+        clear_caches()
+        self.client.force_authenticate(self.reader)
+
+    def test_query_count_does_not_depend_on_authors(self):
+        for limit in (2, AUTHORS_COUNT):
+            for recipes_limit in (None, 1, 3):
+                params = {'limit': limit}
+                if recipes_limit is not None:
+                    params['recipes_limit'] = recipes_limit
+                with self.subTest(**params), self.assertNumQueries(4):
+                    response = self.client.get(
+                        '/api/users/subscriptions/', params)
+                authors = response.data['results']
+                self.assertEqual(len(authors), limit)
+                for author in authors:
+                    self.assertEqual(author['recipes_count'],
+                                     RECIPES_PER_AUTHOR)
+                    self.assertEqual(len(author['recipes']),
+                                     recipes_limit or RECIPES_PER_AUTHOR)
+                    self.assertTrue(author['is_subscribed'])
@@ -1,22 +1,44 @@
+from django.db import transaction
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
 from djoser.views import UserViewSet
 
+from api.bulk import (BulkIdsSerializer, bulk_link, bulk_unlink,
+                      lock_links)
+from api.conditional import condition, make_etag
+from api.pagination import UserKeysetPagination
+from api.parsers import RawAvatarParser
+
 from users.serializers import (CustomUserSerializer,
                                AvatarSerializer,)
 from api.serializers import (SubscriptionSerializer,
-                             SubscriptionCreateSerializer,)
+                             SubscriptionCreateSerializer,
+                             annotate_subscription_stats,)
 
+from foodgram import renditions
+from foodgram.metrics import TimedViewMixin
+from recipes import feed
 from users.models import User, Subscription
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(TimedViewMixin, UserViewSet):
 
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
+    pagination_class = UserKeysetPagination
+
+    def _me_validators(self, request):
+        user = request.user
+        if not user.is_authenticated:
+            return None, None
+        return make_etag(user.pk, user.username, user.email, user.first_name,
+                         user.last_name, user.avatar.name,
+                         bool(user.avatar)
+                         and renditions.has_renditions(user.avatar)), None
 
     @action(
         methods=['get'],
@@ -24,6 +46,7 @@ class CustomUserViewSet(UserViewSet):
         url_path='me',
         detail=False,
     )
+    @condition(_me_validators)
     def me(self, request):
         serializer = CustomUserSerializer(request.user,
                                           context={'request': request}
@@ -33,6 +56,7 @@ class CustomUserViewSet(UserViewSet):
 
     @action(methods=['put', 'delete'],
             permission_classes=[IsAuthenticated],
+            parser_classes=[JSONParser, MultiPartParser, RawAvatarParser],
             url_path='me/avatar',
             detail=False,)
     def avatar(self, request):
@@ -43,14 +67,18 @@ class CustomUserViewSet(UserViewSet):
             serializer.save()
             return Response(serializer.data, status=status.HTTP_200_OK)
 
-        user.avatar.delete(save=True)
+        # Файл может использоваться другими записями (одинаковое
+        # содержимое хранится один раз); сиротские файлы удаляет gc_media.
+        user.avatar = None
+        user.save(update_fields=['avatar'])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(permission_classes=[IsAuthenticated],
             url_path='subscriptions',
             detail=False,)
     def subscriptions(self, request):
-        authors = User.objects.filter(subscribers__user=request.user)
+        authors = annotate_subscription_stats(
+            User.objects.filter(subscribers__user=request.user))
         page = self.paginate_queryset(authors)
         serializer = SubscriptionSerializer(page,
                                             many=True,
@@ -65,8 +93,10 @@ class CustomUserViewSet(UserViewSet):
                   'author': author.id},
             context={'request': request}
         )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        with transaction.atomic():
+            lock_links(request.user)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
         return Response(serializer.data,
                         status=status.HTTP_201_CREATED)
 
@@ -81,9 +111,11 @@ class CustomUserViewSet(UserViewSet):
     def _unsubscribe(self, request, id):
 
         author = get_object_or_404(User, pk=id)
-        deleted_county, _ = Subscription.objects.filter(
-            user=request.user,
-            author=author).delete()
+        with transaction.atomic():
+            lock_links(request.user)
+            deleted_county, _ = Subscription.objects.filter(
+                user=request.user,
+                author=author).delete()
 
         if deleted_county <= 0:
             return Response({'error': 'Подписка не найдена.'},
@@ -94,3 +126,26 @@ class CustomUserViewSet(UserViewSet):
     @subscribe.mapping.delete
     def unsubscribe(self, request, id=None):
         return self._unsubscribe(request, id)
+
+    @action(methods=['post', 'delete'],
+            permission_classes=[IsAuthenticated],
+            url_path='subscribe',
+            detail=False,
+            )
+    def bulk_subscribe(self, request):
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        with transaction.atomic(), feed.batched():
+            if request.method == 'POST':
+                results, changed = bulk_link(
+                    Subscription, request.user, 'author', User, ids,
+                    forbidden={request.user.id})
+                if changed:
+                    feed.subscribed(request.user.id, changed)
+            else:
+                results, changed = bulk_unlink(
+                    Subscription, request.user, 'author', User, ids)
+                if changed:
+                    feed.unsubscribed(request.user.id, changed)
+        return Response({'results': results}, status=status.HTTP_200_OK)